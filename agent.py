@@ -1,4 +1,4 @@
-import asyncio, random, string
+import asyncio, random, string, threading
 import nest_asyncio
 
 nest_asyncio.apply()
@@ -12,12 +12,10 @@ import uuid
 import models
 
 from python.helpers import extract_tools, files, errors, history, tokens, context as context_helper
-from python.helpers import dirty_json
+from python.helpers import dirty_json, state_monitor
+from python.helpers.prompt_builder import PromptBuilder, CtxWindow
 from python.helpers.print_style import PrintStyle
 
-from langchain_core.prompts import (
-    ChatPromptTemplate,
-)
 from langchain_core.messages import SystemMessage, BaseMessage
 
 import python.helpers.log as Log
@@ -40,6 +38,7 @@ class AgentContext:
     _contexts: dict[str, "AgentContext"] = {}
     _counter: int = 0
     _notification_manager = None
+    _hydrate_lock = threading.RLock()
 
     def __init__(
         self,
@@ -56,6 +55,7 @@ class AgentContext:
         data: dict | None = None,
         output_data: dict | None = None,
         set_current: bool = False,
+        loader: "Callable[[AgentContext], None] | None" = None,
     ):
         # initialize context
         self.id = id or AgentContext.generate_id()
@@ -71,7 +71,10 @@ class AgentContext:
         self.config = config
         self.log = log or Log.Log()
         self.log.context = self
-        self.agent0 = agent0 or Agent(0, self.config, self)
+        # lazily loaded contexts only hold metadata, agents are created by the loader
+        self.loader = loader
+        self._hydrating = False
+        self.agent0: Agent = agent0 or (None if loader else Agent(0, self.config, self))  # type: ignore
         self.paused = paused
         self.streaming_agent = streaming_agent
         self.task: DeferredTask | None = None
@@ -82,12 +85,46 @@ class AgentContext:
         self.last_message = last_message or datetime.now(timezone.utc)
         self.data = data or {}
         self.output_data = output_data or {}
+        state_monitor.mark_contexts_dirty()
 
+    # name and paused are shown in the chats list, changes are pushed to the UI
+    @property
+    def name(self) -> str | None:
+        return self._name
+
+    @name.setter
+    def name(self, value: str | None):
+        self._name = value
+        state_monitor.mark_contexts_dirty()
+
+    @property
+    def paused(self) -> bool:
+        return self._paused
+
+    @paused.setter
+    def paused(self, value: bool):
+        self._paused = value
+        state_monitor.mark_contexts_dirty()
 
 
     @staticmethod
     def get(id: str):
-        return AgentContext._contexts.get(id, None)
+        context = AgentContext._contexts.get(id, None)
+        if context:
+            context.hydrate()
+        return context
+
+    def hydrate(self):
+        # load the full context on first use, other threads wait until it is done
+        if self.loader:
+            with AgentContext._hydrate_lock:
+                if self.loader and not self._hydrating:
+                    self._hydrating = True
+                    try:
+                        self.loader(self)
+                    finally:
+                        self.loader = None
+                        self._hydrating = False
 
     @staticmethod
     def use(id: str):
@@ -140,6 +177,9 @@ class AgentContext:
         context = AgentContext._contexts.pop(id, None)
         if context and context.task:
             context.task.kill()
+        if context:
+            state_monitor.forget_context(id)
+            state_monitor.mark_contexts_dirty()
         return context
 
     def get_data(self, key: str, recursive: bool = True):
@@ -157,6 +197,7 @@ class AgentContext:
     def set_output_data(self, key: str, value: Any, recursive: bool = True):
         # recursive is not used now, prepared for context hierarchy
         self.output_data[key] = value
+        state_monitor.mark_contexts_dirty()
 
     def output(self):
         return {
@@ -169,7 +210,7 @@ class AgentContext:
             ),
             "no": self.no,
             "log_guid": self.log.guid,
-            "log_version": len(self.log.updates),
+            "log_version": self.log.get_version(),
             "log_length": len(self.log.logs),
             "paused": self.paused,
             "last_message": (
@@ -350,6 +391,7 @@ class Agent:
         self.last_user_message: history.Message | None = None
         self.intervention: UserMessage | None = None
         self.data: dict[str, Any] = {}  # free data object all the tools can use
+        self.prompt_builder = PromptBuilder(self)
 
         asyncio.run(self.call_extensions("agent_init"))
 
@@ -509,8 +551,8 @@ class Agent:
         ).output()
         loop_data.extras_temporary.clear()
 
-        # convert history + extras to LLM format
-        history_langchain: list[BaseMessage] = history.output_langchain(
+        # convert history + extras to LLM format, messages rendered before are reused
+        history_langchain: list[BaseMessage] = self.prompt_builder.output_langchain(
             loop_data.history_output + extras
         )
 
@@ -519,16 +561,9 @@ class Agent:
             SystemMessage(content=system_text),
             *history_langchain,
         ]
-        full_text = ChatPromptTemplate.from_messages(full_prompt).format()
-
-        # store as last context window content
-        self.set_data(
-            Agent.DATA_NAME_CTX_WINDOW,
-            {
-                "text": full_text,
-                "tokens": tokens.approximate_tokens(full_text),
-            },
-        )
+
+        # store as last context window content, text and tokens are computed when requested
+        self.set_data(Agent.DATA_NAME_CTX_WINDOW, CtxWindow(full_prompt))
 
         return full_prompt
 
@@ -563,11 +598,15 @@ class Agent:
             raise HandledException(exception)  # Re-raise the exception to kill the loop
 
     async def get_system_prompt(self, loop_data: LoopData) -> list[str]:
-        system_prompt: list[str] = []
-        await self.call_extensions(
-            "system_prompt", system_prompt=system_prompt, loop_data=loop_data
-        )
-        return system_prompt
+        async def render():
+            system_prompt: list[str] = []
+            await self.call_extensions(
+                "system_prompt", system_prompt=system_prompt, loop_data=loop_data
+            )
+            return system_prompt
+
+        # extensions only run again when the prompt inputs change
+        return await self.prompt_builder.get_system_prompt(render)
 
     def parse_prompt(self, _prompt_file: str, **kwargs):
         dirs = [files.get_abs_path("prompts")]
@@ -876,13 +915,18 @@ class Agent:
         try:
             if len(stream) < 25:
                 return  # no reason to try
-            response = DirtyJson.parse_string(stream)
+            # one incremental parser per LLM call, only the new part of the stream gets parsed
+            parser = self.loop_data.params_temporary.get("response_parser")
+            if not parser:
+                parser = DirtyJson()
+                self.loop_data.params_temporary["response_parser"] = parser
+            response = parser.feed_full(stream)
             if isinstance(response, dict):
                 await self.call_extensions(
                     "response_stream",
                     loop_data=self.loop_data,
                     text=stream,
-                    parsed=response,
+                    parsed=dirty_json.snapshot(response),  # extensions may modify it
                 )
 
         except Exception as e:
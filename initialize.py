@@ -122,7 +122,7 @@ def initialize_agent(override_settings: dict | None = None):
 def initialize_chats():
     from python.helpers import persist_chat
     async def initialize_chats_async():
-        persist_chat.load_tmp_chats()
+        persist_chat.load_tmp_chats(lazy=True)
     return defer.DeferredTask().start_task(initialize_chats_async)
 
 def initialize_mcp():
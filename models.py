@@ -24,7 +24,7 @@ from python.helpers import settings, dirty_json
 from python.helpers.dotenv import load_dotenv
 from python.helpers.providers import get_provider_config
 from python.helpers.rate_limiter import RateLimiter
-from python.helpers.tokens import approximate_tokens
+from python.helpers.tokens import estimate_tokens
 from python.helpers import dirty_json, browser_use_monkeypatch
 
 from langchain_core.language_models.chat_models import SimpleChatModel
@@ -266,7 +266,7 @@ async def apply_rate_limiter(
         model_config.limit_input,
         model_config.limit_output,
     )
-    limiter.add(input=approximate_tokens(input_text))
+    limiter.add(input=estimate_tokens(input_text, model_config.name))
     limiter.add(requests=1)
     await limiter.wait(rate_limiter_callback)
     return limiter
@@ -521,11 +521,11 @@ class LiteLLMChatWrapper(SimpleChatModel):
                             if tokens_callback:
                                 await tokens_callback(
                                     output["reasoning_delta"],
-                                    approximate_tokens(output["reasoning_delta"]),
+                                    estimate_tokens(output["reasoning_delta"], self.model_name),
                                 )
                             # Add output tokens to rate limiter if configured
                             if limiter:
-                                limiter.add(output=approximate_tokens(output["reasoning_delta"]))
+                                limiter.add(output=estimate_tokens(output["reasoning_delta"], self.model_name))
                         # collect response delta and call callbacks
                         if output["response_delta"]:
                             if response_callback:
@@ -533,11 +533,11 @@ class LiteLLMChatWrapper(SimpleChatModel):
                             if tokens_callback:
                                 await tokens_callback(
                                     output["response_delta"],
-                                    approximate_tokens(output["response_delta"]),
+                                    estimate_tokens(output["response_delta"], self.model_name),
                                 )
                             # Add output tokens to rate limiter if configured
                             if limiter:
-                                limiter.add(output=approximate_tokens(output["response_delta"]))
+                                limiter.add(output=estimate_tokens(output["response_delta"], self.model_name))
 
                 # non-stream response
                 else:
@@ -545,9 +545,9 @@ class LiteLLMChatWrapper(SimpleChatModel):
                     output = result.add_chunk(parsed)
                     if limiter:
                         if output["response_delta"]:
-                            limiter.add(output=approximate_tokens(output["response_delta"]))
+                            limiter.add(output=estimate_tokens(output["response_delta"], self.model_name))
                         if output["reasoning_delta"]:
-                            limiter.add(output=approximate_tokens(output["reasoning_delta"]))
+                            limiter.add(output=estimate_tokens(output["reasoning_delta"], self.model_name))
 
                 # Successful completion of stream
                 return result.response, result.reasoning
@@ -691,6 +691,10 @@ class LiteLLMEmbeddingWrapper(Embeddings):
         item = resp.data[0]  # type: ignore
         return item.get("embedding") if isinstance(item, dict) else item.embedding  # type: ignore
 
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        # queries are embedded like documents, so several go in one request
+        return self.embed_documents(texts)
+
 
 class LocalSentenceTransformerWrapper(Embeddings):
     """Local wrapper for sentence-transformers models to avoid HuggingFace API calls"""
@@ -741,6 +745,10 @@ class LocalSentenceTransformerWrapper(Embeddings):
         )
         return result  # type: ignore
 
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        # queries are encoded like documents, so several go in one batch
+        return self.embed_documents(texts)
+
 
 def _get_litellm_chat(
     cls: type = LiteLLMChatWrapper,
@@ -1,6 +1,6 @@
 from python.helpers.api import ApiHandler, Input, Output, Request, Response
 
-from python.helpers import tokens
+from python.helpers.prompt_builder import CtxWindow
 
 
 class GetCtxWindow(ApiHandler):
@@ -9,6 +9,12 @@ class GetCtxWindow(ApiHandler):
         context = self.use_context(ctxid)
         agent = context.streaming_agent or context.agent0
         window = agent.get_data(agent.DATA_NAME_CTX_WINDOW)
+
+        # text and tokens of the last prompt are only computed here
+        if isinstance(window, CtxWindow):
+            return {"content": window.text, "tokens": window.tokens}
+
+        # chats saved before the window was computed lazily
         if not window or not isinstance(window, dict):
             return {"content": "", "tokens": 0}
 
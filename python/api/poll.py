@@ -5,6 +5,7 @@ from agent import AgentContext, AgentContextType
 from python.helpers.task_scheduler import TaskScheduler
 from python.helpers.localization import Localization
 from python.helpers.dotenv import get_dotenv_value
+from python.helpers import state_monitor
 
 
 class Poll(ApiHandler):
@@ -13,11 +14,31 @@ class Poll(ApiHandler):
         ctxid = input.get("context", "")
         from_no = input.get("log_from", 0)
         notifications_from = input.get("notifications_from", 0)
+        version = input.get("version", None)
+        contexts_from = input.get("contexts_from", None)
+
+        # nothing has changed anywhere since the client's last poll
+        if version is not None and version == state_monitor.get_version():
+            return {"not_modified": True, "version": version}
 
         # Get timezone from input (default to dotenv default or UTC if not provided)
         timezone = input.get("timezone", get_dotenv_value("DEFAULT_USER_TIMEZONE", "UTC"))
         Localization.get().set_timezone(timezone)
 
+        # chats and tasks are only rebuilt when the list changed since the client's version
+        return self.get_state(
+            ctxid,
+            from_no,
+            notifications_from,
+            contexts=contexts_from != state_monitor.get_contexts_version(),
+        )
+
+    def get_state(
+        self, ctxid: str, from_no: int, notifications_from: int, contexts: bool = True
+    ) -> dict:
+        # read first, anything changing while the state is built is sent again
+        version = state_monitor.get_version()
+
         # context instance - get or create only if ctxid is provided
         if ctxid:
             try:
@@ -27,13 +48,37 @@ class Poll(ApiHandler):
         else:
             context = None
 
-        # Get logs only if we have a context
+        # Get logs only if we have a context, version first so nothing newer gets skipped
+        log_version = context.log.get_version() if context else 0
         logs = context.log.output(start=from_no) if context else []
 
         # Get notifications from global notification manager
         notification_manager = AgentContext.get_notification_manager()
         notifications = notification_manager.output(start=notifications_from)
 
+        # data from this server
+        state = {
+            "version": version,
+            "deselect_chat": ctxid and not context,
+            "context": context.id if context else "",
+            "logs": logs,
+            "log_guid": context.log.guid if context else "",
+            "log_version": log_version,
+            "log_from": from_no,
+            "log_progress": context.log.progress if context else 0,
+            "log_progress_active": context.log.progress_active if context else False,
+            "paused": context.paused if context else False,
+            "notifications": notifications,
+            "notifications_guid": notification_manager.guid,
+            "notifications_version": len(notification_manager.updates),
+        }
+        if contexts:
+            # version first, a change during the build is sent again next time
+            state["contexts_version"] = state_monitor.get_contexts_version()
+            state["contexts"], state["tasks"] = self.get_contexts()
+        return state
+
+    def get_contexts(self) -> tuple[list[dict], list[dict]]:
         # loop AgentContext._contexts
 
         # Get a task scheduler instance
@@ -107,19 +152,4 @@ class Poll(ApiHandler):
         ctxs.sort(key=lambda x: x["created_at"], reverse=True)
         tasks.sort(key=lambda x: x["created_at"], reverse=True)
 
-        # data from this server
-        return {
-            "deselect_chat": ctxid and not context,
-            "context": context.id if context else "",
-            "contexts": ctxs,
-            "tasks": tasks,
-            "logs": logs,
-            "log_guid": context.log.guid if context else "",
-            "log_version": len(context.log.updates) if context else 0,
-            "log_progress": context.log.progress if context else 0,
-            "log_progress_active": context.log.progress_active if context else False,
-            "paused": context.paused if context else False,
-            "notifications": notifications,
-            "notifications_guid": notification_manager.guid,
-            "notifications_version": len(notification_manager.updates),
-        }
+        return ctxs, tasks
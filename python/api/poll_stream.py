@@ -0,0 +1,127 @@
+import json
+import time
+
+from python.helpers.api import Request, Response
+from python.api.poll import Poll
+
+from agent import AgentContext
+from python.helpers.localization import Localization
+from python.helpers.dotenv import get_dotenv_value
+from python.helpers import state_monitor
+
+STREAM_HEARTBEAT = 15  # seconds between keepalive comments on an idle stream
+STREAM_MIN_INTERVAL = 0.05  # pause after each event so bursts of changes are sent together
+
+
+class PollStream(Poll):
+    """Server-sent events version of /poll, pushes only what changed since the client's cursor."""
+
+    @classmethod
+    def get_methods(cls) -> list[str]:
+        return ["GET"]
+
+    async def process(self, input: dict, request: Request) -> dict | Response:
+        args = request.args
+        ctxid = args.get("context", "")
+        cursor = {
+            "log_guid": args.get("log_guid", ""),
+            "log_version": args.get("log_from", 0, type=int),
+            "notifications_guid": args.get("notifications_guid", ""),
+            "notifications_version": args.get("notifications_from", 0, type=int),
+            "contexts_version": args.get("contexts_from", -1, type=int),
+        }
+
+        # EventSource sends the id of the last received event when it reconnects
+        last_event_id = request.headers.get("Last-Event-ID", "")
+        if last_event_id:
+            cursor.update(self.parse_cursor(last_event_id))
+
+        timezone = args.get("timezone", get_dotenv_value("DEFAULT_USER_TIMEZONE", "UTC"))
+        Localization.get().set_timezone(timezone)
+
+        return Response(
+            self.stream(ctxid, cursor),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    def stream(self, ctxid: str, cursor: dict):
+        seen = None
+        shown = None  # progress and pause state last sent
+        while True:
+            version = state_monitor.get_context_version(ctxid)
+            if version == seen:
+                # nothing to do until this context, the chats list or notifications change,
+                # idle streams only send keepalives
+                if state_monitor.wait_for_context_change(ctxid, seen, STREAM_HEARTBEAT) == seen:
+                    yield ": keepalive\n\n"
+                continue
+            seen = version
+
+            # a reset log or restarted notifications are sent from the start
+            context = AgentContext.get(ctxid) if ctxid else None
+            log_from = cursor["log_version"]
+            if not context or context.log.guid != cursor["log_guid"]:
+                log_from = 0
+            notifications_from = cursor["notifications_version"]
+            if AgentContext.get_notification_manager().guid != cursor["notifications_guid"]:
+                notifications_from = 0
+
+            state = self.get_state(
+                ctxid,
+                log_from,
+                notifications_from,
+                contexts=cursor["contexts_version"] != state_monitor.get_contexts_version(),
+            )
+            state_shown = (state["log_progress"], state["log_progress_active"], state["paused"])
+            changed = (
+                state["deselect_chat"]
+                or "contexts" in state
+                or state_shown != shown
+                or state["log_guid"] != cursor["log_guid"]
+                or state["log_version"] != cursor["log_version"]
+                or state["notifications_guid"] != cursor["notifications_guid"]
+                or state["notifications_version"] != cursor["notifications_version"]
+            )
+            if not changed:
+                continue
+
+            shown = state_shown
+            cursor["log_guid"] = state["log_guid"]
+            cursor["log_version"] = state["log_version"]
+            cursor["notifications_guid"] = state["notifications_guid"]
+            cursor["notifications_version"] = state["notifications_version"]
+            if "contexts_version" in state:
+                cursor["contexts_version"] = state["contexts_version"]
+
+            yield f"id: {self.format_cursor(cursor)}\ndata: {json.dumps(state)}\n\n"
+            if state["deselect_chat"]:
+                return  # the client selects another chat and opens a new stream
+            time.sleep(STREAM_MIN_INTERVAL)
+
+    @staticmethod
+    def format_cursor(cursor: dict) -> str:
+        return "|".join(
+            str(cursor[key])
+            for key in (
+                "log_guid",
+                "log_version",
+                "notifications_guid",
+                "notifications_version",
+                "contexts_version",
+            )
+        )
+
+    @staticmethod
+    def parse_cursor(value: str) -> dict:
+        try:
+            log_guid, log_version, notifications_guid, notifications_version, contexts_version = value.split("|")
+            return {
+                "log_guid": log_guid,
+                "log_version": int(log_version),
+                "notifications_guid": notifications_guid,
+                "notifications_version": int(notifications_version),
+                "contexts_version": int(contexts_version),
+            }
+        except ValueError:
+            return {}
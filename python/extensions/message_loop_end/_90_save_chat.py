@@ -9,4 +9,5 @@ class SaveChat(Extension):
         if self.agent.context.type == AgentContextType.BACKGROUND:
             return
 
-        persist_chat.save_tmp_chat(self.agent.context)
+        # only the changes since the last save, written in the background
+        persist_chat.journal_tmp_chat(self.agent.context)
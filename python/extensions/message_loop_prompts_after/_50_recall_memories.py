@@ -114,20 +114,18 @@ class RecallMemories(Extension):
         # get memory database
         db = await Memory.get(self.agent)
 
-        # search for general memories and fragments
-        memories = await db.search_similarity_threshold(
-            query=query,
-            limit=set["memory_recall_memories_max_search"],
+        # search for general memories and fragments, and for solutions, the query is embedded once
+        memories, solutions = await db.search_many(
+            queries=[query, query],
+            limit=[
+                set["memory_recall_memories_max_search"],
+                set["memory_recall_solutions_max_search"],
+            ],
             threshold=set["memory_recall_similarity_threshold"],
-            filter=f"area == '{Memory.Area.MAIN.value}' or area == '{Memory.Area.FRAGMENTS.value}'",  # exclude solutions
-        )
-
-        # search for solutions
-        solutions = await db.search_similarity_threshold(
-            query=query,
-            limit=set["memory_recall_solutions_max_search"],
-            threshold=set["memory_recall_similarity_threshold"],
-            filter=f"area == '{Memory.Area.SOLUTIONS.value}'",  # exclude solutions
+            filters=[
+                f"area == '{Memory.Area.MAIN.value}' or area == '{Memory.Area.FRAGMENTS.value}'",  # exclude solutions
+                f"area == '{Memory.Area.SOLUTIONS.value}'",
+            ],
         )
 
         if not memories and not solutions:
@@ -48,4 +48,4 @@ class LogFromStream(Extension):
         kvps.update(parsed)
 
         # update the log item
-        log_item.update(heading=heading, content=text, kvps=kvps)
\ No newline at end of file
+        log_item.update_stream(heading=heading, content=text, kvps=kvps)
\ No newline at end of file
@@ -28,8 +28,13 @@ class MaskResponseStreamChunk(Extension):
             # Update the stream data with processed chunk
             stream_data["chunk"] = processed_chunk
 
-            # Also mask the full text for consistency
-            stream_data["full"] = secrets_mgr.mask_values(stream_data["full"])
+            # Also mask the full text for consistency, incrementally so only the new part is processed
+            buffer_key = "_resp_stream_mask_buffer"
+            mask_buffer = agent.get_data(buffer_key)
+            if not mask_buffer:
+                mask_buffer = secrets_mgr.create_mask_buffer()
+                agent.set_data(buffer_key, mask_buffer)
+            stream_data["full"] = mask_buffer.update(stream_data["full"])
 
             # Print the processed chunk (this is where printing should happen)
             if processed_chunk:
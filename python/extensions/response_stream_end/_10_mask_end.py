@@ -23,6 +23,9 @@ class MaskResponseStreamEnd(Extension):
 
                 # Clean up the filter
                 agent.set_data(filter_key, None)
+
+            # Clean up the incrementally masked full text
+            agent.set_data("_resp_stream_mask_buffer", None)
         except Exception as e:
             # If masking fails, proceed without masking
             pass
@@ -1,4 +1,5 @@
 import json
+import re
 
 def try_parse(json_string: str):
     try:
@@ -15,6 +16,52 @@ def stringify(obj, **kwargs):
     return json.dumps(obj, ensure_ascii=False, **kwargs)
 
 
+def snapshot(obj):
+    """Structural copy of parsed containers; strings and scalars are immutable and shared."""
+    if isinstance(obj, dict):
+        return {k: snapshot(v) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [snapshot(v) for v in obj]
+    return obj
+
+
+# streaming parser states
+_START = "start"
+_VALUE = "value"
+_STRING = "string"
+_KEY_STRING = "key_string"
+_MULTILINE = "multiline"
+_NUMBER = "number"
+_UNQUOTED = "unquoted"
+_UNQUOTED_KEY = "unquoted_key"
+_OBJ_KEY = "obj_key"
+_OBJ_COLON = "obj_colon"
+_OBJ_AFTER = "obj_after"
+_ARR_ITEM = "arr_item"
+_ARR_AFTER = "arr_after"
+_ARR_COMMA = "arr_comma"
+_DONE = "done"
+
+_MISSING = object()
+_WAIT = -1
+
+_ESCAPES = {"b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t", '"': '"', "'": "'", "\\": "\\", "/": "/"}
+_LITERALS = {"t": ("true", True), "f": ("false", False), "n": ("null", None), "u": ("undefined", None)}
+_START_RE = re.compile(r'[{\["]')
+_WS_RE = re.compile(r"\s*")
+_STRING_SPECIAL_RE = {q: re.compile(r"[\\" + q + "]") for q in ('"', "'", "`")}
+_UNQUOTED_END_RE = re.compile(r"[:,}\]]")
+_UNQUOTED_KEY_END_RE = re.compile(r"[\s:,}\]]")
+
+
+class _Frame:
+    __slots__ = ("container", "key")
+
+    def __init__(self, container):
+        self.container = container
+        self.key = None
+
+
 class DirtyJson:
     def __init__(self):
         self._reset()
@@ -25,6 +72,19 @@ class DirtyJson:
         self.current_char = None
         self.result = None
         self.stack = []
+        # streaming state, see feed()
+        self._state = _START
+        self._frames: list[_Frame] = []
+        self._pending = ""
+        self._wait_pos = 0
+        self._fed_text = ""
+        self._token: list[str] = []
+        self._quote = ""
+        self._escape: str | None = None
+        self._comment = ""
+        self._provisional = _MISSING
+        self._undo: tuple | None = None
+        self._stream_error: Exception | None = None
 
     @staticmethod
     def parse_string(json_string):
@@ -51,13 +111,42 @@ class DirtyJson:
         self._parse()
         return self.result
 
-    def feed(self, chunk):
-        self.json_string += chunk
-        if not self.current_char and self.json_string:
-            self.current_char = self.json_string[0]
-        self._parse()
+    def feed(self, chunk: str):
+        """Resumable streaming parse: consume only the new chunk and return the partial result.
+
+        The returned value is the live result object. It is updated in place by later
+        feeds, so copy it (see snapshot()) before handing it to code that may mutate it.
+        """
+        if self._stream_error:
+            raise self._stream_error
+        self._undo_provisional()
+        if self._state == _DONE:
+            return self.result
+        self._pending += chunk
+        try:
+            pos = self._consume(self._pending)
+        except ValueError as e:
+            self._stream_error = e
+            raise
+        self._pending = self._pending[pos:] if self._state != _DONE else ""
+        self._write_provisional()
         return self.result
 
+    def feed_full(self, text: str):
+        """Feed the whole text received so far, parsing only the part not seen yet.
+
+        If the text no longer extends what was fed before (e.g. it was rewritten by
+        masking), the parser starts over.
+        """
+        fed = self._fed_text
+        if len(text) >= len(fed) and text.startswith(fed):
+            delta = text[len(fed):]
+        else:
+            self._reset()
+            delta = text
+        self._fed_text = text
+        return self.feed(delta)
+
     def _advance(self, count=1):
         self.index += count
         if self.index < len(self.json_string):
@@ -95,21 +184,7 @@ class DirtyJson:
             self._advance()
 
     def _parse(self):
-        if self.result is None:
-            self.result = self._parse_value()
-        else:
-            self._continue_parsing()
-
-    def _continue_parsing(self):
-        while self.current_char is not None:
-            if isinstance(self.result, dict):
-                self._parse_object_content()
-            elif isinstance(self.result, list):
-                self._parse_array_content()
-            elif isinstance(self.result, str):
-                self.result = self._parse_string()
-            else:
-                break
+        self.result = self._parse_value()
 
     def _parse_value(self):
         self._skip_whitespace()
@@ -333,3 +408,413 @@ class DirtyJson:
         chars = ["{", "[", '"']
         indices = [input_str.find(char) for char in chars if input_str.find(char) != -1]
         return min(indices) if indices else 0
+
+    # --- streaming parser ---
+    # Mirrors the recursive parser above as an explicit state machine, so parsing can stop
+    # at the end of any chunk and resume when the next one arrives. Values still being
+    # received are written into the result provisionally (the way parse() would return
+    # them for the same prefix) and withdrawn again before the next chunk is consumed.
+
+    def _consume(self, buf: str) -> int:
+        pos = 0
+        n = len(buf)
+        while pos < n and self._state != _DONE:
+            handler = self._handlers[self._state]
+            new_pos = handler(self, buf, pos)
+            if new_pos == _WAIT:
+                return self._wait_pos
+            pos = new_pos
+        return pos
+
+    def _skip_ws(self, buf: str, pos: int) -> int:
+        # whitespace and comments between tokens, returns _WAIT when input ends before a token
+        n = len(buf)
+        while True:
+            if self._comment == "//":
+                end = buf.find("\n", pos)
+                if end == -1:
+                    return self._wait_at(n)
+                pos = end + 1
+                self._comment = ""
+            elif self._comment == "/*":
+                end = buf.find("*/", pos)
+                if end == -1:
+                    # keep a trailing "*" in case the closing "/" comes next
+                    return self._wait_at(n - 1 if buf.endswith("*") else n)
+                pos = end + 2
+                self._comment = ""
+            pos = _WS_RE.match(buf, pos).end()  # type: ignore
+            if pos >= n:
+                return self._wait_at(pos)
+            if buf[pos] != "/":
+                return pos
+            if pos + 1 >= n:
+                return self._wait_at(pos)
+            if buf[pos + 1] in "/*":
+                self._comment = "/" + buf[pos + 1]
+                pos += 2
+            else:
+                return pos
+
+    def _stream_start(self, buf: str, pos: int) -> int:
+        m = _START_RE.search(buf, pos)
+        if not m:
+            return len(buf)
+        self._state = _VALUE
+        return m.start()
+
+    def _stream_value(self, buf: str, pos: int) -> int:
+        pos = self._skip_ws(buf, pos)
+        if pos < 0:
+            return pos
+        n = len(buf)
+        c = buf[pos]
+        if c == "{":
+            if pos + 1 >= n or (buf[pos + 1] == "{" and pos + 2 >= n):
+                self._provisional = {}
+                return self._wait_at(pos)
+            # "{{" skips one extra character, same as _parse_value + _parse_object
+            self._open({})
+            return pos + (3 if buf[pos + 1] == "{" else 1)
+        if c == "[":
+            self._open([])
+            return pos + 1
+        if c in "\"'`":
+            ahead = buf[pos + 1 : pos + 3]
+            if len(ahead) < 2 and ahead == c * len(ahead):
+                self._provisional = ""
+                return self._wait_at(pos)
+            self._quote = c
+            self._token = []
+            if ahead == c * 2:
+                self._state = _MULTILINE
+                return pos + 3
+            self._state = _STRING
+            return pos + 1
+        if c.isdigit() or c in "-+":
+            self._token = []
+            self._state = _NUMBER
+            return pos
+        literal = _LITERALS.get(c.lower())
+        if literal:
+            text, value = literal
+            ahead = buf[pos : pos + len(text)]
+            if ahead.lower() == text:
+                self._emit(value)
+                return pos + len(text)
+            if len(ahead) < len(text) and pos + len(ahead) == n and text.startswith(ahead.lower()):
+                self._provisional = ahead.strip()
+                return self._wait_at(pos)
+        self._token = []
+        self._state = _UNQUOTED
+        return pos
+
+    def _stream_string(self, buf: str, pos: int) -> int:
+        n = len(buf)
+        special = _STRING_SPECIAL_RE[self._quote]
+        while pos < n:
+            if self._escape is not None:
+                pos = self._stream_escape(buf, pos)
+                if self._state not in (_STRING, _KEY_STRING):
+                    return pos
+                continue
+            m = special.search(buf, pos)
+            if not m:
+                self._token.append(buf[pos:])
+                return n
+            self._token.append(buf[pos : m.start()])
+            pos = m.start() + 1
+            if buf[m.start()] == self._quote:
+                self._end_string()
+                return pos
+            self._escape = ""
+        return pos
+
+    def _stream_escape(self, buf: str, pos: int) -> int:
+        n = len(buf)
+        if self._escape == "":
+            c = buf[pos]
+            if c == "u":
+                self._escape = "u"
+            elif c in _ESCAPES:
+                self._token.append(_ESCAPES[c])
+                self._escape = None
+            else:
+                self._escape = None  # unknown escapes are dropped
+            return pos + 1
+        # \uXXXX, collecting up to 4 hex digits
+        while len(self._escape) < 5 and pos < n:
+            c = buf[pos]
+            if not c.isalnum():
+                # incomplete sequence ends the string as a literal, the character is not consumed
+                self._token.append("\\" + self._escape)
+                self._escape = None
+                self._end_string()
+                return pos
+            self._escape += c
+            pos += 1
+        if len(self._escape) == 5:
+            digits = self._escape[1:]
+            try:
+                self._token.append(chr(int(digits, 16)))
+            except ValueError:
+                self._token.append("\\u" + digits)
+            self._escape = None
+        return pos
+
+    def _end_string(self):
+        value = "".join(self._token)
+        self._token = []
+        if self._state == _KEY_STRING:
+            self._frames[-1].key = value
+            self._state = _OBJ_COLON
+        else:
+            self._emit(value)
+
+    def _stream_multiline(self, buf: str, pos: int) -> int:
+        end = buf.find(self._quote * 3, pos)
+        if end != -1:
+            self._token.append(buf[pos:end])
+            value = "".join(self._token).strip()
+            self._token = []
+            self._emit(value)
+            return end + 3
+        # hold back trailing quotes, they may be the start of the closing triple
+        stop = len(buf)
+        while stop > pos and len(buf) - stop < 2 and buf[stop - 1] == self._quote:
+            stop -= 1
+        self._token.append(buf[pos:stop])
+        return self._wait_at(stop)
+
+    def _stream_number(self, buf: str, pos: int) -> int:
+        n = len(buf)
+        start = pos
+        while pos < n and (buf[pos].isdigit() or buf[pos] in "-+.eE"):
+            pos += 1
+        self._token.append(buf[start:pos])
+        if pos == n:
+            return pos
+        self._emit(self._number_value("".join(self._token)))
+        self._token = []
+        return pos
+
+    @staticmethod
+    def _number_value(number_str: str):
+        try:
+            return int(number_str)
+        except ValueError:
+            return float(number_str)
+
+    def _stream_unquoted(self, buf: str, pos: int) -> int:
+        m = _UNQUOTED_END_RE.search(buf, pos)
+        if not m:
+            self._token.append(buf[pos:])
+            return len(buf)
+        self._token.append(buf[pos : m.start()])
+        value = "".join(self._token).strip()
+        self._token = []
+        self._emit(value)
+        return m.end()  # the terminator is consumed, same as _parse_unquoted_string
+
+    def _stream_unquoted_key(self, buf: str, pos: int) -> int:
+        m = _UNQUOTED_KEY_END_RE.search(buf, pos)
+        if not m:
+            self._token.append(buf[pos:])
+            return len(buf)
+        self._token.append(buf[pos : m.start()])
+        self._frames[-1].key = "".join(self._token)
+        self._token = []
+        self._state = _OBJ_COLON
+        return m.start()
+
+    def _stream_obj_key(self, buf: str, pos: int) -> int:
+        pos = self._skip_ws(buf, pos)
+        if pos < 0:
+            return pos
+        c = buf[pos]
+        if c == "}":
+            if pos + 1 >= len(buf):
+                return self._wait_at(pos)  # "}}" closes with both braces
+            self._close()
+            return pos + (2 if buf[pos + 1] == "}" else 1)
+        self._token = []
+        if c in "\"'":
+            self._quote = c
+            self._state = _KEY_STRING
+            return pos + 1
+        self._state = _UNQUOTED_KEY
+        return pos
+
+    def _stream_obj_colon(self, buf: str, pos: int) -> int:
+        pos = self._skip_ws(buf, pos)
+        if pos < 0:
+            return pos
+        self._state = _VALUE
+        return pos + 1 if buf[pos] == ":" else pos
+
+    def _stream_obj_after(self, buf: str, pos: int) -> int:
+        pos = self._skip_ws(buf, pos)
+        if pos < 0:
+            return pos
+        self._state = _OBJ_KEY
+        return pos + 1 if buf[pos] == "," else pos
+
+    def _stream_arr_item(self, buf: str, pos: int) -> int:
+        pos = self._skip_ws(buf, pos)
+        if pos < 0:
+            return pos
+        if buf[pos] == "]":
+            self._close()
+            return pos + 1
+        self._state = _VALUE
+        return pos
+
+    def _stream_arr_after(self, buf: str, pos: int) -> int:
+        pos = self._skip_ws(buf, pos)
+        if pos < 0:
+            return pos
+        c = buf[pos]
+        if c == ",":
+            self._state = _ARR_COMMA
+            return pos + 1
+        if c == "]":
+            self._close()
+            return pos + 1
+        self._close()  # anything else ends the array without being consumed
+        return pos
+
+    def _stream_arr_comma(self, buf: str, pos: int) -> int:
+        pos = self._skip_ws(buf, pos)
+        if pos < 0:
+            return pos
+        if buf[pos] == "]":
+            self._close()
+            return pos + 1
+        self._state = _VALUE
+        return pos
+
+    def _wait_at(self, pos: int) -> int:
+        # stop consuming at pos until more input arrives
+        self._wait_pos = pos
+        return _WAIT
+
+    def _attach(self, value):
+        if not self._frames:
+            self.result = value
+            return
+        frame = self._frames[-1]
+        if isinstance(frame.container, dict):
+            frame.container[frame.key] = value
+        else:
+            frame.container.append(value)
+
+    def _emit(self, value):
+        self._attach(value)
+        self._after_value()
+
+    def _open(self, container):
+        self._attach(container)
+        self._frames.append(_Frame(container))
+        self._state = _OBJ_KEY if isinstance(container, dict) else _ARR_ITEM
+
+    def _close(self):
+        self._frames.pop()
+        self._after_value()
+
+    def _after_value(self):
+        if not self._frames:
+            self._state = _DONE
+        elif isinstance(self._frames[-1].container, dict):
+            self._state = _OBJ_AFTER
+        else:
+            self._state = _ARR_AFTER
+
+    def _write_provisional(self):
+        state = self._state
+        value = self._provisional
+        self._provisional = _MISSING
+        if state == _UNQUOTED_KEY:
+            self._write_key("".join(self._token))
+            return
+        if state == _KEY_STRING:
+            self._write_key(self._partial_string())
+            return
+        if state == _OBJ_COLON:
+            self._write_key(self._frames[-1].key)
+            return
+        if state == _STRING:
+            value = self._partial_string()
+        elif state == _MULTILINE:
+            value = (self._joined_token() + self._pending).strip()
+        elif state == _UNQUOTED:
+            value = self._joined_token().strip()
+        elif state == _NUMBER:
+            try:
+                value = self._number_value("".join(self._token))
+            except ValueError:
+                return
+        elif state == _VALUE and value is _MISSING:
+            if self._frames and isinstance(self._frames[-1].container, dict):
+                value = None  # key without value yet
+        elif state != _VALUE:
+            return
+        if value is _MISSING:
+            return
+        if not self._frames:
+            self._undo = ("result", self.result)
+            self.result = value
+        elif isinstance(self._frames[-1].container, dict):
+            self._write_key(self._frames[-1].key, value)
+        else:
+            self._frames[-1].container.append(value)
+            self._undo = ("list", self._frames[-1].container)
+
+    def _partial_string(self) -> str:
+        value = self._joined_token()
+        if self._escape:
+            value += "\\" + self._escape  # unfinished \u sequence, kept literally
+        return value
+
+    def _joined_token(self) -> str:
+        # keep the joined text so the next chunk does not join all pieces again
+        value = "".join(self._token)
+        self._token = [value]
+        return value
+
+    def _write_key(self, key, value=None):
+        obj = self._frames[-1].container
+        self._undo = ("dict", obj, key, key in obj, obj.get(key))
+        obj[key] = value
+
+    def _undo_provisional(self):
+        undo = self._undo
+        if not undo:
+            return
+        self._undo = None
+        if undo[0] == "result":
+            self.result = undo[1]
+        elif undo[0] == "list":
+            undo[1].pop()
+        else:
+            _, obj, key, existed, old = undo
+            if existed:
+                obj[key] = old
+            else:
+                del obj[key]
+
+    _handlers = {
+        _START: _stream_start,
+        _VALUE: _stream_value,
+        _STRING: _stream_string,
+        _KEY_STRING: _stream_string,
+        _MULTILINE: _stream_multiline,
+        _NUMBER: _stream_number,
+        _UNQUOTED: _stream_unquoted,
+        _UNQUOTED_KEY: _stream_unquoted_key,
+        _OBJ_KEY: _stream_obj_key,
+        _OBJ_COLON: _stream_obj_colon,
+        _OBJ_AFTER: _stream_obj_after,
+        _ARR_ITEM: _stream_arr_item,
+        _ARR_AFTER: _stream_arr_after,
+        _ARR_COMMA: _stream_arr_comma,
+    }
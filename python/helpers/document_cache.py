@@ -0,0 +1,139 @@
+import hashlib
+import os
+import pickle
+import threading
+import uuid
+from dataclasses import dataclass, field
+
+import aiohttp
+import numpy as np
+
+from python.helpers import files
+from python.helpers.print_style import PrintStyle
+
+CACHE_DIR = "tmp/document_cache"  # shared by all contexts, entries are named by the hash of the document uri
+CACHE_FILE_EXT = ".cache"
+MAX_CACHE_SIZE = 1024 * 1024 * 1024  # bytes on disk, least recently used documents are evicted past it
+VERSION_TIMEOUT = 2.0  # seconds to wait for the headers of a web document
+
+_lock = threading.Lock()
+
+
+@dataclass
+class CachedDocument:
+    """Extracted content of a document version and its chunk indexes by index key"""
+
+    content: str
+    indexes: dict[str, tuple[list[str], np.ndarray]] = field(default_factory=dict)
+
+
+def get_index_key(embeddings_name: str, chunk_size: int, chunk_overlap: int) -> str:
+    """Chunks and vectors are only reused with the same embedding model and chunking"""
+    return f"{embeddings_name}:{chunk_size}:{chunk_overlap}"
+
+
+def get_file_version(path: str) -> str | None:
+    """Version of a local document, changes whenever the file is written"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return f"{stat.st_mtime_ns}:{stat.st_size}"
+
+
+async def get_remote_version(url: str) -> str | None:
+    """Version of a web document from its validators, None if the server sends none"""
+    try:
+        async with aiohttp.ClientSession() as session:
+            async with session.head(
+                url,
+                timeout=aiohttp.ClientTimeout(total=VERSION_TIMEOUT),
+                allow_redirects=True,
+            ) as response:
+                if response.status > 399:
+                    return None
+                etag = response.headers.get("etag", "")
+                modified = response.headers.get("last-modified", "")
+                length = response.headers.get("content-length", "")
+    except Exception:
+        return None
+    if not etag and not modified:
+        return None  # nothing tells a changed page apart, it is extracted every time
+    return f"{etag}:{modified}:{length}"
+
+
+def get(document_uri: str, version: str) -> CachedDocument | None:
+    """Cached document if it was stored for this version, blocking, run in an executor"""
+    path = _get_path(document_uri)
+    try:
+        with open(path, "rb") as f:
+            entry = pickle.load(f)
+        if entry["uri"] != document_uri or entry["version"] != version:
+            return None
+        os.utime(path)  # most recently used
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        PrintStyle.error(f"Error reading document cache {path}: {e}")
+        return None
+    return CachedDocument(content=entry["content"], indexes=entry["indexes"])
+
+
+def put(document_uri: str, version: str, document: CachedDocument):
+    """Store the document for this version, replacing older versions, blocking, run in an executor"""
+    path = _get_path(document_uri)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # another context may write the same document, each writes its own temp file and the last replace wins
+    tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        with open(tmp, "wb") as f:
+            pickle.dump(
+                {
+                    "uri": document_uri,
+                    "version": version,
+                    "content": document.content,
+                    "indexes": document.indexes,
+                },
+                f,
+            )
+        os.replace(tmp, path)
+    except Exception as e:
+        PrintStyle.error(f"Error writing document cache {path}: {e}")
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        return
+    evict()
+
+
+def evict(max_size: int | None = None):
+    """Remove least recently used documents until the cache fits max_size"""
+    max_size = MAX_CACHE_SIZE if max_size is None else max_size
+    cache_dir = files.get_abs_path(CACHE_DIR)
+    with _lock:
+        entries = []
+        for entry in os.scandir(cache_dir):
+            if not entry.name.endswith(CACHE_FILE_EXT):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue  # evicted or replaced meanwhile
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= max_size:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+def clear():
+    files.delete_dir(CACHE_DIR)
+
+
+def _get_path(document_uri: str) -> str:
+    name = hashlib.sha256(document_uri.encode("utf-8")).hexdigest()
+    return files.get_abs_path(CACHE_DIR, name + CACHE_FILE_EXT)
@@ -0,0 +1,151 @@
+import asyncio
+import atexit
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import AsyncIterator, Callable
+
+EXTRACT_WORKERS = min(4, os.cpu_count() or 1)  # processes parsing documents, each takes a cpu core when busy
+PDF_PAGES_PER_TASK = 8  # pages a worker extracts at once, results stream back in page order
+
+_pool: ProcessPoolExecutor | None = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ProcessPoolExecutor:
+    """Process pool shared by all contexts, parsing there never blocks the event loop
+    and PDF pages are extracted in parallel, PyMuPDF only parses one document at a time per process"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawned, forking a server with running threads can leave locks held in the child
+            _pool = ProcessPoolExecutor(
+                max_workers=EXTRACT_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pool
+
+
+def shutdown():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+atexit.register(shutdown)
+
+
+async def run(func: Callable, *args):
+    """Run a picklable function in the pool, cancelling the task cancels it if not started yet"""
+    return await asyncio.wrap_future(get_pool().submit(func, *args))
+
+
+async def extract_pdf(path: str) -> AsyncIterator[str]:
+    """Text of a PDF file in page order, ranges of PDF_PAGES_PER_TASK pages are extracted
+    in parallel and yielded as soon as the ranges before them are done"""
+    pages = await run(pdf_page_count, path)
+    pool = get_pool()
+    futures: list[Future] = [
+        pool.submit(extract_pdf_pages, path, start, min(start + PDF_PAGES_PER_TASK, pages))
+        for start in range(0, pages, PDF_PAGES_PER_TASK)
+    ]
+    try:
+        for future in futures:
+            yield await asyncio.wrap_future(future)
+    finally:
+        # stopped early by an intervention or an error, ranges not started yet are dropped
+        for future in futures:
+            future.cancel()
+
+
+# functions below run in the worker processes
+
+
+def pdf_page_count(path: str) -> int:
+    import pymupdf
+
+    with pymupdf.open(path) as doc:
+        return doc.page_count
+
+
+def extract_pdf_pages(path: str, start: int, end: int) -> str:
+    """Text of pages start to end (exclusive) with tables as markdown and images OCRed,
+    OCR of the rendered pages if there is no text layer"""
+    import pymupdf
+    from langchain_community.document_loaders.blob_loaders import Blob
+    from langchain_community.document_loaders.parsers.images import TesseractBlobParser
+    from langchain_community.document_loaders.parsers.pdf import PyMuPDFParser
+    from python.helpers.print_style import PrintStyle
+
+    contents = ""
+    try:
+        with pymupdf.open(path) as doc:
+            doc.select(list(range(start, end)))
+            data = doc.tobytes()
+        parser = PyMuPDFParser(
+            mode="single",
+            extract_tables="markdown",
+            extract_images=True,
+            images_inner_format="text",
+            images_parser=TesseractBlobParser(),
+            pages_delimiter="\n",
+        )
+        contents = "\n".join(
+            element.page_content for element in parser.lazy_parse(Blob.from_data(data))
+        )
+    except Exception as e:
+        PrintStyle.error(
+            f"DocumentQueryHelper::handle_pdf_document: Error loading pages {start + 1}-{end} with PyMuPDF: {e}"
+        )
+
+    if not contents.strip():
+        import pdf2image
+        import pytesseract
+
+        # Convert PDF pages to images
+        images = pdf2image.convert_from_path(path, first_page=start + 1, last_page=end)  # type: ignore
+        contents = "".join(pytesseract.image_to_string(image) + "\n\n" for image in images)
+
+    return contents
+
+
+def extract_html(document: str, is_url: bool) -> str:
+    from langchain_community.document_loaders import AsyncHtmlLoader
+    from langchain_community.document_transformers import MarkdownifyTransformer
+    from langchain_core.documents import Document
+
+    if is_url:
+        parts: list[Document] = AsyncHtmlLoader(web_path=document).load()
+    else:
+        with open(document, "rb") as f:
+            parts = [Document(page_content=f.read().decode("utf-8"), metadata={"source": document})]
+
+    return "\n".join(
+        element.page_content
+        for element in MarkdownifyTransformer().transform_documents(parts)
+    )
+
+
+def extract_unstructured(document: str, is_url: bool) -> str:
+    from langchain_unstructured import UnstructuredLoader
+
+    if is_url:
+        loader = UnstructuredLoader(
+            web_url=document,
+            mode="single",
+            partition_via_api=False,
+            # chunking_strategy="by_page",
+            strategy="hi_res",
+        )
+    else:
+        loader = UnstructuredLoader(
+            file_path=document,
+            mode="single",
+            partition_via_api=False,
+            # chunking_strategy="by_page",
+            strategy="hi_res",
+        )
+    return "\n".join(element.page_content for element in loader.load())
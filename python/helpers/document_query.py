@@ -4,32 +4,38 @@ import asyncio
 import aiohttp
 import json
 
+import numpy as np
+
 from python.helpers.vector_db import VectorDB
+from python.helpers import document_cache, document_extract
+from python.helpers.document_cache import CachedDocument
 
-os.environ["USER_AGENT"] = "@mixedbread-ai/unstructured"  # noqa E402
-from langchain_unstructured import UnstructuredLoader  # noqa E402
+os.environ["USER_AGENT"] = "@mixedbread-ai/unstructured"  # noqa E402, inherited by extraction workers
 
 from urllib.parse import urlparse
-from typing import Callable, Sequence, List, Optional, Tuple
+from contextlib import aclosing
+from typing import AsyncIterator, Awaitable, Callable, Sequence, List, Optional, Tuple, TypeVar
 from datetime import datetime
 
 from langchain_community.document_loaders import AsyncHtmlLoader
 from langchain_community.document_loaders.text import TextLoader
-from langchain_community.document_loaders.pdf import PyMuPDFLoader
-from langchain_community.document_transformers import MarkdownifyTransformer
-from langchain_community.document_loaders.parsers.images import TesseractBlobParser
 
 from langchain_core.documents import Document
 from langchain.schema import SystemMessage, HumanMessage
 
 from python.helpers.print_style import PrintStyle
-from python.helpers import files, errors
-from agent import Agent
+from python.helpers import files, errors, tokens
+from agent import Agent, InterventionException
 
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 
 
 DEFAULT_SEARCH_THRESHOLD = 0.5
+QUERY_OPTIMIZATION_CONCURRENCY = 4  # utility model calls at once when optimizing the questions
+DOCUMENT_QA_CONTEXT_RATIO = 0.7  # share of the chat model context for the chunks and questions
+INTERVENTION_POLL_INTERVAL = 0.5  # seconds between intervention checks while a document is extracted
+
+T = TypeVar("T")
 
 
 class DocumentQueryStore:
@@ -41,6 +47,8 @@ class DocumentQueryStore:
     # Default chunking parameters
     DEFAULT_CHUNK_SIZE = 1000
     DEFAULT_CHUNK_OVERLAP = 100
+    # Chunks embedded per batch while a document is still being extracted
+    EMBED_BATCH_SIZE = 64
 
     # Cache for initialized stores
     _stores: dict[str, "DocumentQueryStore"] = {}
@@ -98,7 +106,11 @@ class DocumentQueryStore:
         return VectorDB(self.agent, cache=True)
 
     async def add_document(
-        self, text: str, document_uri: str, metadata: dict | None = None
+        self,
+        text: str,
+        document_uri: str,
+        metadata: dict | None = None,
+        cached: CachedDocument | None = None,
     ) -> tuple[bool, list[str]]:
         """
         Add a document to the store with the given URI.
@@ -107,6 +119,37 @@ class DocumentQueryStore:
             text: The document text content
             document_uri: The URI that uniquely identifies this document
             metadata: Optional metadata for the document
+            cached: Optional cache entry of the document, its chunks and vectors are
+                reused when present and added to it otherwise
+
+        Returns:
+            True if successful, False otherwise
+        """
+
+        async def parts():
+            yield text
+
+        return await self.add_document_parts(parts(), document_uri, metadata, cached)
+
+    async def add_document_parts(
+        self,
+        parts: AsyncIterator[str],
+        document_uri: str,
+        metadata: dict | None = None,
+        cached: CachedDocument | None = None,
+    ) -> tuple[bool, list[str]]:
+        """
+        Add a document to the store from its text parts as they are extracted.
+
+        Chunks are split and embedded in batches while later parts are still
+        being extracted, instead of once the whole document is in memory.
+
+        Args:
+            parts: The document text content in parts, joined by newlines
+            document_uri: The URI that uniquely identifies this document
+            metadata: Optional metadata for the document
+            cached: Optional cache entry of the document, its chunks and vectors are
+                reused when present and added to it otherwise
 
         Returns:
             True if successful, False otherwise
@@ -122,38 +165,86 @@ class DocumentQueryStore:
         doc_metadata["document_uri"] = document_uri
         doc_metadata["timestamp"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
-        # Split text into chunks
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=self.DEFAULT_CHUNK_SIZE, chunk_overlap=self.DEFAULT_CHUNK_OVERLAP
-        )
-        chunks = text_splitter.split_text(text)
-
-        # Create documents
-        docs = []
-        for i, chunk in enumerate(chunks):
-            chunk_metadata = doc_metadata.copy()
-            chunk_metadata["chunk_index"] = i
-            chunk_metadata["total_chunks"] = len(chunks)
-            docs.append(Document(page_content=chunk, metadata=chunk_metadata))
-
-        if not docs:
-            PrintStyle.error(f"No chunks created for document: {document_uri}")
-            return False, []
-
+        embedding: asyncio.Task | None = None
         try:
             # Initialize vector db if not already initialized
             if not self.vector_db:
                 self.vector_db = self.init_vector_db()
+            vector_db = self.vector_db
 
-            ids = await self.vector_db.insert_documents(docs)
+            index_key = document_cache.get_index_key(
+                vector_db.embeddings_name,
+                self.DEFAULT_CHUNK_SIZE,
+                self.DEFAULT_CHUNK_OVERLAP,
+            )
+            if cached and index_key in cached.indexes:
+                # chunked and embedded before, by this or another context
+                chunks, vectors = cached.indexes[index_key]
+                async for _ in parts:
+                    pass
+            else:
+                chunks: list[str] = []
+                batches: list[list[list[float]]] = []
+
+                async def embed(batch: list[str], previous: asyncio.Task | None):
+                    # one batch in flight at a time, extraction goes on meanwhile
+                    if previous:
+                        await previous
+                    if batch:
+                        batches.append(await vector_db.embeddings.aembed_documents(batch))
+
+                # Split text into chunks, the last chunk of a batch may continue in the next part
+                text_splitter = RecursiveCharacterTextSplitter(
+                    chunk_size=self.DEFAULT_CHUNK_SIZE,
+                    chunk_overlap=self.DEFAULT_CHUNK_OVERLAP,
+                )
+                pending = ""
+                async for part in parts:
+                    pending = f"{pending}\n{part}" if pending else part
+                    if len(pending) < self.EMBED_BATCH_SIZE * self.DEFAULT_CHUNK_SIZE:
+                        continue
+                    split = text_splitter.split_text(pending)
+                    pending = split.pop() if split else ""
+                    chunks.extend(split)
+                    embedding = asyncio.create_task(embed(split, embedding))
+                last = text_splitter.split_text(pending)
+                chunks.extend(last)
+                embedding = asyncio.create_task(embed(last, embedding))
+                await embedding
+                embedding = None
+                vectors = np.asarray(
+                    [vector for batch in batches for vector in batch], dtype=np.float32
+                )
+
+                if cached is not None and chunks:
+                    cached.indexes[index_key] = (chunks, vectors)
+
+            # Create documents
+            docs = []
+            for i, chunk in enumerate(chunks):
+                chunk_metadata = doc_metadata.copy()
+                chunk_metadata["chunk_index"] = i
+                chunk_metadata["total_chunks"] = len(chunks)
+                docs.append(Document(page_content=chunk, metadata=chunk_metadata))
+
+            if not docs:
+                PrintStyle.error(f"No chunks created for document: {document_uri}")
+                return False, []
+
+            ids = await vector_db.insert_embedded_documents(docs, vectors.tolist())
             PrintStyle.standard(
                 f"Added document '{document_uri}' with {len(docs)} chunks"
             )
             return True, ids
+        except InterventionException:
+            raise
         except Exception as e:
             err_text = errors.format_error(e)
             PrintStyle.error(f"Error adding document '{document_uri}': {err_text}")
             return False, []
+        finally:
+            if embedding:
+                embedding.cancel()
 
     async def get_document(self, document_uri: str) -> Optional[Document]:
         """
@@ -310,6 +401,44 @@ class DocumentQueryStore:
             PrintStyle.error(f"Error searching documents: {str(e)}")
             return []
 
+    async def search_documents_many(
+        self,
+        queries: List[str],
+        limit: int = 10,
+        threshold: float = 0.5,
+        filter: str = "",
+    ) -> List[List[Tuple[Document, float]]]:
+        """
+        Search for documents similar to each of the queries in a single pass.
+
+        Args:
+            queries: The search query strings
+            limit: Maximum number of results to return per query
+            threshold: Minimum similarity score threshold (0-1)
+            filter: Metadata filter, document_uri conditions select the chunks to score
+
+        Returns:
+            List of matching documents with their similarity scores for each query
+        """
+
+        # DB not initialized, no documents inside
+        if not self.vector_db or not queries:
+            return [[] for _ in queries]
+
+        # Perform search
+        try:
+            results = await self.vector_db.search_many_by_similarity_threshold(
+                queries=queries, limit=limit, threshold=threshold, filter=filter
+            )
+
+            PrintStyle.standard(
+                f"Search of {len(queries)} queries returned {sum(len(r) for r in results)} results"
+            )
+            return results
+        except Exception as e:
+            PrintStyle.error(f"Error searching documents: {str(e)}")
+            return [[] for _ in queries]
+
     async def search_document(
         self, document_uri: str, query: str, limit: int = 10, threshold: float = 0.5
     ) -> List[Document]:
@@ -373,40 +502,35 @@ class DocumentQueryHelper:
             *[self.document_get_content(uri, True) for uri in document_uris]
         )
         await self.agent.handle_intervention()
-        selected_chunks = {}
-        for question in questions:
-            self.progress_callback(f"Optimizing query: {question}")
-            await self.agent.handle_intervention()
-            human_content = f'Search Query: "{question}"'
-            system_content = self.agent.parse_prompt(
-                "fw.document_query.optmimize_query.md"
-            )
 
-            optimized_query = (
-                await self.agent.call_utility_model(
-                    system=system_content, message=human_content
-                )
-            ).strip()
-
-            await self.agent.handle_intervention()
-            self.progress_callback(f"Searching documents with query: {optimized_query}")
-
-            normalized_uris = [self.store.normalize_uri(uri) for uri in document_uris]
-            doc_filter = " or ".join(
-                [f"document_uri == '{uri}'" for uri in normalized_uris]
-            )
+        # all questions are optimized concurrently and searched in a single pass
+        optimized_queries = await self.optimize_queries(questions)
+        await self.agent.handle_intervention()
+        self.progress_callback(
+            f"Searching documents with queries: {json.dumps(optimized_queries)}"
+        )
 
-            chunks = await self.store.search_documents(
-                query=optimized_query,
-                limit=100,
-                threshold=DEFAULT_SEARCH_THRESHOLD,
-                filter=doc_filter,
-            )
+        normalized_uris = [self.store.normalize_uri(uri) for uri in document_uris]
+        doc_filter = " or ".join(
+            [f"document_uri == '{uri}'" for uri in normalized_uris]
+        )
 
-            self.progress_callback(f"Found {len(chunks)} chunks")
+        results = await self.store.search_documents_many(
+            queries=optimized_queries,
+            limit=100,
+            threshold=DEFAULT_SEARCH_THRESHOLD,
+            filter=doc_filter,
+        )
+        found_ids = {doc.metadata["id"] for found in results for doc, _ in found}
+        self.progress_callback(f"Found {len(found_ids)} chunks")
 
-            for chunk in chunks:
-                selected_chunks[chunk.metadata["id"]] = chunk
+        questions_str = "\n".join([f" *  {question}" for question in questions])
+        qa_system_message = self.agent.parse_prompt(
+            "fw.document_query.system_prompt.md"
+        )
+        selected_chunks = self.select_chunks(
+            results, self.get_chunks_budget(qa_system_message, questions_str)
+        )
 
         if not selected_chunks:
             self.progress_callback("No relevant content found in the documents")
@@ -418,13 +542,8 @@ class DocumentQueryHelper:
         )
         await self.agent.handle_intervention()
 
-        questions_str = "\n".join([f" *  {question}" for question in questions])
         content = "\n\n----\n\n".join(
-            [chunk.page_content for chunk in selected_chunks.values()]
-        )
-
-        qa_system_message = self.agent.parse_prompt(
-            "fw.document_query.system_prompt.md"
+            [chunk.page_content for chunk in selected_chunks]
         )
         qa_user_message = f"# Document:\n{content}\n\n# Queries:\n{questions_str}"
 
@@ -439,6 +558,63 @@ class DocumentQueryHelper:
 
         return True, str(ai_response)
 
+    async def optimize_queries(self, questions: Sequence[str]) -> List[str]:
+        """Search queries for the questions from the utility model, at most
+        QUERY_OPTIMIZATION_CONCURRENCY calls at once"""
+        semaphore = asyncio.Semaphore(QUERY_OPTIMIZATION_CONCURRENCY)
+        system_content = self.agent.parse_prompt(
+            "fw.document_query.optmimize_query.md"
+        )
+
+        async def optimize(question: str) -> str:
+            async with semaphore:
+                self.progress_callback(f"Optimizing query: {question}")
+                await self.agent.handle_intervention()
+                human_content = f'Search Query: "{question}"'
+                return (
+                    await self.agent.call_utility_model(
+                        system=system_content, message=human_content
+                    )
+                ).strip()
+
+        return list(await asyncio.gather(*[optimize(q) for q in questions]))
+
+    def get_chunks_budget(self, system_message: str, questions: str) -> int:
+        """Tokens left for document chunks in the chat model's context, 0 if unknown"""
+        ctx_length = self.agent.config.chat_model.ctx_length
+        if not ctx_length:
+            return 0
+        used = tokens.approximate_tokens(system_message) + tokens.approximate_tokens(
+            questions
+        )
+        return max(0, int(ctx_length * DOCUMENT_QA_CONTEXT_RATIO) - used)
+
+    def select_chunks(
+        self, results: List[List[Tuple[Document, float]]], budget: int
+    ) -> List[Document]:
+        """Chunks for the answer, taking the best remaining chunk of each query in turn
+        so every question gets context, until the token budget is used (0 for no budget)"""
+        selected: dict[str, Document] = {}
+        used = 0
+        chunk_tokens: dict[str, int] = {}
+        if budget:
+            # all candidates are counted in one batch
+            candidates = {found[0].metadata["id"]: found[0] for query in results for found in query}
+            counts = tokens.approximate_tokens_batch([c.page_content for c in candidates.values()])
+            chunk_tokens = dict(zip(candidates, counts))
+        for rank in range(max((len(found) for found in results), default=0)):
+            for found in results:
+                if rank >= len(found):
+                    continue
+                chunk = found[rank][0]
+                if chunk.metadata["id"] in selected:
+                    continue
+                if budget and used + chunk_tokens[chunk.metadata["id"]] > budget:
+                    continue  # a shorter chunk may still fit
+                selected[chunk.metadata["id"]] = chunk
+                used += chunk_tokens.get(chunk.metadata["id"], 0)
+        return list(selected.values())
+
     async def document_get_content(
         self, document_uri: str, add_to_db: bool = False
     ) -> str:
@@ -511,31 +687,77 @@ class DocumentQueryHelper:
         exists = await self.store.document_exists(document_uri_norm)
         document_content = ""
         if not exists:
+            # extracted content, chunks and vectors are cached on disk for unchanged documents
+            loop = asyncio.get_running_loop()
+            version = await self.get_document_version(document_uri, scheme)
+            cached = None
+            if version:
+                cached = await loop.run_in_executor(
+                    None, document_cache.get, document_uri_norm, version
+                )
+            cache_hit = cached is not None
+            if version and not cached:
+                cached = CachedDocument(content="")
+            indexes = len(cached.indexes) if cached else 0
             await self.agent.handle_intervention()
-            if mimetype.startswith("image/"):
-                document_content = self.handle_image_document(document_uri, scheme)
-            elif mimetype == "text/html":
-                document_content = self.handle_html_document(document_uri, scheme)
-            elif mimetype.startswith("text/") or mimetype == "application/json":
-                document_content = self.handle_text_document(document_uri, scheme)
-            elif mimetype == "application/pdf":
-                document_content = self.handle_pdf_document(document_uri, scheme)
+
+            extracted: list[str] = []
+            extraction_errors: list[Exception] = []
+
+            async def extract_parts():
+                # extraction errors are raised as they are, not as a failed indexing
+                parts = self.extract_document(document_uri, scheme, mimetype)
+                try:
+                    while True:
+                        try:
+                            part = await self.await_intervenable(anext(parts))
+                        except StopAsyncIteration:
+                            break
+                        extracted.append(part)
+                        yield part
+                except Exception as e:
+                    extraction_errors.append(e)
+                    raise
+                finally:
+                    await parts.aclose()
+
+            success, ids = True, []
+            if cached and cache_hit:
+                self.progress_callback(f"Using cached document content")
+                document_content = cached.content
+                if add_to_db:
+                    self.progress_callback(f"Indexing document")
+                    success, ids = await self.store.add_document(
+                        document_content, document_uri_norm, cached=cached
+                    )
+            elif add_to_db:
+                # chunks are embedded while later pages are still being extracted
+                self.progress_callback(f"Extracting and indexing document")
+                success, ids = await self.store.add_document_parts(
+                    extract_parts(), document_uri_norm, cached=cached
+                )
             else:
-                document_content = self.handle_unstructured_document(
-                    document_uri, scheme
+                async for _ in extract_parts():
+                    pass
+            if extraction_errors:
+                raise extraction_errors[0]
+            if not success:
+                self.progress_callback(f"Failed to index document")
+                raise ValueError(
+                    f"DocumentQueryHelper::document_get_content: Failed to index document: {document_uri_norm}"
                 )
             if add_to_db:
-                self.progress_callback(f"Indexing document")
-                await self.agent.handle_intervention()
-                success, ids = await self.store.add_document(
-                    document_content, document_uri_norm
-                )
-                if not success:
-                    self.progress_callback(f"Failed to index document")
-                    raise ValueError(
-                        f"DocumentQueryHelper::document_get_content: Failed to index document: {document_uri_norm}"
-                    )
                 self.progress_callback(f"Indexed {len(ids)} chunks")
+
+            if not cache_hit:
+                document_content = "\n".join(extracted)
+            if version and cached:
+                if not cache_hit:
+                    cached.content = document_content
+                if not cache_hit or len(cached.indexes) > indexes:
+                    await loop.run_in_executor(
+                        None, document_cache.put, document_uri_norm, version, cached
+                    )
         else:
             await self.agent.handle_intervention()
             doc = await self.store.get_document(document_uri_norm)
@@ -547,36 +769,62 @@ class DocumentQueryHelper:
                 )
         return document_content
 
-    def handle_image_document(self, document: str, scheme: str) -> str:
-        return self.handle_unstructured_document(document, scheme)
-
-    def handle_html_document(self, document: str, scheme: str) -> str:
+    async def get_document_version(self, document: str, scheme: str) -> str | None:
+        if scheme == "file":
+            return document_cache.get_file_version(document)
         if scheme in ["http", "https"]:
-            loader = AsyncHtmlLoader(web_path=document)
-            parts: list[Document] = loader.load()
-        elif scheme == "file":
-            # Use RFC file operations instead of TextLoader
-            file_content_bytes = files.read_file_bin(document)
-            file_content = file_content_bytes.decode("utf-8")
-            # Create Document manually since we're not using TextLoader
-            parts = [Document(page_content=file_content, metadata={"source": document})]
+            return await document_cache.get_remote_version(document)
+        return None
+
+    async def await_intervenable(self, awaitable: Awaitable[T]) -> T:
+        """Await a long extraction step, checking for interventions meanwhile,
+        an intervention cancels the step and the extraction tasks it started"""
+        task = asyncio.ensure_future(awaitable)
+        try:
+            while not task.done():
+                await asyncio.wait([task], timeout=INTERVENTION_POLL_INTERVAL)
+                await self.agent.handle_intervention()
+            return task.result()
+        finally:
+            task.cancel()
+
+    async def extract_document(
+        self, document: str, scheme: str, mimetype: str
+    ) -> AsyncIterator[str]:
+        """Text of the document in parts, all parsing runs off the event loop"""
+        if mimetype == "application/pdf":
+            async with aclosing(self.handle_pdf_document(document, scheme)) as parts:
+                async for part in parts:
+                    yield part
+        elif mimetype.startswith("image/"):
+            yield await self.handle_image_document(document, scheme)
+        elif mimetype == "text/html":
+            yield await self.handle_html_document(document, scheme)
+        elif mimetype.startswith("text/") or mimetype == "application/json":
+            yield await self.handle_text_document(document, scheme)
         else:
-            raise ValueError(f"Unsupported scheme: {scheme}")
+            yield await self.handle_unstructured_document(document, scheme)
 
-        return "\n".join(
-            [
-                element.page_content
-                for element in MarkdownifyTransformer().transform_documents(parts)
-            ]
+    async def handle_image_document(self, document: str, scheme: str) -> str:
+        return await self.handle_unstructured_document(document, scheme)
+
+    async def handle_html_document(self, document: str, scheme: str) -> str:
+        if scheme not in ["http", "https", "file"]:
+            raise ValueError(f"Unsupported scheme: {scheme}")
+        return await document_extract.run(
+            document_extract.extract_html, document, scheme != "file"
         )
 
-    def handle_text_document(self, document: str, scheme: str) -> str:
+    async def handle_text_document(self, document: str, scheme: str) -> str:
+        loop = asyncio.get_running_loop()
         if scheme in ["http", "https"]:
             loader = AsyncHtmlLoader(web_path=document)
-            elements: list[Document] = loader.load()
+            elements: list[Document] = await loop.run_in_executor(None, loader.load)
         elif scheme == "file":
             # Use RFC file operations instead of TextLoader
-            file_content_bytes = files.read_file_bin(document)
+            file_content_bytes = await loop.run_in_executor(
+                None, files.read_file_bin, document
+            )
             file_content = file_content_bytes.decode("utf-8")
             # Create Document manually since we're not using TextLoader
             elements = [
@@ -587,112 +835,49 @@ class DocumentQueryHelper:
 
         return "\n".join([element.page_content for element in elements])
 
-    def handle_pdf_document(self, document: str, scheme: str) -> str:
+    async def handle_pdf_document(self, document: str, scheme: str) -> AsyncIterator[str]:
         temp_file_path = ""
         if scheme == "file":
-            # Use RFC file operations to read the PDF file as binary
-            file_content_bytes = files.read_file_bin(document)
-            # Create a temporary file for PyMuPDFLoader since it needs a file path
-            import tempfile
-
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as temp_file:
-                temp_file.write(file_content_bytes)
-                temp_file_path = temp_file.name
+            pdf_path = files.get_abs_path(document)
         elif scheme in ["http", "https"]:
-            # download the file from the web url to a temporary file using python libraries for downloading
-            import requests
-            import tempfile
+            # download the file from the web url to a temporary file, off the event loop
+            def download() -> str:
+                import requests
+                import tempfile
 
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as temp_file:
                 response = requests.get(document, timeout=10.0)
                 if response.status_code != 200:
                     raise ValueError(
                         f"DocumentQueryHelper::handle_pdf_document: Failed to download PDF from {document}: {response.status_code}"
                     )
-                temp_file.write(response.content)
-                temp_file_path = temp_file.name
+                with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as temp_file:
+                    temp_file.write(response.content)
+                    return temp_file.name
+
+            temp_file_path = await asyncio.get_running_loop().run_in_executor(
+                None, download
+            )
+            pdf_path = temp_file_path
         else:
             raise ValueError(f"Unsupported scheme: {scheme}")
 
-        if not os.path.exists(temp_file_path):
+        if not os.path.exists(pdf_path):
             raise ValueError(
-                f"DocumentQueryHelper::handle_pdf_document: Temporary file not found: {temp_file_path}"
+                f"DocumentQueryHelper::handle_pdf_document: File not found: {pdf_path}"
             )
 
         try:
-            try:
-                loader = PyMuPDFLoader(
-                    temp_file_path,
-                    mode="single",
-                    extract_tables="markdown",
-                    extract_images=True,
-                    images_inner_format="text",
-                    images_parser=TesseractBlobParser(),
-                    pages_delimiter="\n",
-                )
-                elements: list[Document] = loader.load()
-                contents = "\n".join([element.page_content for element in elements])
-            except Exception as e:
-                PrintStyle.error(
-                    f"DocumentQueryHelper::handle_pdf_document: Error loading with PyMuPDF: {e}"
-                )
-                contents = ""
-
-            if not contents:
-                import pdf2image
-                import pytesseract
-
-                PrintStyle.debug(
-                    f"DocumentQueryHelper::handle_pdf_document: FALLBACK Converting PDF to images: {temp_file_path}"
-                )
-
-                # Convert PDF to images
-                pages = pdf2image.convert_from_path(temp_file_path)  # type: ignore
-                for page in pages:
-                    contents += pytesseract.image_to_string(page) + "\n\n"
-
-            return contents
+            # pages are extracted in parallel worker processes and arrive in order
+            async with aclosing(document_extract.extract_pdf(pdf_path)) as parts:
+                async for part in parts:
+                    yield part
         finally:
-            os.unlink(temp_file_path)
-
-    def handle_unstructured_document(self, document: str, scheme: str) -> str:
-        elements: list[Document] = []
-        if scheme in ["http", "https"]:
-            # loader = UnstructuredURLLoader(urls=[document], mode="single")
-            loader = UnstructuredLoader(
-                web_url=document,
-                mode="single",
-                partition_via_api=False,
-                # chunking_strategy="by_page",
-                strategy="hi_res",
-            )
-            elements = loader.load()
-        elif scheme == "file":
-            # Use RFC file operations to read the file as binary
-            file_content_bytes = files.read_file_bin(document)
-            # Create a temporary file for UnstructuredLoader since it needs a file path
-            import tempfile
-            import os
-
-            # Get file extension to preserve it for proper processing
-            _, ext = os.path.splitext(document)
-            with tempfile.NamedTemporaryFile(delete=False, suffix=ext) as temp_file:
-                temp_file.write(file_content_bytes)
-                temp_file_path = temp_file.name
-
-            try:
-                loader = UnstructuredLoader(
-                    file_path=temp_file_path,
-                    mode="single",
-                    partition_via_api=False,
-                    # chunking_strategy="by_page",
-                    strategy="hi_res",
-                )
-                elements = loader.load()
-            finally:
-                # Clean up temporary file
+            if temp_file_path:
                 os.unlink(temp_file_path)
-        else:
-            raise ValueError(f"Unsupported scheme: {scheme}")
 
-        return "\n".join([element.page_content for element in elements])
+    async def handle_unstructured_document(self, document: str, scheme: str) -> str:
+        if scheme not in ["http", "https", "file"]:
+            raise ValueError(f"Unsupported scheme: {scheme}")
+        return await document_extract.run(
+            document_extract.extract_unstructured, document, scheme != "file"
+        )
@@ -7,6 +7,10 @@ if TYPE_CHECKING:
 
 class Extension:
 
+    # system_prompt extensions: the rendered prompt is reused while prompt_builder.get_system_prompt_key
+    # stays the same, an extension reading other state adds it with system_prompt_key() or opts out here
+    cache_system_prompt: bool = True
+
     def __init__(self, agent: "Agent|None", **kwargs):
         self.agent: "Agent" = agent # type: ignore < here we ignore the type check as there are currently no extensions without an agent
         self.kwargs = kwargs
@@ -15,9 +19,19 @@ class Extension:
     async def execute(self, **kwargs) -> Any:
         pass
 
+    def system_prompt_key(self) -> Any:
+        """Comparable value of the state a system_prompt extension reads beyond the default key, None if none"""
+        return None
+
 
 async def call_extensions(extension_point: str, agent: "Agent|None" = None, **kwargs) -> Any:
+    # call extensions
+    for cls in await get_extension_classes(extension_point, agent):
+        await cls(agent=agent).execute(**kwargs)
 
+
+async def get_extension_classes(extension_point: str, agent: "Agent|None" = None) -> list[type[Extension]]:
+    """Extension classes of the point in call order, the agent profile's override defaults by file name"""
     # get default extensions
     defaults = await _get_extensions("python/extensions/" + extension_point)
     classes = defaults
@@ -34,9 +48,7 @@ async def call_extensions(extension_point: str, agent: "Agent|None" = None, **kw
             # sort by name
             classes = sorted(unique.values(), key=lambda cls: _get_file_from_module(cls.__module__))
 
-    # call extensions
-    for cls in classes:
-        await cls(agent=agent).execute(**kwargs)
+    return classes
 
 
 def _get_file_from_module(module_name: str) -> str:
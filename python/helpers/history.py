@@ -76,11 +76,12 @@ class Record:
 
 
 class Message(Record):
-    def __init__(self, ai: bool, content: MessageContent, tokens: int = 0):
+    def __init__(self, ai: bool, content: MessageContent, tokens: int = 0, count: bool = True):
         self.ai = ai
         self.content = content
         self.summary: str = ""
-        self.tokens: int = tokens or self.calculate_tokens()
+        # without count, a missing token count is left for get_tokens or a batch count
+        self.tokens: int = tokens or (self.calculate_tokens() if count else 0)
 
     def get_tokens(self) -> int:
         if not self.tokens:
@@ -119,29 +120,49 @@ class Message(Record):
     @staticmethod
     def from_dict(data: dict, history: "History"):
         content = data.get("content", "Content lost")
-        msg = Message(ai=data["ai"], content=content)
+        msg = Message(ai=data["ai"], content=content, tokens=data.get("tokens", 0), count=False)
         msg.summary = data.get("summary", "")
-        msg.tokens = data.get("tokens", 0)
         return msg
 
 
 class Topic(Record):
     def __init__(self, history: "History"):
         self.history = history
-        self.summary: str = ""
+        self._summary: str = ""
+        self._tokens: int | None = None  # cached total, None when it needs recounting
         self.messages: list[Message] = []
 
+    @property
+    def summary(self) -> str:
+        return self._summary
+
+    @summary.setter
+    def summary(self, value: str):
+        self._summary = value
+        self.invalidate_tokens()
+
     def get_tokens(self):
-        if self.summary:
-            return tokens.approximate_tokens(self.summary)
-        else:
-            return sum(msg.get_tokens() for msg in self.messages)
+        if self._tokens is None:
+            if self.summary:
+                self._tokens = tokens.approximate_tokens(self.summary)
+            else:
+                self._tokens = sum(msg.get_tokens() for msg in self.messages)
+        return self._tokens
+
+    def invalidate_tokens(self):
+        self._tokens = None
+        self.history.invalidate_tokens()
 
     def add_message(
         self, ai: bool, content: MessageContent, tokens: int = 0
     ) -> Message:
         msg = Message(ai=ai, content=content, tokens=tokens)
         self.messages.append(msg)
+        # a summarized topic is counted by its summary only
+        if not self.summary:
+            if self._tokens is not None:
+                self._tokens += msg.get_tokens()
+            self.history.add_tokens(msg.get_tokens())
         return msg
 
     def output(self) -> list[OutputMessage]:
@@ -191,6 +212,7 @@ class Topic(Record):
                 )
                 msg.set_summary(_json_dumps(trunc))
 
+            self.invalidate_tokens()
             return True
         return False
 
@@ -211,6 +233,7 @@ class Topic(Record):
             )
             sum_msg = Message(False, sum_msg_content)
             self.messages[1 : cnt_to_sum + 1] = [sum_msg]
+            self.invalidate_tokens()
             return True
         return False
 
@@ -245,14 +268,30 @@ class Topic(Record):
 class Bulk(Record):
     def __init__(self, history: "History"):
         self.history = history
-        self.summary: str = ""
+        self._summary: str = ""
+        self._tokens: int | None = None  # cached total, None when it needs recounting
         self.records: list[Record] = []
 
+    @property
+    def summary(self) -> str:
+        return self._summary
+
+    @summary.setter
+    def summary(self, value: str):
+        self._summary = value
+        self.invalidate_tokens()
+
     def get_tokens(self):
-        if self.summary:
-            return tokens.approximate_tokens(self.summary)
-        else:
-            return sum([r.get_tokens() for r in self.records])
+        if self._tokens is None:
+            if self.summary:
+                self._tokens = tokens.approximate_tokens(self.summary)
+            else:
+                self._tokens = sum([r.get_tokens() for r in self.records])
+        return self._tokens
+
+    def invalidate_tokens(self):
+        self._tokens = None
+        self.history.invalidate_tokens()
 
     def output(
         self, human_label: str = "user", ai_label: str = "ai"
@@ -296,17 +335,47 @@ class History(Record):
         from agent import Agent
 
         self.counter = 0
+        self.revision = 0  # bumped when existing records are rewritten, not on appends
         self.bulks: list[Bulk] = []
         self.topics: list[Topic] = []
+        self._tokens: int | None = None  # cached total, None when it needs recounting
         self.current = Topic(history=self)
         self.agent: Agent = agent
 
     def get_tokens(self) -> int:
-        return (
-            self.get_bulks_tokens()
-            + self.get_topics_tokens()
-            + self.get_current_topic_tokens()
-        )
+        if self._tokens is None:
+            self._tokens = (
+                self.get_bulks_tokens()
+                + self.get_topics_tokens()
+                + self.get_current_topic_tokens()
+            )
+        return self._tokens
+
+    def add_tokens(self, count: int):
+        # appended messages keep the total valid without recounting
+        if self._tokens is not None:
+            self._tokens += count
+
+    def invalidate_tokens(self):
+        # records keep their own totals, only the sum over them is redone
+        self._tokens = None
+
+    def count_missing_tokens(self):
+        # messages saved without a token count are counted in one batch
+        missing: list[Message] = []
+        records: list[Record] = [*self.bulks, *self.topics, self.current]
+        while records:
+            record = records.pop()
+            if isinstance(record, Message):
+                if not record.tokens:
+                    missing.append(record)
+            elif isinstance(record, Topic):
+                records.extend(record.messages)
+            elif isinstance(record, Bulk):
+                records.extend(record.records)
+        counts = tokens.approximate_tokens_batch([msg.output_text() for msg in missing])
+        for msg, count in zip(missing, counts):
+            msg.tokens = count
 
     def is_over_limit(self):
         limit = _get_ctx_size_for_history()
@@ -332,6 +401,7 @@ class History(Record):
         if self.current.messages:
             self.topics.append(self.current)
             self.current = Topic(history=self)
+            self.invalidate_tokens()
 
     def output(self) -> list[OutputMessage]:
         result: list[OutputMessage] = []
@@ -346,6 +416,8 @@ class History(Record):
         history.bulks = [Bulk.from_dict(b, history=history) for b in data["bulks"]]
         history.topics = [Topic.from_dict(t, history=history) for t in data["topics"]]
         history.current = Topic.from_dict(data["current"], history=history)
+        history.count_missing_tokens()
+        history.invalidate_tokens()
         return history
 
     def to_dict(self):
@@ -391,6 +463,7 @@ class History(Record):
 
             if compressed_part:
                 compressed = True
+                self.revision += 1
                 continue
             else:
                 return compressed
@@ -412,6 +485,7 @@ class History(Record):
                 await bulk.summarize()
             self.bulks.append(bulk)
             self.topics.remove(topic)
+            self.invalidate_tokens()
             return True
         return False
 
@@ -421,6 +495,7 @@ class History(Record):
         # remove oldest bulk if necessary
         if not compressed:
             self.bulks.pop(0)
+            self.invalidate_tokens()
             return True
         return compressed
 
@@ -436,6 +511,7 @@ class History(Record):
             ]
         )
         self.bulks = bulks
+        self.invalidate_tokens()
         return True
 
     async def merge_bulks(self, bulks: list[Bulk]) -> Bulk:
@@ -454,8 +530,7 @@ def deserialize_history(json_data: str, agent) -> History:
 
 
 def _get_ctx_size_for_history() -> int:
-    set = settings.get_settings()
-    return int(set["chat_model_ctx_length"] * set["chat_model_ctx_history"])
+    return settings.get_history_ctx_size()
 
 
 def _stringify_output(output: OutputMessage, ai_label="ai", human_label="human"):
@@ -7,7 +7,7 @@ from python.helpers import errors
 from python.helpers import runtime
 
 
-SLEEP_TIME = 60
+SLEEP_TIME = 60  # longest wait between ticks, the loop wakes earlier when a task is due or changed
 
 keep_running = True
 pause_time = 0
@@ -16,22 +16,29 @@ pause_time = 0
 async def run_loop():
     global pause_time, keep_running
 
+    last_check = 0.0
     while True:
-        if runtime.is_development():
-            # Signal to container that the job loop should be paused
-            # if we are runing a development instance to avoid duble-running the jobs
-            try:
-                await runtime.call_development_function(pause_loop)
-            except Exception as e:
-                PrintStyle().error("Failed to pause job loop by development instance: " + errors.error_text(e))
-        if not keep_running and (time.time() - pause_time) > (SLEEP_TIME * 2):
-            resume_loop()
-        if keep_running:
-            try:
-                await scheduler_tick()
-            except Exception as e:
-                PrintStyle().error(errors.format_error(e))
-        await asyncio.sleep(SLEEP_TIME)  # TODO! - if we lower it under 1min, it can run a 5min job multiple times in it's target minute
+        if time.time() - last_check >= SLEEP_TIME:
+            last_check = time.time()
+            if runtime.is_development():
+                # Signal to container that the job loop should be paused
+                # if we are runing a development instance to avoid duble-running the jobs
+                try:
+                    await runtime.call_development_function(pause_loop)
+                except Exception as e:
+                    PrintStyle().error("Failed to pause job loop by development instance: " + errors.error_text(e))
+            if not keep_running and (time.time() - pause_time) > (SLEEP_TIME * 2):
+                resume_loop()
+        if not keep_running:
+            await asyncio.sleep(SLEEP_TIME)
+            continue
+        try:
+            await scheduler_tick()
+            # tasks never fire twice for the same time, so waking up early is safe
+            await TaskScheduler.get().wait_for_due(SLEEP_TIME)
+        except Exception as e:
+            PrintStyle().error(errors.format_error(e))
+            await asyncio.sleep(SLEEP_TIME)
 
 
 async def scheduler_tick():
@@ -1,5 +1,7 @@
 from dataclasses import dataclass, field
 import json
+import threading
+import time
 from typing import Any, Literal, Optional, Dict, TypeVar, TYPE_CHECKING
 
 T = TypeVar("T")
@@ -8,7 +10,8 @@ from collections import OrderedDict  # Import OrderedDict
 from python.helpers.strings import truncate_text_by_ratio
 import copy
 from typing import TypeVar
-from python.helpers.secrets import get_secrets_manager
+from python.helpers.secrets import get_secrets_manager, StreamingMaskBuffer
+from python.helpers import state_monitor
 
 
 if TYPE_CHECKING:
@@ -41,6 +44,8 @@ RESPONSE_CONTENT_MAX_LEN: int = 250_000
 KEY_MAX_LEN: int = 60
 VALUE_MAX_LEN: int = 5000
 PROGRESS_MAX_LEN: int = 120
+STREAM_UPDATE_WINDOW: float = 0.25  # seconds to coalesce streamed updates of one item into one version
+STREAM_MASKS_MAX_ITEMS: int = 8
 
 
 def _truncate_heading(text: str | None) -> str:
@@ -157,6 +162,24 @@ class LogItem:
                 **kwargs,
             )
 
+    def update_stream(
+        self,
+        heading: str | None = None,
+        content: str | None = None,
+        kvps: dict | None = None,
+        **kwargs,
+    ):
+        """Update with the full values streamed so far, meant to be called on every chunk.
+        Only the newly appended text is masked and rapid updates share one log version."""
+        if self.guid == self.log.guid:
+            self.log._stream_item(
+                self.no,
+                heading=heading,
+                content=content,
+                kvps=kvps,
+                **kwargs,
+            )
+
     def stream(
         self,
         heading: str | None = None,
@@ -191,6 +214,11 @@ class Log:
         self.guid: str = str(uuid.uuid4())
         self.updates: list[int] = []
         self.logs: list[LogItem] = []
+        self.stream_window: float = STREAM_UPDATE_WINDOW
+        self._updated_at: dict[int, float] = {}
+        self._pending_updates: dict[int, None] = {}
+        self._flush_timer: threading.Timer | None = None
+        self._stream_masks: dict[int, dict[tuple, StreamingMaskBuffer]] = {}
         self.set_initial_progress()
 
     def log(
@@ -275,9 +303,81 @@ class Log:
             kwargs = self._mask_recursive(kwargs)
             item.kvps.update(kwargs)
 
-        self.updates += [item.no]
+        self._add_update(item.no)
         self._update_progress_from_item(item)
 
+    def _stream_item(
+        self,
+        no: int,
+        heading: str | None = None,
+        content: str | None = None,
+        kvps: dict | None = None,
+        **kwargs,
+    ):
+        item = self.logs[no]
+        previous_heading = item.heading
+
+        # streamed values only grow, so strings are masked incrementally and
+        # containers are rebuilt by masking, no deep copy needed
+        if heading is not None:
+            heading = self._mask_recursive(heading)
+            item.heading = _truncate_heading(heading)
+        if content is not None:
+            content = self._mask_stream(no, ("content",), content)
+            item.content = _truncate_content(content, item.type)
+        if kvps is not None:
+            kvps = OrderedDict(self._mask_stream(no, ("kvps",), kvps))
+            item.kvps = _truncate_value(kvps)
+        elif item.kvps is None:
+            item.kvps = OrderedDict()
+        if kwargs:
+            item.kvps.update(self._mask_stream(no, ("kvps",), kwargs))
+
+        now = time.monotonic()
+        if now - self._updated_at.get(no, 0) < self.stream_window:
+            # coalesce, the version is bumped and signalled once the window passes
+            self._pending_updates[no] = None
+            self._schedule_flush(now)
+        else:
+            self._add_update(no, now)
+        if item.heading != previous_heading:
+            # progress shows the heading, setting it signals a change too
+            self._update_progress_from_item(item)
+
+    def _add_update(self, no: int, now: float | None = None):
+        self._pending_updates.pop(no, None)
+        self._updated_at[no] = now if now is not None else time.monotonic()
+        self.updates.append(no)
+        self._mark_dirty()
+        if self.context:
+            state_monitor.mark_list_fields_dirty()  # log version and length are in the chats list
+
+    def _flush_pending_updates(self):
+        # only items whose window has passed, readers do not cut the window short
+        if self._pending_updates:
+            now = time.monotonic()
+            for no in list(self._pending_updates):
+                if now - self._updated_at.get(no, 0) >= self.stream_window:
+                    self._add_update(no, now)
+
+    def _schedule_flush(self, now: float):
+        # one timer per log bumps the pending items when the earliest window ends
+        if self._flush_timer or not self._pending_updates:
+            return
+        due = min(self._updated_at.get(no, 0) for no in self._pending_updates) + self.stream_window
+        self._flush_timer = threading.Timer(max(due - now, 0), self._flush_on_timer)
+        self._flush_timer.daemon = True
+        self._flush_timer.start()
+
+    def _flush_on_timer(self):
+        self._flush_timer = None
+        self._flush_pending_updates()
+        self._schedule_flush(time.monotonic())
+
+    def get_version(self) -> int:
+        self._flush_pending_updates()
+        return len(self.updates)
+
     def set_progress(self, progress: str, no: int = 0, active: bool = True):
         progress = self._mask_recursive(progress)
         progress = _truncate_progress(progress)
@@ -286,11 +386,17 @@ class Log:
             no = len(self.logs)
         self.progress_no = no
         self.progress_active = active
+        self._mark_dirty()
+
+    def _mark_dirty(self):
+        # only clients showing this log's context are woken
+        state_monitor.mark_dirty(self.context.id if self.context else None)
 
     def set_initial_progress(self):
         self.set_progress("Waiting for input", 0, False)
 
     def output(self, start=None, end=None):
+        self._flush_pending_updates()
         if start is None:
             start = 0
         if end is None:
@@ -309,8 +415,25 @@ class Log:
         self.guid = str(uuid.uuid4())
         self.updates = []
         self.logs = []
+        self._updated_at = {}
+        self._pending_updates = {}
+        if self._flush_timer:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+        self._stream_masks = {}
         self.set_initial_progress()
 
+    def adopt(self, other: "Log"):
+        """Move the items of another log to the end of this one, references to them stay valid"""
+        for item in other.logs:
+            item.log = self
+            item.guid = self.guid
+            item.no = len(self.logs)
+            self.logs.append(item)
+            self._add_update(item.no)
+            self._update_progress_from_item(item)
+        other.logs = []
+
     def _update_progress_from_item(self, item: LogItem):
         if item.heading and item.update_progress != "none":
             if item.no >= self.progress_no:
@@ -319,11 +442,39 @@ class Log:
                     (item.no if item.update_progress == "persistent" else -1),
                 )
 
+    def _get_secrets_manager(self):
+        from agent import AgentContext
+        return get_secrets_manager(self.context or AgentContext.current())
+
+    def _mask_stream(self, no: int, path: tuple, obj: T) -> T:
+        """Mask secrets in streamed values, each string keeps its own incremental mask buffer."""
+        try:
+            if isinstance(obj, str):
+                masks = self._stream_masks.get(no)
+                if masks is None:
+                    # only recently streamed items keep their buffers
+                    if len(self._stream_masks) >= STREAM_MASKS_MAX_ITEMS:
+                        del self._stream_masks[next(iter(self._stream_masks))]
+                    masks = self._stream_masks[no] = {}
+                buffer = masks.get(path)
+                if buffer is None:
+                    buffer = self._get_secrets_manager().create_mask_buffer()
+                    masks[path] = buffer
+                return buffer.update(obj)  # type: ignore
+            elif isinstance(obj, dict):
+                return {k: self._mask_stream(no, path + (k,), v) for k, v in obj.items()}  # type: ignore
+            elif isinstance(obj, list):
+                return [self._mask_stream(no, path + (i,), v) for i, v in enumerate(obj)]  # type: ignore
+            else:
+                return obj
+        except Exception as _e:
+            # If masking fails, return original object
+            return obj
+
     def _mask_recursive(self, obj: T) -> T:
         """Recursively mask secrets in nested objects."""
         try:
-            from agent import AgentContext
-            secrets_mgr = get_secrets_manager(self.context or AgentContext.current())
+            secrets_mgr = self._get_secrets_manager()
 
             # debug helper to identify context mismatch
             # self_id = self.context.id if self.context else None
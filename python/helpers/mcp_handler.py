@@ -23,6 +23,8 @@ from datetime import timedelta
 import json
 from python.helpers import errors
 from python.helpers import settings
+from python.helpers import mcp_session_pool
+from python.helpers.mcp_session_pool import MCPSessionPool
 
 import httpx
 
@@ -210,6 +212,97 @@ class MCPTool(Tool):
             )  # Log includes the full context
 
 
+def render_server_tools_prompt(
+    server_name: str,
+    description: str | None,
+    tools: List[dict[str, Any]],
+    compact: bool = False,
+) -> str:
+    """Render the prompt section of one server, with full JSON input schemas or compact argument lists"""
+    prompt = f"### {server_name}\n"
+    prompt += f"{description}\n"
+
+    for tool in tools:
+        prompt += (
+            f"\n### {server_name}.{tool['name']}:\n"
+            f"{tool['description']}\n\n"
+        )
+
+        if compact:
+            prompt += f"#### Arguments for tool_args:\n{_compact_schema(tool['input_schema'])}\n"
+        else:
+            input_schema = (
+                json.dumps(tool["input_schema"]) if tool["input_schema"] else ""
+            )
+            prompt += f"#### Input schema for tool_args:\n{input_schema}\n"
+
+        prompt += "\n"
+
+        prompt += (
+            f"#### Usage:\n"
+            f"{{\n"
+            f'    "thoughts": ["..."],\n'
+            f"    \"tool_name\": \"{server_name}.{tool['name']}\",\n"
+            f'    "tool_args": !follow {"arguments" if compact else "schema"} above\n'
+            f"}}\n"
+        )
+
+    return prompt
+
+
+_SIMPLE_TYPES = {"string", "integer", "number", "boolean", "null"}
+
+
+def _compact_schema(schema: dict[str, Any] | None) -> str:
+    # one line per argument, nested structures kept as minified JSON
+    properties = (schema or {}).get("properties") or {}
+    if not properties:
+        return "none"
+    required = set((schema or {}).get("required") or [])
+    lines = []
+    for name, prop in properties.items():
+        if not isinstance(prop, dict):
+            prop = {}
+        details = [_compact_type(prop)]
+        if name in required:
+            details.append("required")
+        if "default" in prop:
+            details.append(f"default {json.dumps(prop['default'])}")
+        line = f"* {name} ({', '.join(details)})"
+        if prop.get("description"):
+            line += f": {prop['description']}"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def _compact_type(prop: dict[str, Any]) -> str:
+    if "enum" in prop:
+        return "one of " + "|".join(json.dumps(value) for value in prop["enum"])
+    variants = prop.get("anyOf") or prop.get("oneOf")
+    if variants and all(isinstance(v, dict) and _is_simple(v) for v in variants):
+        return "|".join(_compact_type(v) for v in variants)
+    if _is_simple(prop):
+        kind = prop.get("type", "any")
+        if kind == "array":
+            return f"array of {prop['items'].get('type', 'any')}" if prop.get("items") else "array"
+        return "|".join(kind) if isinstance(kind, list) else kind
+    # complex argument, give the schema itself without descriptions repeated above
+    schema = {key: value for key, value in prop.items() if key not in ("description", "default", "title")}
+    return "schema " + json.dumps(schema, separators=(",", ":"))
+
+
+def _is_simple(prop: dict[str, Any]) -> bool:
+    kind = prop.get("type")
+    if isinstance(kind, list):
+        return all(k in _SIMPLE_TYPES for k in kind)
+    if kind == "array":
+        items = prop.get("items")
+        return not items or (isinstance(items, dict) and set(items) <= {"type", "description"} and items.get("type") in _SIMPLE_TYPES)
+    if kind in _SIMPLE_TYPES:
+        return not any(key in prop for key in ("anyOf", "oneOf", "allOf", "$ref"))
+    return kind is None and not any(key in prop for key in ("anyOf", "oneOf", "allOf", "$ref", "properties"))
+
+
 class MCPServerRemote(BaseModel):
     name: str = Field(default_factory=str)
     description: Optional[str] = Field(default="Remote SSE Server")
@@ -218,11 +311,14 @@ class MCPServerRemote(BaseModel):
     headers: dict[str, Any] | None = Field(default_factory=dict[str, Any])
     init_timeout: int = Field(default=0)
     tool_timeout: int = Field(default=0)
+    pool_size: int = Field(default=0, description="Sessions kept for concurrent calls, 0 for the default")
+    idle_timeout: int = Field(default=0, description="Seconds before an unused session is closed, 0 for the default")
     verify: bool = Field(default=True, description="Verify SSL certificates")
     disabled: bool = Field(default=False)
 
     __lock: ClassVar[threading.Lock] = PrivateAttr(default=threading.Lock())
     __client: Optional["MCPClientRemote"] = PrivateAttr(default=None)
+    _tools_prompt: tuple[int, bool, str] | None = PrivateAttr(default=None)
 
     def __init__(self, config: dict[str, Any]):
         super().__init__()
@@ -242,6 +338,19 @@ class MCPServerRemote(BaseModel):
         with self.__lock:
             return self.__client.tools  # type: ignore
 
+    def get_tools_prompt(self, compact: bool = False) -> str:
+        """Get the prompt section of this server, rendered again only when its tools change"""
+        with self.__lock:
+            version = self.__client.tools_version  # type: ignore
+            tools = self.__client.tools  # type: ignore
+            cached = self._tools_prompt
+            if cached and cached[0] == version and cached[1] == compact:
+                return cached[2]
+        prompt = render_server_tools_prompt(self.name, self.description, tools, compact)
+        with self.__lock:
+            self._tools_prompt = (version, compact, prompt)
+        return prompt
+
     def has_tool(self, tool_name: str) -> bool:
         """Check if a tool is available"""
         with self.__lock:
@@ -252,8 +361,14 @@ class MCPServerRemote(BaseModel):
     ) -> CallToolResult:
         """Call a tool with the given input data"""
         with self.__lock:
-            # We already run in an event loop, dont believe Pylance
-            return await self.__client.call_tool(tool_name, input_data)  # type: ignore
+            client = self.__client
+        # not awaited under the lock, calls to pooled sessions run concurrently
+        return await client.call_tool(tool_name, input_data)  # type: ignore
+
+    def close(self):
+        """Close the pooled sessions"""
+        with self.__lock:
+            self.__client.close()  # type: ignore
 
     def update(self, config: dict[str, Any]) -> "MCPServerRemote":
         with self.__lock:
@@ -267,6 +382,8 @@ class MCPServerRemote(BaseModel):
                     "headers",
                     "init_timeout",
                     "tool_timeout",
+                    "pool_size",
+                    "idle_timeout",
                     "disabled",
                     "verify",
                 ]:
@@ -276,6 +393,8 @@ class MCPServerRemote(BaseModel):
                         key = "url"  # remap serverUrl to url
 
                     setattr(self, key, value)
+            # sessions connected with the old config are not reused
+            self.__client.close()  # type: ignore
             # We already run in an event loop, dont believe Pylance
             return asyncio.run(self.__on_update())
 
@@ -297,11 +416,14 @@ class MCPServerLocal(BaseModel):
     )
     init_timeout: int = Field(default=0)
     tool_timeout: int = Field(default=0)
+    pool_size: int = Field(default=0, description="Sessions kept for concurrent calls, 0 for the default")
+    idle_timeout: int = Field(default=0, description="Seconds before an unused session is closed, 0 for the default")
     verify: bool = Field(default=True, description="Verify SSL certificates")
     disabled: bool = Field(default=False)
 
     __lock: ClassVar[threading.Lock] = PrivateAttr(default=threading.Lock())
     __client: Optional["MCPClientLocal"] = PrivateAttr(default=None)
+    _tools_prompt: tuple[int, bool, str] | None = PrivateAttr(default=None)
 
     def __init__(self, config: dict[str, Any]):
         super().__init__()
@@ -321,6 +443,19 @@ class MCPServerLocal(BaseModel):
         with self.__lock:
             return self.__client.tools  # type: ignore
 
+    def get_tools_prompt(self, compact: bool = False) -> str:
+        """Get the prompt section of this server, rendered again only when its tools change"""
+        with self.__lock:
+            version = self.__client.tools_version  # type: ignore
+            tools = self.__client.tools  # type: ignore
+            cached = self._tools_prompt
+            if cached and cached[0] == version and cached[1] == compact:
+                return cached[2]
+        prompt = render_server_tools_prompt(self.name, self.description, tools, compact)
+        with self.__lock:
+            self._tools_prompt = (version, compact, prompt)
+        return prompt
+
     def has_tool(self, tool_name: str) -> bool:
         """Check if a tool is available"""
         with self.__lock:
@@ -331,8 +466,14 @@ class MCPServerLocal(BaseModel):
     ) -> CallToolResult:
         """Call a tool with the given input data"""
         with self.__lock:
-            # We already run in an event loop, dont believe Pylance
-            return await self.__client.call_tool(tool_name, input_data)  # type: ignore
+            client = self.__client
+        # not awaited under the lock, calls to pooled sessions run concurrently
+        return await client.call_tool(tool_name, input_data)  # type: ignore
+
+    def close(self):
+        """Close the pooled sessions, a local server process stops"""
+        with self.__lock:
+            self.__client.close()  # type: ignore
 
     def update(self, config: dict[str, Any]) -> "MCPServerLocal":
         with self.__lock:
@@ -348,11 +489,15 @@ class MCPServerLocal(BaseModel):
                     "encoding_error_handler",
                     "init_timeout",
                     "tool_timeout",
+                    "pool_size",
+                    "idle_timeout",
                     "disabled",
                 ]:
                     if key == "name":
                         value = normalize_name(value)
                     setattr(self, key, value)
+            # sessions connected with the old config are not reused
+            self.__client.close()  # type: ignore
             # We already run in an event loop, dont believe Pylance
             return asyncio.run(self.__on_update())
 
@@ -465,6 +610,10 @@ class MCPConfig(BaseModel):
                 "servers": servers_data
             }  # Prepare data for re-initialization or update
 
+            # servers are created again, sessions of the old ones would stay open until idle
+            for server in instance.servers:
+                server.close()
+
             # Option 1: Re-initialize the existing instance (if __init__ is idempotent for other fields)
             instance.__init__(servers_list=servers_data)
 
@@ -696,13 +845,12 @@ class MCPConfig(BaseModel):
             return tools
 
     def get_tools_prompt(self, server_name: str = "") -> str:
-        """Get a prompt for all tools"""
+        """Get a prompt for all tools, joined from the cached sections of the servers"""
 
         # just to wait for pending initialization
         with self.__lock:
             pass
 
-        prompt = '## "Remote (MCP Server) Agent Tools" available:\n\n'
         server_names = []
         for server in self.servers:
             if not server_name or server.name == server_name:
@@ -711,42 +859,11 @@ class MCPConfig(BaseModel):
         if server_name and server_name not in server_names:
             raise ValueError(f"Server {server_name} not found")
 
+        compact = settings.get_mcp_client_compact_schemas()
+        prompt = '## "Remote (MCP Server) Agent Tools" available:\n\n'
         for server in self.servers:
             if server.name in server_names:
-                server_name = server.name
-                prompt += f"### {server_name}\n"
-                prompt += f"{server.description}\n"
-                tools = server.get_tools()
-
-                for tool in tools:
-                    prompt += (
-                        f"\n### {server_name}.{tool['name']}:\n"
-                        f"{tool['description']}\n\n"
-                        # f"#### Categories:\n"
-                        # f"* kind: MCP Server Tool\n"
-                        # f'* server: "{server_name}" ({server.description})\n\n'
-                        # f"#### Arguments:\n"
-                    )
-
-                    input_schema = (
-                        json.dumps(tool["input_schema"]) if tool["input_schema"] else ""
-                    )
-
-                    prompt += f"#### Input schema for tool_args:\n{input_schema}\n"
-
-                    prompt += "\n"
-
-                    prompt += (
-                        f"#### Usage:\n"
-                        f"{{\n"
-                        # f'    "observations": ["..."],\n' # TODO: this should be a prompt file with placeholders
-                        f'    "thoughts": ["..."],\n'
-                        # f'    "reflection": ["..."],\n' # TODO: this should be a prompt file with placeholders
-                        f"    \"tool_name\": \"{server_name}.{tool['name']}\",\n"
-                        f'    "tool_args": !follow schema above\n'
-                        f"}}\n"
-                    )
-
+                prompt += server.get_tools_prompt(compact)
         return prompt
 
     def has_tool(self, tool_name: str) -> bool:
@@ -773,10 +890,17 @@ class MCPConfig(BaseModel):
             raise ValueError(f"Tool {tool_name} not found")
         server_name_part, tool_name_part = tool_name.split(".")
         with self.__lock:
-            for server in self.servers:
-                if server.name == server_name_part and server.has_tool(tool_name_part):
-                    return await server.call_tool(tool_name_part, input_data)
+            found = next(
+                (
+                    server
+                    for server in self.servers
+                    if server.name == server_name_part and server.has_tool(tool_name_part)
+                ),
+                None,
+            )
+        if found is None:
             raise ValueError(f"Tool {tool_name} not found")
+        return await found.call_tool(tool_name_part, input_data)
 
 
 T = TypeVar("T")
@@ -785,16 +909,18 @@ T = TypeVar("T")
 class MCPClientBase(ABC):
     # server: Union[MCPServerLocal, MCPServerRemote] # Defined in __init__
     # tools: List[dict[str, Any]] # Defined in __init__
-    # No self.session, self.exit_stack, self.stdio, self.write as persistent instance fields
+    # Sessions are kept by self.pool, reused by all operations until idle
 
     __lock: ClassVar[threading.Lock] = threading.Lock()
 
     def __init__(self, server: Union[MCPServerLocal, MCPServerRemote]):
         self.server = server
         self.tools: List[dict[str, Any]] = []  # Tools are cached on the client instance
+        self.tools_version: int = 0  # bumped on every tools change, keys the rendered prompt
         self.error: str = ""
         self.log: List[str] = []
         self.log_file: Optional[TextIO] = None
+        self.pool = MCPSessionPool(self._create_stdio_transport)
 
     # Protected method
     @abstractmethod
@@ -813,62 +939,25 @@ class MCPClientBase(ABC):
         read_timeout_seconds=60,
     ) -> T:
         """
-        Manages the lifecycle of an MCP session for a single operation.
-        Creates a temporary session, executes coro_func with it, and ensures cleanup.
+        Executes coro_func with a pooled session of this server.
+        A warm session is reused, a new one is connected and initialized only when none is free or healthy.
         """
         operation_name = coro_func.__name__  # For logging
-        # PrintStyle(font_color="cyan").print(f"MCPClientBase ({self.server.name}): Creating new session for operation '{operation_name}'...")
-        # Store the original exception outside the async block
-        original_exception = None
+        self.pool.size = self.server.pool_size or mcp_session_pool.POOL_SIZE
+        self.pool.idle_timeout = self.server.idle_timeout or mcp_session_pool.IDLE_TIMEOUT
         try:
-            async with AsyncExitStack() as temp_stack:
-                try:
-
-                    stdio, write = await self._create_stdio_transport(temp_stack)
-                    # PrintStyle(font_color="cyan").print(f"MCPClientBase ({self.server.name} - {operation_name}): Transport created. Initializing session...")
-                    session = await temp_stack.enter_async_context(
-                        ClientSession(
-                            stdio,  # type: ignore
-                            write,  # type: ignore
-                            read_timeout_seconds=timedelta(
-                                seconds=read_timeout_seconds
-                            ),
-                        )
-                    )
-                    await session.initialize()
-
-                    result = await coro_func(session)
-
-                    return result
-                except Exception as e:
-                    # Store the original exception and raise a dummy exception
-                    excs = getattr(e, "exceptions", None)  # Python 3.11+ ExceptionGroup
-                    if excs:
-                        original_exception = excs[0]
-                    else:
-                        original_exception = e
-                    # Create a dummy exception to break out of the async block
-                    raise RuntimeError("Dummy exception to break out of async block")
+            return await self.pool.run(coro_func, init_timeout=read_timeout_seconds)
         except Exception as e:
-            # Check if this is our dummy exception
-            if original_exception is not None:
-                e = original_exception
-            # We have the original exception stored
             PrintStyle(
                 background_color="#AA4455", font_color="white", padding=False
             ).print(
                 f"MCPClientBase ({self.server.name} - {operation_name}): Error during operation: {type(e).__name__}: {e}"
             )
-            raise e  # Re-raise the original exception
-        # finally:
-        #     PrintStyle(font_color="cyan").print(
-        #         f"MCPClientBase ({self.server.name} - {operation_name}): Session and transport will be closed by AsyncExitStack."
-        #     )
-        # This line should ideally be unreachable if the try/except/finally logic within the 'async with' is exhaustive.
-        # Adding it to satisfy linters that might not fully trace the raise/return paths through async context managers.
-        raise RuntimeError(
-            f"MCPClientBase ({self.server.name} - {operation_name}): _execute_with_session exited 'async with' block unexpectedly."
-        )
+            raise e
+
+    def close(self):
+        """Close the pooled sessions, the next operation connects again"""
+        self.pool.close()
 
     async def update_tools(self) -> "MCPClientBase":
         # PrintStyle(font_color="cyan").print(f"MCPClientBase ({self.server.name}): Starting 'update_tools' operation...")
@@ -884,6 +973,7 @@ class MCPClientBase(ABC):
                     }
                     for tool in response.tools
                 ]
+                self.tools_version += 1
             PrintStyle(font_color="green").print(
                 f"MCPClientBase ({self.server.name}): Tools updated. Found {len(self.tools)} tools."
             )
@@ -906,6 +996,7 @@ class MCPClientBase(ABC):
             )
             with self.__lock:
                 self.tools = []  # Ensure tools are cleared on failure
+                self.tools_version += 1
                 self.error = f"Failed to initialize. {error_text[:200]}{'...' if len(error_text) > 200 else ''}"  # store error from tools fetch
         return self
 
@@ -943,12 +1034,13 @@ class MCPClientBase(ABC):
             )
 
         async def call_tool_op(current_session: ClientSession):
-            set = settings.get_settings()
             # PrintStyle(font_color="cyan").print(f"MCPClientBase ({self.server.name}): Executing 'call_tool' for '{tool_name}' via MCP session...")
             response: CallToolResult = await current_session.call_tool(
                 tool_name,
                 input_data,
-                read_timeout_seconds=timedelta(seconds=set["mcp_client_tool_timeout"]),
+                read_timeout_seconds=timedelta(
+                    seconds=self.server.tool_timeout or settings.get_mcp_client_tool_timeout()
+                ),
             )
             # PrintStyle(font_color="green").print(f"MCPClientBase ({self.server.name}): Tool '{tool_name}' call successful via session.")
             return response
@@ -1073,7 +1165,8 @@ class MCPClientRemote(MCPClientBase):
 
         # Use lower timeouts for faster failure detection
         init_timeout = min(server.init_timeout or set["mcp_client_init_timeout"], 5)
-        tool_timeout = min(server.tool_timeout or set["mcp_client_tool_timeout"], 10)
+        # the pooled session stays open between calls, tool calls are limited by their read_timeout_seconds
+        stream_timeout = mcp_session_pool.STREAM_READ_TIMEOUT
 
         client_factory = CustomHTTPClientFactory(verify=server.verify)
         # Check if this is a streaming HTTP type
@@ -1084,7 +1177,7 @@ class MCPClientRemote(MCPClientBase):
                     url=server.url,
                     headers=server.headers,
                     timeout=timedelta(seconds=init_timeout),
-                    sse_read_timeout=timedelta(seconds=tool_timeout),
+                    sse_read_timeout=timedelta(seconds=stream_timeout),
                     httpx_client_factory=client_factory,
                 )
             )
@@ -1102,7 +1195,7 @@ class MCPClientRemote(MCPClientBase):
                     url=server.url,
                     headers=server.headers,
                     timeout=init_timeout,
-                    sse_read_timeout=tool_timeout,
+                    sse_read_timeout=stream_timeout,
                     httpx_client_factory=client_factory,
                 )
             )
@@ -0,0 +1,174 @@
+import asyncio
+import time
+from contextlib import AsyncExitStack
+from datetime import timedelta
+from typing import Any, Awaitable, Callable, TypeVar
+
+from mcp import ClientSession
+
+from python.helpers.defer import EventLoopThread
+
+POOL_SIZE = 2  # sessions per server, concurrent calls beyond it wait for a free session
+IDLE_TIMEOUT = 300  # seconds an unused session stays open, closing it stops a local server process
+HEALTH_CHECK_AFTER = 30  # seconds idle after which a session is pinged before it is used again
+HEALTH_CHECK_TIMEOUT = 5  # seconds a ping may take before the session is replaced
+STREAM_READ_TIMEOUT = 24 * 3600  # seconds a remote stream may stay silent, pooled sessions idle between calls
+THREAD_NAME = "MCPSessions"  # event loop all sessions live on, shared by all agent contexts
+
+T = TypeVar("T")
+TransportFactory = Callable[[AsyncExitStack], Awaitable[Any]]
+
+
+class _PooledSession:
+    """A connected session, one task opens and closes its transport as anyio requires"""
+
+    def __init__(self):
+        self.session: ClientSession | None = None
+        self.read_stream: Any = None
+        self.task: asyncio.Task | None = None
+        self.closing = asyncio.Event()
+        self.last_used = time.monotonic()
+        self.idle_timer: asyncio.TimerHandle | None = None
+
+    def is_alive(self) -> bool:
+        if self.task is None or self.task.done() or self.closing.is_set():
+            return False
+        # a transport closes its end of the read stream when the connection ends, e.g. on an SSE read timeout
+        return self.read_stream is None or self.read_stream.statistics().open_send_streams > 0
+
+    async def open(self, open_transport: TransportFactory, init_timeout: float):
+        ready = asyncio.get_running_loop().create_future()
+        self.task = asyncio.create_task(self._hold(open_transport, init_timeout, ready))
+        await ready
+
+    def close(self):
+        if self.idle_timer:
+            self.idle_timer.cancel()
+        self.closing.set()
+
+    async def _hold(self, open_transport: TransportFactory, init_timeout: float, ready: asyncio.Future):
+        try:
+            async with AsyncExitStack() as stack:
+                read_stream, write_stream = await open_transport(stack)
+                self.read_stream = read_stream
+                session = await stack.enter_async_context(
+                    ClientSession(
+                        read_stream,
+                        write_stream,
+                        read_timeout_seconds=timedelta(seconds=init_timeout),
+                    )
+                )
+                await session.initialize()
+                self.session = session
+                ready.set_result(None)
+                await self.closing.wait()
+        except Exception as e:
+            if not ready.done():
+                excs = getattr(e, "exceptions", None)  # Python 3.11+ ExceptionGroup
+                ready.set_exception(excs[0] if excs else e)
+        finally:
+            if not ready.done():
+                ready.set_exception(ConnectionError("MCP session closed while connecting"))
+
+
+class MCPSessionPool:
+    """Long-lived sessions to one MCP server, reused by tool calls instead of connecting each time.
+
+    Sessions live on a shared event loop thread, callers on any event loop use run().
+    A session idle for HEALTH_CHECK_AFTER seconds is pinged before reuse and replaced if dead,
+    a session whose call failed or whose stream was closed is dropped and the next call reconnects.
+    """
+
+    def __init__(self, open_transport: TransportFactory, size: int = POOL_SIZE, idle_timeout: float = IDLE_TIMEOUT):
+        self.open_transport = open_transport
+        self.size = size
+        self.idle_timeout = idle_timeout
+        # state below is only touched on the pool event loop
+        self._idle: list[_PooledSession] = []
+        self._in_use = 0
+        self._sessions: set[_PooledSession] = set()
+        self._available = asyncio.Condition()
+
+    async def run(self, op: Callable[[ClientSession], Awaitable[T]], init_timeout: float = 60) -> T:
+        """Run op with a pooled session, the session is reused by later calls"""
+        future = EventLoopThread(THREAD_NAME).run_coroutine(self._run(op, init_timeout))
+        return await asyncio.wrap_future(future)
+
+    def close(self):
+        """Close all sessions, callable from any thread, a later run() connects again"""
+        return EventLoopThread(THREAD_NAME).run_coroutine(self._close_all())
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    async def _run(self, op: Callable[[ClientSession], Awaitable[T]], init_timeout: float) -> T:
+        pooled = await self._acquire(init_timeout)
+        broken = False
+        try:
+            return await op(pooled.session)  # type: ignore
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # a timed out or failed request can leave the stream dead or a late response pending
+            broken = True
+            raise
+        finally:
+            await self._release(pooled, broken)
+
+    async def _acquire(self, init_timeout: float) -> _PooledSession:
+        async with self._available:
+            await self._available.wait_for(lambda: bool(self._idle) or self._in_use < self.size)
+            self._in_use += 1
+            pooled = self._idle.pop() if self._idle else None
+        try:
+            if pooled is not None:
+                if pooled.idle_timer:
+                    pooled.idle_timer.cancel()
+                if await self._is_healthy(pooled):
+                    return pooled
+                pooled.close()
+            pooled = _PooledSession()
+            await pooled.open(self.open_transport, init_timeout)
+            self._sessions.add(pooled)
+            pooled.task.add_done_callback(lambda _: self._sessions.discard(pooled))  # type: ignore
+            return pooled
+        except BaseException:
+            await self._release(None, True)
+            raise
+
+    async def _is_healthy(self, pooled: _PooledSession) -> bool:
+        if not pooled.is_alive():
+            return False
+        if time.monotonic() - pooled.last_used < HEALTH_CHECK_AFTER:
+            return True
+        try:
+            await asyncio.wait_for(pooled.session.send_ping(), HEALTH_CHECK_TIMEOUT)  # type: ignore
+            return True
+        except Exception:
+            return False
+
+    async def _release(self, pooled: _PooledSession | None, broken: bool):
+        async with self._available:
+            self._in_use -= 1
+            if pooled is not None:
+                if broken or not pooled.is_alive() or self._in_use + len(self._idle) >= self.size:
+                    pooled.close()
+                else:
+                    pooled.last_used = time.monotonic()
+                    pooled.idle_timer = asyncio.get_running_loop().call_later(
+                        self.idle_timeout, self._expire, pooled
+                    )
+                    self._idle.append(pooled)
+            self._available.notify()
+
+    def _expire(self, pooled: _PooledSession):
+        if pooled in self._idle:
+            self._idle.remove(pooled)
+            pooled.close()
+
+    async def _close_all(self):
+        self._idle.clear()
+        sessions = list(self._sessions)
+        for pooled in sessions:
+            pooled.close()
+        await asyncio.gather(*[pooled.task for pooled in sessions if pooled.task], return_exceptions=True)
@@ -1,4 +1,6 @@
+from collections import OrderedDict
 from datetime import datetime
+import time
 from typing import Any, List, Sequence
 from langchain.storage import InMemoryByteStore, LocalFileStore
 from langchain.embeddings import CacheBackedEmbeddings
@@ -31,14 +33,60 @@ from enum import Enum
 from agent import Agent, AgentContext
 import models
 import logging
-from simpleeval import simple_eval
+from python.helpers.metadata_filter import IndexedFaiss, MetadataFilter, parse_filter
+from python.helpers.memory_wal import MemoryWal
+from python.helpers import memory_wal, vector_index
+import asyncio
 
 
 # Raise the log level so WARNING messages aren't shown
 logging.getLogger("langchain_core.vectorstores.base").setLevel(logging.ERROR)
 
+QUERY_CACHE_SIZE = 256  # query embeddings kept per store
+QUERY_CACHE_TTL = 300.0  # seconds a query embedding is reused
+
+
+class QueryEmbeddingCache:
+    """Short-lived LRU of query embeddings, a query repeated within a recall or consolidation is embedded once"""
+
+    def __init__(self, embeddings: Embeddings):
+        self.embeddings = embeddings
+        self.items: OrderedDict[str, tuple[float, list[float]]] = OrderedDict()
+
+    async def embed(self, queries: list[str]) -> list[list[float]]:
+        now = time.monotonic()
+        found: dict[str, list[float]] = {}
+        for query in queries:
+            item = self.items.get(query)
+            if item and now - item[0] < QUERY_CACHE_TTL:
+                self.items.move_to_end(query)
+                found[query] = item[1]
+
+        missing = list(dict.fromkeys(query for query in queries if query not in found))
+        if missing:
+            loop = asyncio.get_running_loop()
+            vectors = await loop.run_in_executor(None, _embed_queries, self.embeddings, missing)
+            for query, vector in zip(missing, vectors):
+                found[query] = vector
+                self.items[query] = (now, vector)
+                self.items.move_to_end(query)
+            while len(self.items) > QUERY_CACHE_SIZE:
+                self.items.popitem(last=False)
+        return [found[query] for query in queries]
+
+
+def _embed_queries(embeddings: Embeddings, texts: list[str]) -> list[list[float]]:
+    # past the document cache, queries are not worth keeping on disk
+    model = getattr(embeddings, "underlying_embeddings", embeddings)
+    if hasattr(model, "embed_queries"):
+        return model.embed_queries(texts)  # type: ignore
+    return [model.embed_query(text) for text in texts]
+
+
+class MyFaiss(IndexedFaiss):
+    wal: MemoryWal | None = None  # set when loaded by Memory, mutations go through it
+    query_cache: QueryEmbeddingCache | None = None
 
-class MyFaiss(FAISS):
     # override aget_by_ids
     def get_by_ids(self, ids: Sequence[str], /) -> List[Document]:
         # return all self.docstore._dict[id] in ids
@@ -122,7 +170,9 @@ class Memory:
     async def reload(agent: Agent):
         memory_subdir = get_agent_memory_subdir(agent)
         if Memory.index.get(memory_subdir):
-            del Memory.index[memory_subdir]
+            db = Memory.index.pop(memory_subdir)
+            if db.wal:
+                db.wal.close()  # snapshot before it is loaded again
         return await Memory.get(agent)
 
     @staticmethod
@@ -172,22 +222,24 @@ class Memory:
 
         created = False
 
+        # index type of the subdir, kept when re-indexing
+        embedding_set: dict = {}
+        emb_set_file = files.get_abs_path(db_dir, "embedding.json")
+        if files.exists(emb_set_file):
+            embedding_set = json.loads(files.read_file(emb_set_file))
+        index_type = embedding_set.get("index_type", vector_index.DEFAULT_INDEX_TYPE)
+        if index_type not in vector_index.INDEX_TYPES:
+            PrintStyle.error(f"Unknown memory index type '{index_type}', using '{vector_index.DEFAULT_INDEX_TYPE}'")
+            index_type = vector_index.DEFAULT_INDEX_TYPE
+
         # if db folder exists and is not empty:
+        memory_wal.recover(db_dir)
         if os.path.exists(db_dir) and files.exists(db_dir, "index.faiss"):
-            db = MyFaiss.load_local(
-                folder_path=db_dir,
-                embeddings=embedder,
-                allow_dangerous_deserialization=True,
-                distance_strategy=DistanceStrategy.COSINE,
-                # normalize_L2=True,
-                relevance_score_fn=Memory._cosine_normalizer,
-            )  # type: ignore
+            db = Memory._load_db(db_dir, embedder, index_type)
 
             # if there is a mismatch in embeddings used, re-index the whole DB
             emb_ok = False
-            emb_set_file = files.get_abs_path(db_dir, "embedding.json")
-            if files.exists(emb_set_file):
-                embedding_set = json.loads(files.read_file(emb_set_file))
+            if embedding_set:
                 if (
                     embedding_set["model_provider"] == model_config.provider
                     and embedding_set["model_name"] == model_config.name
@@ -212,6 +264,7 @@ class Memory:
                 distance_strategy=DistanceStrategy.COSINE,
                 # normalize_L2=True,
                 relevance_score_fn=Memory._cosine_normalizer,
+                index_type=index_type,
             )
 
             # insert docs if reindexing
@@ -223,22 +276,46 @@ class Memory:
 
             # save DB
             Memory._save_db_file(db, memory_subdir)
-            # save meta file
-            meta_file_path = files.get_abs_path(db_dir, "embedding.json")
-            files.write_file(
-                meta_file_path,
-                json.dumps(
-                    {
-                        "model_provider": model_config.provider,
-                        "model_name": model_config.name,
-                    }
-                ),
-            )
-
             created = True
 
+        # save meta file
+        meta = {
+            **embedding_set,
+            "model_provider": model_config.provider,
+            "model_name": model_config.name,
+            "index_type": index_type,
+        }
+        if meta != embedding_set:
+            files.write_file(emb_set_file, json.dumps(meta))
+
+        if db.wal is None:
+            db.wal = MemoryWal(db, db_dir)
         return db, created
 
+    @staticmethod
+    def _load_db(
+        db_dir: str,
+        embedder: Embeddings,
+        index_type: str = vector_index.DEFAULT_INDEX_TYPE,
+    ) -> MyFaiss:
+        db = MyFaiss.load_local(
+            folder_path=db_dir,
+            embeddings=embedder,
+            allow_dangerous_deserialization=True,
+            distance_strategy=DistanceStrategy.COSINE,
+            # normalize_L2=True,
+            relevance_score_fn=Memory._cosine_normalizer,
+            index_type=index_type,
+        )  # type: ignore
+        # mutations logged after the last snapshot
+        db.wal = MemoryWal(db, db_dir)
+        replayed = db.wal.replay()
+        # the configured type may have changed, or the store grown past the ANN threshold
+        rebuilt = db.set_index_type(index_type)
+        if replayed or rebuilt:
+            db.wal.checkpoint(force=True)
+        return db
+
     def __init__(
         self,
         db: MyFaiss,
@@ -341,15 +418,33 @@ class Memory:
     async def search_similarity_threshold(
         self, query: str, limit: int, threshold: float, filter: str = ""
     ):
-        comparator = Memory._get_comparator(filter) if filter else None
-
-        return await self.db.asearch(
-            query,
-            search_type="similarity_score_threshold",
-            k=limit,
-            score_threshold=threshold,
-            filter=comparator,
+        return (await self.search_many([query], limit, threshold, filter))[0]
+
+    async def search_many(
+        self,
+        queries: list[str],
+        limit: int | list[int],
+        threshold: float,
+        filters: str | list[str] = "",
+    ) -> list[list[Document]]:
+        """search_similarity_threshold for several queries at once, returns the documents found for each.
+
+        Limit and filter are the same for all queries or given per query. The queries are
+        embedded in one call through a short-lived cache and searched as one matrix.
+        """
+        if not queries:
+            return []
+        limits = limit if isinstance(limit, list) else [limit] * len(queries)
+        conditions = filters if isinstance(filters, list) else [filters] * len(queries)
+        comparators = [Memory._get_comparator(c) if c else None for c in conditions]
+
+        vectors = await self._get_query_cache().embed(queries)
+        loop = asyncio.get_running_loop()
+        found = await loop.run_in_executor(
+            None, self.db.similarity_search_many_by_vectors, vectors, limits, comparators
         )
+        relevance = self.db._select_relevance_score_fn()
+        return [[doc for doc, score in docs if relevance(score) >= threshold] for docs in found]
 
     async def delete_documents_by_query(
         self, query: str, threshold: float, filter: str = ""
@@ -374,15 +469,13 @@ class Memory:
                 # fnd = self.db.get(where={"id": {"$in": document_ids}})
                 # if fnd["ids"]: self.db.delete(ids=fnd["ids"])
                 # tot += len(fnd["ids"])
-                await self.db.adelete(ids=document_ids)
+                await self._delete_documents(document_ids)
                 tot += len(document_ids)
 
             # If fewer than K document IDs, break the loop
             if len(document_ids) < k:
                 break
 
-        if tot:
-            self._save_db()  # persist
         return removed
 
     async def delete_documents_by_ids(self, ids: list[str]):
@@ -392,10 +485,8 @@ class Memory:
         )  # existing docs to remove (prevents error)
         if rem_docs:
             rem_ids = [doc.metadata["id"] for doc in rem_docs]  # ids to remove
-            await self.db.adelete(ids=rem_ids)
+            await self._delete_documents(rem_ids)
 
-        if rem_docs:
-            self._save_db()  # persist
         return rem_docs
 
     async def insert_text(self, text, metadata: dict = {}):
@@ -414,19 +505,38 @@ class Memory:
                 if not doc.metadata.get("area", ""):
                     doc.metadata["area"] = Memory.Area.MAIN.value
 
-            await self.db.aadd_documents(documents=docs, ids=ids)
-            self._save_db()  # persist
+            await self._add_documents(docs, ids)
         return ids
 
     async def update_documents(self, docs: list[Document]):
         ids = [doc.metadata["id"] for doc in docs]
-        await self.db.adelete(ids=ids)  # delete originals
-        ins = await self.db.aadd_documents(documents=docs, ids=ids)  # add updated
-        self._save_db()  # persist
-        return ins
+        await self._delete_documents(ids)  # delete originals
+        return await self._add_documents(docs, ids)  # add updated
+
+    async def _add_documents(self, docs: list[Document], ids: list[str]) -> list[str]:
+        # embedded here so the vectors can be logged, persisted by the write-ahead log
+        texts = [doc.page_content for doc in docs]
+        vectors = await self.db._aembed_documents(texts)
+        # the log is written and a checkpoint may start, both off the event loop
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(
+            None, self._get_wal().add, texts, vectors, [doc.metadata for doc in docs], ids
+        )
+        return ids
 
-    def _save_db(self):
-        Memory._save_db_file(self.db, self.memory_subdir)
+    async def _delete_documents(self, ids: list[str]):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._get_wal().delete, ids)
+
+    def _get_query_cache(self) -> QueryEmbeddingCache:
+        if self.db.query_cache is None:
+            self.db.query_cache = QueryEmbeddingCache(self.db.embeddings)  # type: ignore
+        return self.db.query_cache
+
+    def _get_wal(self) -> MemoryWal:
+        if self.db.wal is None:
+            self.db.wal = MemoryWal(self.db, abs_db_dir(self.memory_subdir))
+        return self.db.wal
 
     def _generate_doc_id(self):
         while True:
@@ -437,19 +547,12 @@ class Memory:
     @staticmethod
     def _save_db_file(db: MyFaiss, memory_subdir: str):
         abs_dir = abs_db_dir(memory_subdir)
-        db.save_local(folder_path=abs_dir)
+        memory_wal.save_db(db, abs_dir)
 
     @staticmethod
-    def _get_comparator(condition: str):
-        def comparator(data: dict[str, Any]):
-            try:
-                result = simple_eval(condition, names=data)
-                return result
-            except Exception as e:
-                PrintStyle.error(f"Error evaluating condition: {e}")
-                return False
-
-        return comparator
+    def _get_comparator(condition: str) -> MetadataFilter:
+        # parsed once, indexed conditions narrow the search before scoring
+        return parse_filter(condition)
 
     @staticmethod
     def _score_normalizer(val: float) -> float:
@@ -489,6 +592,9 @@ def get_custom_knowledge_subdir_abs(agent: Agent) -> str:
 
 def reload():
     # clear the memory index, this will force all DBs to reload
+    for db in Memory.index.values():
+        if db.wal:
+            db.wal.close()  # snapshot before the next load reads it
     Memory.index = {}
 
 
@@ -339,29 +339,26 @@ class MemoryConsolidator:
         # Step 1: Extract keywords/queries for enhanced search
         search_queries = await self._extract_search_keywords(new_memory, log_item)
 
-        all_similar = []
-
         # Step 2: Semantic similarity search with scores
-        semantic_similar = await db.search_similarity_threshold(
-            query=new_memory,
-            limit=self.config.max_similar_memories,
-            threshold=self.config.similarity_threshold,
-            filter=f"area == '{area}'"
-        )
-        all_similar.extend(semantic_similar)
+        queries = [new_memory]
+        limits = [self.config.max_similar_memories]
 
         # Step 3: Keyword-based searches
         for query in search_queries:
             if query.strip():
                 # Fix division by zero: ensure len(search_queries) > 0
                 queries_count = max(1, len(search_queries))  # Prevent division by zero
-                keyword_similar = await db.search_similarity_threshold(
-                    query=query.strip(),
-                    limit=max(3, self.config.max_similar_memories // queries_count),
-                    threshold=self.config.similarity_threshold,
-                    filter=f"area == '{area}'"
-                )
-                all_similar.extend(keyword_similar)
+                queries.append(query.strip())
+                limits.append(max(3, self.config.max_similar_memories // queries_count))
+
+        # all queries embedded in one call and searched together
+        results = await db.search_many(
+            queries=queries,
+            limit=limits,
+            threshold=self.config.similarity_threshold,
+            filters=f"area == '{area}'",
+        )
+        all_similar = [doc for docs in results for doc in docs]
 
         # Step 4: Deduplicate by document ID and store similarity info
         seen_ids = set()
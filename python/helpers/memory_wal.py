@@ -0,0 +1,256 @@
+import atexit
+import os
+import pickle
+import threading
+import weakref
+from typing import Any, Sequence
+
+import numpy as np
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+
+# faiss needs to be patched for python 3.12 on arm #TODO remove once not needed
+from python.helpers import faiss_monkey_patch
+import faiss
+
+from python.helpers.metadata_filter import IndexedFaiss
+from python.helpers.print_style import PrintStyle
+from python.helpers import vector_index
+
+WAL_FILE = "index.wal"
+CHECKPOINT_WAL_FILE = "index.wal.checkpoint"  # log of the mutations the running checkpoint snapshots
+SNAPSHOT_FILES = ("index.faiss", "index.pkl")
+SNAPSHOT_MARKER_FILE = "index.snapshot"  # written when the temp files of a snapshot are complete
+CHECKPOINT_MUTATIONS = 100  # mutations after which the index is snapshotted in the background
+CHECKPOINT_INTERVAL = 30.0  # seconds after the first unsaved mutation the index is snapshotted at the latest
+
+_dir_locks: dict[str, threading.Lock] = {}
+_dir_locks_lock = threading.Lock()
+_wals: "weakref.WeakSet[MemoryWal]" = weakref.WeakSet()
+
+
+class MemoryWal:
+    """Append-only log of the mutations of a FAISS store, next to its index.faiss.
+
+    Mutations are applied to the store and appended to the log instead of saving the
+    whole index each time. A background checkpoint snapshots the index after
+    CHECKPOINT_MUTATIONS mutations or CHECKPOINT_INTERVAL seconds and starts a new log,
+    loading replays the log over the last snapshot. A store grown past the ANN threshold
+    gets its new index built by that checkpoint too, mutations are not blocked meanwhile.
+    """
+
+    def __init__(self, db: FAISS, db_dir: str):
+        self.db = db
+        self.db_dir = db_dir
+        self.lock = threading.RLock()  # held while the store is mutated or snapshotted
+        self.mutations = 0  # mutations not in the snapshot yet
+        self.timer: threading.Timer | None = None
+        _wals.add(self)
+
+    def add(self, texts: list[str], vectors: Sequence[Sequence[float]], metadatas: list[dict], ids: list[str]):
+        with self.lock:
+            self.db.add_embeddings(list(zip(texts, vectors)), metadatas=metadatas, ids=ids)
+            self._append(
+                {
+                    "op": "add",
+                    "ids": ids,
+                    "texts": texts,
+                    "metadatas": metadatas,
+                    "vectors": np.asarray(vectors, dtype=np.float32),
+                }
+            )
+
+    def delete(self, ids: list[str]):
+        with self.lock:
+            self.db.delete(ids)
+            self._append({"op": "delete", "ids": ids})
+
+    def replay(self) -> int:
+        """Apply the logged mutations to the store loaded from the snapshot, returns their count"""
+        count = 0
+        with self.lock:
+            for name in (CHECKPOINT_WAL_FILE, WAL_FILE):
+                path = os.path.join(self.db_dir, name)
+                if not os.path.exists(path):
+                    continue
+                for record in _read_records(path):
+                    self._apply(record)
+                    count += 1
+            self.mutations += count
+        return count
+
+    def checkpoint(self, force: bool = False, migrate: bool = False):
+        """Snapshot the store and drop the log it covers, runs on a background thread.
+
+        With migrate, a flat index past the ANN threshold is replaced by the configured one first.
+        """
+        with _get_dir_lock(self.db_dir):
+            if migrate:
+                self._migrate()
+            with self.lock:
+                self._cancel_timer()
+                if not self.mutations and not force:
+                    return
+                # copied while locked, written without blocking mutations
+                index = faiss.clone_index(self.db.index)
+                state = _get_state(self.db)
+                self._rotate()
+                self.mutations = 0
+            try:
+                _write_snapshot(self.db_dir, index, state)
+                rotated = os.path.join(self.db_dir, CHECKPOINT_WAL_FILE)
+                if os.path.exists(rotated):
+                    os.remove(rotated)
+            except Exception as e:
+                # the rotated log is kept and replayed, the next checkpoint tries again
+                PrintStyle.error(f"Error saving memory checkpoint {self.db_dir}: {e}")
+
+    def close(self):
+        self.checkpoint()
+        _wals.discard(self)
+
+    def _migrate(self):
+        # built from a copy of the vectors without the lock, swapped in with the mutations made meanwhile
+        if not isinstance(self.db, IndexedFaiss):
+            return
+        try:
+            with self.lock:
+                prepared = self.db.prepare_migration()
+            if not prepared:
+                return
+            target, vectors, renumbered = prepared
+            index = vector_index.create_index(target, vectors.shape[1], vectors)
+            with self.lock:
+                # vectors renumbered by a delete meanwhile, the next checkpoint builds again
+                self.db.finish_migration(index, len(vectors), renumbered)
+        except Exception as e:
+            PrintStyle.error(f"Error building memory index {self.db_dir}: {e}")
+
+    def _append(self, record: dict[str, Any]):
+        with open(os.path.join(self.db_dir, WAL_FILE), "ab") as f:
+            f.write(pickle.dumps(record))
+        self.mutations += 1
+        if self.mutations >= CHECKPOINT_MUTATIONS:
+            self._cancel_timer()
+            threading.Thread(target=self.checkpoint, kwargs={"migrate": True}, daemon=True).start()
+        elif self.timer is None:
+            self.timer = threading.Timer(CHECKPOINT_INTERVAL, self.checkpoint, kwargs={"migrate": True})
+            self.timer.daemon = True
+            self.timer.start()
+
+    def _apply(self, record: dict[str, Any]):
+        # records set or remove whole documents, so replaying what the snapshot has already is harmless
+        docs: dict = self.db.docstore._dict  # type: ignore
+        present = [id for id in record["ids"] if id in docs]
+        if present:
+            self.db.delete(present)
+        if record["op"] == "add":
+            self.db.add_embeddings(
+                list(zip(record["texts"], record["vectors"].tolist())),
+                metadatas=record["metadatas"],
+                ids=record["ids"],
+            )
+
+    def _rotate(self):
+        path = os.path.join(self.db_dir, WAL_FILE)
+        rotated = os.path.join(self.db_dir, CHECKPOINT_WAL_FILE)
+        if not os.path.exists(path):
+            return
+        if os.path.exists(rotated):
+            # a failed checkpoint left its log behind, it is still needed
+            with open(path, "rb") as src, open(rotated, "ab") as dst:
+                dst.write(src.read())
+            os.remove(path)
+        else:
+            os.replace(path, rotated)
+
+    def _cancel_timer(self):
+        if self.timer:
+            self.timer.cancel()
+            self.timer = None
+
+
+def save_db(db: FAISS, db_dir: str):
+    """Save the store like FAISS.save_local, but the index and docstore files are replaced together"""
+    with _get_dir_lock(db_dir):
+        _write_snapshot(db_dir, db.index, _get_state(db))
+        # the snapshot has everything, logs of an earlier store must not be replayed over it
+        for name in (WAL_FILE, CHECKPOINT_WAL_FILE):
+            if os.path.exists(os.path.join(db_dir, name)):
+                os.remove(os.path.join(db_dir, name))
+
+
+def recover(db_dir: str):
+    """Finish or drop a snapshot a crash interrupted, before the store is loaded"""
+    with _get_dir_lock(db_dir):
+        if os.path.exists(os.path.join(db_dir, SNAPSHOT_MARKER_FILE)):
+            _commit_snapshot(db_dir)
+        for name in SNAPSHOT_FILES:
+            tmp = os.path.join(db_dir, name + ".tmp")
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+
+def checkpoint_all():
+    for wal in list(_wals):
+        wal.checkpoint()
+
+
+atexit.register(checkpoint_all)
+
+
+def _get_dir_lock(db_dir: str) -> threading.Lock:
+    with _dir_locks_lock:
+        return _dir_locks.setdefault(os.path.abspath(db_dir), threading.Lock())
+
+
+def _get_state(db: FAISS) -> tuple[InMemoryDocstore, dict[int, str]]:
+    # the pickled part of FAISS.save_local, copied so it can be written while the store changes
+    return InMemoryDocstore(dict(db.docstore._dict)), dict(db.index_to_docstore_id)  # type: ignore
+
+
+def _write_snapshot(db_dir: str, index: faiss.Index, state: tuple):
+    os.makedirs(db_dir, exist_ok=True)
+    _write_synced(os.path.join(db_dir, "index.pkl.tmp"), pickle.dumps(state))
+    # written by faiss itself, serialize_index breaks once another SWIG module such as pymupdf is loaded
+    faiss.write_index(index, os.path.join(db_dir, "index.faiss.tmp"))
+    _sync(os.path.join(db_dir, "index.faiss.tmp"))
+    # both files are complete once the marker exists, recover() finishes the renames after a crash
+    _write_synced(os.path.join(db_dir, SNAPSHOT_MARKER_FILE), b"")
+    _commit_snapshot(db_dir)
+
+
+def _commit_snapshot(db_dir: str):
+    for name in SNAPSHOT_FILES:
+        tmp = os.path.join(db_dir, name + ".tmp")
+        if os.path.exists(tmp):
+            os.replace(tmp, os.path.join(db_dir, name))
+    os.remove(os.path.join(db_dir, SNAPSHOT_MARKER_FILE))
+
+
+def _write_synced(path: str, content: bytes):
+    with open(path, "wb") as f:
+        f.write(content)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _sync(path: str):
+    with open(path, "rb") as f:
+        os.fsync(f.fileno())
+
+
+def _read_records(path: str) -> list[dict[str, Any]]:
+    records = []
+    size = os.path.getsize(path)
+    with open(path, "r+b") as f:
+        end = 0
+        while end < size:
+            try:
+                records.append(pickle.load(f))
+                end = f.tell()
+            except Exception:
+                # a record torn by a crash, cut it off so new records are not appended after it
+                f.truncate(end)
+                break
+    return records
@@ -0,0 +1,554 @@
+import ast
+import operator
+import threading
+from functools import lru_cache
+from typing import Any, Callable, Iterable, Sequence
+
+import numpy as np
+from langchain_community.vectorstores import FAISS
+from langchain_community.vectorstores.utils import DistanceStrategy
+from langchain_core.documents import Document
+from simpleeval import simple_eval
+
+# faiss needs to be patched for python 3.12 on arm #TODO remove once not needed
+from python.helpers import faiss_monkey_patch
+import faiss
+
+from python.helpers import vector_index
+
+# metadata keys with an inverted index, equality filters on them select vectors before scoring
+INDEXED_KEYS = ("area", "knowledge_source", "document_uri", "source_file")
+
+_COMPARE_OPERATORS: dict[type, Callable[[Any, Any], Any]] = {
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+    ast.In: lambda a, b: a in b,
+    ast.NotIn: lambda a, b: a not in b,
+}
+
+
+class MetadataIndex:
+    """Inverted index of docstore ids by value for the INDEXED_KEYS"""
+
+    def __init__(self):
+        self.values: dict[str, dict[Any, set[str]]] = {key: {} for key in INDEXED_KEYS}
+
+    def add(self, id: str, metadata: dict):
+        for key, values in self.values.items():
+            value = metadata.get(key)
+            if value is not None and _hashable(value):
+                values.setdefault(value, set()).add(id)
+
+    def remove(self, id: str, metadata: dict):
+        for key, values in self.values.items():
+            value = metadata.get(key)
+            if value is not None and _hashable(value) and value in values:
+                values[value].discard(id)
+                if not values[value]:
+                    del values[value]
+
+    def lookup(self, key: str, value: Any) -> set[str]:
+        return self.values[key].get(value, set())
+
+
+class MetadataFilter:
+    """Filter condition like "area == 'main' or area == 'fragments'", parsed once.
+
+    Called with document metadata it evaluates like simple_eval did, a missing key
+    or an error makes it False. candidates() narrows it down to docstore ids using a
+    MetadataIndex, or returns None when the condition cannot use the index.
+    """
+
+    def __init__(self, condition: str):
+        self.condition = condition
+        try:
+            self.node: _Node = _parse(ast.parse(condition.strip(), mode="eval").body)
+        except (SyntaxError, _Unsupported):
+            self.node = _Eval(condition)
+
+    def __call__(self, metadata: dict) -> bool:
+        try:
+            return bool(self.node.evaluate(metadata))
+        except Exception:
+            return False
+
+    def candidates(self, index: MetadataIndex) -> set[str] | None:
+        return self.node.candidates(index)
+
+
+@lru_cache(maxsize=256)
+def parse_filter(condition: str) -> MetadataFilter:
+    return MetadataFilter(condition)
+
+
+class IndexedFaiss(FAISS):
+    """FAISS store with a metadata index, so searches with a MetadataFilter only score matching vectors.
+
+    index_type ("flat", "hnsw", "ivf_flat", "ivf_pq" or "auto") is the index the store
+    moves to once it is large enough, see vector_index. Adding never builds it, migrate()
+    or prepare_migration() and finish_migration() do, the memory WAL calls them in its
+    background checkpoint. ANN indexes cannot drop vectors cheaply, deleted positions
+    stay in them, are skipped by searches and dropped when the index is compacted.
+    """
+
+    def __init__(self, *args, index_type: str = "flat", **kwargs):
+        super().__init__(*args, **kwargs)
+        self.index_type = index_type
+        self._metadata_index: MetadataIndex | None = None
+        self._positions: dict[str, int] | None = None  # docstore id -> faiss vector id
+        self._deleted: set[int] | None = None  # faiss vector ids of deleted documents still in an ANN index
+        self._renumbered = 0  # moves whenever vector ids change, an index built before cannot be swapped in then
+        self._swap_lock = threading.Lock()  # searches see index and positions of the same build
+
+    @property
+    def metadata_index(self) -> MetadataIndex:
+        if self._metadata_index is None:
+            index = MetadataIndex()
+            for id, doc in self.docstore._dict.items():  # type: ignore
+                index.add(id, doc.metadata)
+            self._metadata_index = index
+        return self._metadata_index
+
+    def get_positions(self) -> dict[str, int]:
+        if self._positions is None:
+            docs = self.docstore._dict  # type: ignore
+            # an id deleted and added again in an ANN index is live at its last position
+            self._positions = {id: i for i, id in self.index_to_docstore_id.items() if id in docs}
+        return self._positions
+
+    def get_deleted(self) -> set[int]:
+        if self._deleted is None:
+            live = set(self.get_positions().values())
+            self._deleted = {i for i in self.index_to_docstore_id if i not in live}
+        return self._deleted
+
+    def is_ann(self) -> bool:
+        return not isinstance(self.index, faiss.IndexFlat)
+
+    def set_index_type(self, index_type: str) -> bool:
+        """Configure the index type, returns True when the index was rebuilt to match it"""
+        self.index_type = index_type
+        target = vector_index.get_target_type(index_type, len(self.get_positions()))
+        if target == vector_index.get_index_type(self.index):
+            return False
+        self._rebuild(lambda vectors: vector_index.create_index(target, self.index.d, vectors))
+        return True
+
+    def add_texts(self, texts, metadatas=None, ids=None, **kwargs):
+        start = len(self.index_to_docstore_id)
+        result = super().add_texts(texts, metadatas, ids, **kwargs)
+        self._index_added(start)
+        return result
+
+    async def aadd_texts(self, texts, metadatas=None, ids=None, **kwargs):
+        start = len(self.index_to_docstore_id)
+        result = await super().aadd_texts(texts, metadatas, ids, **kwargs)
+        self._index_added(start)
+        return result
+
+    def add_embeddings(self, text_embeddings, metadatas=None, ids=None, **kwargs):
+        start = len(self.index_to_docstore_id)
+        result = super().add_embeddings(text_embeddings, metadatas, ids, **kwargs)
+        self._index_added(start)
+        return result
+
+    def delete(self, ids=None, **kwargs):
+        if self._metadata_index is not None and ids:
+            for id in ids:
+                doc = self.docstore._dict.get(id)  # type: ignore
+                if doc is not None:
+                    self._metadata_index.remove(id, doc.metadata)
+        if not self.is_ann():
+            result = super().delete(ids, **kwargs)
+            self._positions = None  # remaining vectors are renumbered
+            self._renumbered += 1
+            return result
+
+        if ids is None:
+            raise ValueError("No ids provided to delete.")
+        positions = self.get_positions()
+        missing = set(ids).difference(positions)
+        if missing:
+            raise ValueError(
+                f"Some specified ids do not exist in the current store. Ids not found: {missing}"
+            )
+        deleted = self.get_deleted()
+        for id in ids:
+            deleted.add(positions.pop(id))
+        self.docstore.delete(ids)
+        if len(deleted) > vector_index.COMPACT_RATIO * self.index.ntotal:
+            self._compact()
+        return True
+
+    def merge_from(self, target):
+        super().merge_from(target)
+        self._metadata_index = None
+        self._positions = None
+        self._deleted = None
+        self._renumbered += 1
+
+    def _index_added(self, start: int):
+        for position in range(start, len(self.index_to_docstore_id)):
+            id = self.index_to_docstore_id[position]
+            if self._positions is not None:
+                self._positions[id] = position
+            if self._metadata_index is not None:
+                self._metadata_index.add(id, self.docstore._dict[id].metadata)  # type: ignore
+
+    def migrate(self) -> bool:
+        """Replace a flat index past the threshold by the configured ANN index now, returns True if it was"""
+        prepared = self.prepare_migration()
+        if not prepared:
+            return False
+        target, vectors, renumbered = prepared
+        index = vector_index.create_index(target, self.index.d, vectors)
+        return self.finish_migration(index, len(vectors), renumbered)
+
+    def prepare_migration(self) -> tuple[str, np.ndarray, int] | None:
+        """Target type, vectors and renumbering state to build an ANN index from, None while flat fits.
+
+        The build takes seconds for large stores, so it can run elsewhere while the store changes.
+        """
+        if self.is_ann():
+            return None
+        target = vector_index.get_target_type(self.index_type, self.index.ntotal)
+        if target == "flat":
+            return None
+        return target, self.index.reconstruct_n(0, self.index.ntotal), self._renumbered
+
+    def finish_migration(self, index: faiss.Index, count: int, renumbered: int) -> bool:
+        """Swap in an index built from the first count vectors, vectors added since are added to it.
+
+        Returns False when vectors were renumbered meanwhile and the index does not match anymore.
+        """
+        if self.is_ann() or renumbered != self._renumbered:
+            return False
+        # positions stay the same, a flat index only appends until it is renumbered
+        if self.index.ntotal > count:
+            index.add(self.index.reconstruct_n(count, self.index.ntotal - count))  # type: ignore
+        with self._swap_lock:
+            self.index = index
+        return True
+
+    def _compact(self):
+        index = self.index
+        self._rebuild(lambda vectors: vector_index.rebuild_index(index, vectors))
+
+    def _rebuild(self, build: Callable[[np.ndarray], faiss.Index]):
+        # a new index of the live vectors only, they are renumbered in order
+        live = sorted(self.get_positions().items(), key=lambda item: item[1])
+        selected = np.array([position for _, position in live], dtype=np.int64)
+        vectors = np.empty((0, self.index.d), dtype=np.float32)
+        if len(selected):
+            vectors = self.index.reconstruct_batch(selected)
+        index = build(vectors)
+        with self._swap_lock:
+            self.index = index
+            self.index_to_docstore_id = {i: id for i, (id, _) in enumerate(live)}
+            self._positions = None
+            self._deleted = None
+            self._renumbered += 1
+
+    def _view(self) -> tuple[faiss.Index, dict[int, str], dict[str, int], set[int]]:
+        with self._swap_lock:
+            return self.index, self.index_to_docstore_id, self.get_positions(), self.get_deleted()
+
+    def search_by_filter(self, filter: MetadataFilter, limit: int = 0) -> list[Document]:
+        """Documents matching the filter in insertion order, scans all only when the index cannot help"""
+        docs: dict[str, Document] = self.docstore._dict  # type: ignore
+        ids = filter.candidates(self.metadata_index)
+        if ids is not None:
+            positions = self.get_positions()
+            docs = {id: docs[id] for id in sorted(ids, key=lambda id: positions.get(id, -1)) if id in docs}
+        result = []
+        for doc in docs.values():
+            if filter(doc.metadata):
+                result.append(doc)
+                # stop if limit reached and limit > 0
+                if limit > 0 and len(result) >= limit:
+                    break
+        return result
+
+    def similarity_search_with_score_by_vector(
+        self, embedding, k: int = 4, filter=None, fetch_k: int = 20, **kwargs
+    ):
+        if isinstance(filter, MetadataFilter):
+            ids = filter.candidates(self.metadata_index)
+            if ids is not None:
+                vectors = self._query_vectors([embedding])
+                return self._search_selected(vectors, [k], filter, ids, fetch_k, **kwargs)[0]
+        if self.is_ann():
+            # the base search does not know about deleted vectors
+            vectors = self._query_vectors([embedding])
+            return self._search_all(vectors, [k], filter, fetch_k, **kwargs)[0]
+        return super().similarity_search_with_score_by_vector(
+            embedding, k, filter, fetch_k, **kwargs
+        )
+
+    def similarity_search_many_by_vectors(
+        self,
+        embeddings: Sequence[Sequence[float]],
+        ks: Sequence[int],
+        filters: Sequence[Any],
+        fetch_k: int = 20,
+        **kwargs,
+    ) -> list[list[tuple[Document, float]]]:
+        """similarity_search_with_score_by_vector for each vector, the vectors sharing a filter are searched as one matrix"""
+        vectors = self._query_vectors(embeddings)
+        groups: dict[int, list[int]] = {}
+        for row, filter in enumerate(filters):
+            groups.setdefault(id(filter), []).append(row)
+
+        results: list[list[tuple[Document, float]]] = [[] for _ in ks]
+        for rows in groups.values():
+            filter = filters[rows[0]]
+            group_ks = [ks[row] for row in rows]
+            found = None
+            if isinstance(filter, MetadataFilter):
+                ids = filter.candidates(self.metadata_index)
+                if ids is not None:
+                    found = self._search_selected(vectors[rows], group_ks, filter, ids, fetch_k, **kwargs)
+            if found is None:
+                found = self._search_all(vectors[rows], group_ks, filter, fetch_k, **kwargs)
+            for row, docs in zip(rows, found):
+                results[row] = docs
+        return results
+
+    def _search_selected(
+        self,
+        vectors: np.ndarray,
+        ks: list[int],
+        filter: MetadataFilter,
+        ids: Iterable[str],
+        fetch_k: int,
+        **kwargs,
+    ) -> list[list[tuple[Document, float]]]:
+        index, mapping, positions, _ = self._view()
+        ids = list(ids)  # the index sets change with the store
+        selected = np.fromiter((positions[id] for id in ids if id in positions), dtype=np.int64)
+        if not len(selected):
+            return [[] for _ in ks]
+
+        # only the selected vectors are scored, a few more are fetched for conditions the index does not cover
+        fetch = min(len(selected), max(max(ks), fetch_k))
+        if len(selected) <= vector_index.EXACT_SEARCH_LIMIT:
+            # exact, ANN searches restricted to a few vectors would miss most of them
+            scores = vectors @ index.reconstruct_batch(selected).T
+            order = np.argsort(-scores, axis=1, kind="stable")[:, :fetch]
+            rows = [(scores[row, order[row]], selected[order[row]]) for row in range(len(vectors))]
+        else:
+            selector = faiss.IDSelectorBatch(selected)
+            scores, indices = index.search(
+                vectors, fetch, params=vector_index.search_params(index, selector, fetch)
+            )
+            rows = list(zip(scores, indices))
+        return [
+            self._collect(mapping, row_scores, row_indices, filter, k, **kwargs)
+            for (row_scores, row_indices), k in zip(rows, ks)
+        ]
+
+    def _search_all(
+        self, vectors: np.ndarray, ks: list[int], filter, fetch_k: int, **kwargs
+    ) -> list[list[tuple[Document, float]]]:
+        index, mapping, _, deleted = self._view()
+        fetch = max(ks) if filter is None else max(max(ks), fetch_k)
+        if fetch <= 0 or not index.ntotal:
+            return [[] for _ in ks]
+        selector = None
+        if deleted:
+            skipped = faiss.IDSelectorBatch(np.fromiter(list(deleted), dtype=np.int64))
+            selector = faiss.IDSelectorNot(skipped)  # refers to skipped, which has to outlive the search
+        scores, indices = index.search(
+            vectors, fetch, params=vector_index.search_params(index, selector, fetch)
+        )
+        filter_func = self._create_filter_func(filter) if filter is not None else None
+        return [
+            self._collect(mapping, row_scores, row_indices, filter_func, k, **kwargs)
+            for row_scores, row_indices, k in zip(scores, indices, ks)
+        ]
+
+    def _query_vectors(self, embeddings) -> np.ndarray:
+        vectors = np.array(embeddings, dtype=np.float32).reshape(len(embeddings), -1)
+        if self._normalize_L2:
+            faiss.normalize_L2(vectors)
+        return vectors
+
+    def _collect(
+        self, mapping: dict[int, str], scores, indices, filter, k: int, **kwargs
+    ) -> list[tuple[Document, float]]:
+        docs = []
+        for score, i in zip(scores, indices):
+            if i == -1 or i not in mapping:
+                continue
+            doc = self.docstore.search(mapping[i])
+            if isinstance(doc, Document) and (filter is None or filter(doc.metadata)):
+                docs.append((doc, score))
+
+        score_threshold = kwargs.get("score_threshold")
+        if score_threshold is not None:
+            cmp = (
+                operator.ge
+                if self.distance_strategy
+                in (DistanceStrategy.MAX_INNER_PRODUCT, DistanceStrategy.JACCARD)
+                else operator.le
+            )
+            docs = [(doc, score) for doc, score in docs if cmp(score, score_threshold)]
+        return docs[:k]
+
+
+# ---------------- Predicate tree ----------------
+
+
+class _Unsupported(Exception):
+    pass
+
+
+class _Node:
+    def evaluate(self, metadata: dict) -> Any:
+        raise NotImplementedError
+
+    def candidates(self, index: MetadataIndex) -> set[str] | None:
+        return None
+
+
+class _Name(_Node):
+    def __init__(self, key: str):
+        self.key = key
+
+    def evaluate(self, metadata: dict) -> Any:
+        return metadata[self.key]  # missing keys fail the filter like in simple_eval
+
+
+class _Constant(_Node):
+    def __init__(self, value: Any):
+        self.value = value
+
+    def evaluate(self, metadata: dict) -> Any:
+        return self.value
+
+
+class _Compare(_Node):
+    def __init__(self, op: type, left: _Node, right: _Node):
+        self.op = op
+        self.function = _COMPARE_OPERATORS[op]
+        self.left = left
+        self.right = right
+
+    def evaluate(self, metadata: dict) -> Any:
+        return self.function(self.left.evaluate(metadata), self.right.evaluate(metadata))
+
+    def candidates(self, index: MetadataIndex) -> set[str] | None:
+        name, constant = self.left, self.right
+        if self.op is ast.Eq and isinstance(constant, _Name):
+            name, constant = constant, name
+        if not isinstance(name, _Name) or name.key not in INDEXED_KEYS:
+            return None
+        if not isinstance(constant, _Constant):
+            return None
+        if self.op is ast.Eq and _hashable(constant.value):
+            return index.lookup(name.key, constant.value)
+        if self.op is ast.In and isinstance(constant.value, (tuple, list, set, frozenset)):
+            if all(_hashable(value) for value in constant.value):
+                return set().union(*(index.lookup(name.key, value) for value in constant.value))
+        return None
+
+
+class _And(_Node):
+    def __init__(self, nodes: list[_Node]):
+        self.nodes = nodes
+
+    def evaluate(self, metadata: dict) -> Any:
+        result: Any = True
+        for node in self.nodes:
+            result = node.evaluate(metadata)
+            if not result:
+                return result
+        return result
+
+    def candidates(self, index: MetadataIndex) -> set[str] | None:
+        result = None
+        for node in self.nodes:
+            ids = node.candidates(index)
+            if ids is not None:
+                result = ids if result is None else result & ids
+        return result
+
+
+class _Or(_Node):
+    def __init__(self, nodes: list[_Node]):
+        self.nodes = nodes
+
+    def evaluate(self, metadata: dict) -> Any:
+        result: Any = False
+        for node in self.nodes:
+            result = node.evaluate(metadata)
+            if result:
+                return result
+        return result
+
+    def candidates(self, index: MetadataIndex) -> set[str] | None:
+        result: set[str] = set()
+        for node in self.nodes:
+            ids = node.candidates(index)
+            if ids is None:
+                return None
+            result = result | ids
+        return result
+
+
+class _Not(_Node):
+    def __init__(self, node: _Node):
+        self.node = node
+
+    def evaluate(self, metadata: dict) -> Any:
+        return not self.node.evaluate(metadata)
+
+
+class _Eval(_Node):
+    # anything the tree does not cover is left to simple_eval
+    def __init__(self, condition: str):
+        self.condition = condition
+
+    def evaluate(self, metadata: dict) -> Any:
+        return simple_eval(self.condition, names=metadata)
+
+
+def _parse(node: ast.AST) -> _Node:
+    if isinstance(node, ast.BoolOp):
+        nodes = [_parse(value) for value in node.values]
+        return _And(nodes) if isinstance(node.op, ast.And) else _Or(nodes)
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+        return _Not(_parse(node.operand))
+    if isinstance(node, ast.Compare):
+        # a < b < c is a < b and b < c
+        nodes: list[_Node] = []
+        left = _parse(node.left)
+        for op, comparator in zip(node.ops, node.comparators):
+            if type(op) not in _COMPARE_OPERATORS:
+                raise _Unsupported()
+            right = _parse(comparator)
+            nodes.append(_Compare(type(op), left, right))
+            left = right
+        return nodes[0] if len(nodes) == 1 else _And(nodes)
+    if isinstance(node, ast.Name):
+        return _Name(node.id)
+    if isinstance(node, ast.Constant):
+        return _Constant(node.value)
+    if isinstance(node, (ast.Tuple, ast.List)):
+        values = [_parse(element) for element in node.elts]
+        if all(isinstance(value, _Constant) for value in values):
+            constants = [value.value for value in values]  # type: ignore
+            return _Constant(tuple(constants) if isinstance(node, ast.Tuple) else constants)
+    raise _Unsupported()
+
+
+def _hashable(value: Any) -> bool:
+    try:
+        hash(value)
+        return True
+    except TypeError:
+        return False
@@ -2,6 +2,7 @@ from dataclasses import dataclass
 import uuid
 from datetime import datetime, timezone, timedelta
 from enum import Enum
+from python.helpers import state_monitor
 
 
 class NotificationType(Enum):
@@ -110,6 +111,7 @@ class NotificationManager:
 
         # Enforce limit
         self._enforce_limit()
+        state_monitor.mark_dirty()
 
         return item
 
@@ -150,6 +152,7 @@ class NotificationManager:
                 if hasattr(item, key):
                     setattr(item, key, value)
             self.updates.append(no)
+            state_monitor.mark_dirty()
 
     def mark_all_read(self):
         for notification in self.notifications:
@@ -158,6 +161,7 @@ class NotificationManager:
     def clear_all(self):
         self.notifications = []
         self.updates = []
+        state_monitor.mark_dirty()
         self.guid = str(uuid.uuid4())
 
     def get_notifications_by_type(self, type: NotificationType) -> list[NotificationItem]:
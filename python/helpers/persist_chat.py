@@ -1,5 +1,9 @@
+import atexit
 from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime
+import os
+import threading
 from typing import Any
 import uuid
 from agent import Agent, AgentConfig, AgentContext, AgentContextType
@@ -12,6 +16,21 @@ from python.helpers.log import Log, LogItem
 CHATS_FOLDER = "tmp/chats"
 LOG_SIZE = 1000
 CHAT_FILE_NAME = "chat.json"
+JOURNAL_FILE_NAME = "chat.journal.jsonl"
+JOURNAL_DATA_KEY = "_chat_journal"
+JOURNAL_GENERATION_KEY = "journal_generation"  # in the snapshot, journal records of other snapshots are skipped
+JOURNAL_DEBOUNCE = 1.0  # seconds journal records are collected before they are written
+JOURNAL_COMPACT_RECORDS = 100  # records after which the journal is folded into a new snapshot
+JOURNAL_COMPACT_SIZE = 4 * 1024 * 1024  # journal bytes after which it is folded as well
+
+CHATS_INDEX_FILE = "tmp/chats_index.json"  # chat metadata for lazy loading, outside of the chats folder
+LOAD_WORKERS = 4  # threads parsing chat files in the background when loading lazily
+
+_journal_lock = threading.RLock()
+_journal_writes: dict[str, list[tuple[str, str]]] = {}
+_journal_timer: threading.Timer | None = None
+_chats_index: dict[str, dict] = {}
+_chats_index_dirty = False
 
 
 def get_chat_folder_path(ctxid: str):
@@ -34,12 +53,84 @@ def save_tmp_chat(context: AgentContext):
     # Skip saving BACKGROUND contexts as they should be ephemeral
     if context.type == AgentContextType.BACKGROUND:
         return
+    if _is_untouched(context):
+        return
 
-    path = _get_chat_file_path(context.id)
-    files.make_dirs(path)
     data = _serialize_context(context)
+    # the new snapshot is the base for later journal records
+    state = _JournalState(context)
+    data[JOURNAL_GENERATION_KEY] = state.generation
     js = _safe_json_serialize(data, ensure_ascii=False)
-    files.write_file(path, js)
+    context.set_data(JOURNAL_DATA_KEY, state)
+    with _journal_lock:
+        _journal_writes.pop(context.id, None)
+        _write_snapshot(context.id, js)
+    _update_index(context.id, _index_entry(data))
+
+
+def journal_tmp_chat(context: AgentContext):
+    """Record what changed since the last save, written to the chat journal in the background"""
+    # Skip saving BACKGROUND contexts as they should be ephemeral
+    if context.type == AgentContextType.BACKGROUND:
+        return
+    if _is_untouched(context):
+        return
+
+    state: _JournalState | None = context.get_data(JOURNAL_DATA_KEY)
+    if not state or state.needs_snapshot(context):
+        # fold everything into a new snapshot, the journal starts over
+        data = _serialize_context(context)
+        state = _JournalState(context)
+        data[JOURNAL_GENERATION_KEY] = state.generation
+        js = _safe_json_serialize(data, ensure_ascii=False)
+        context.set_data(JOURNAL_DATA_KEY, state)
+        _queue_journal_write(context.id, "snapshot", js)
+        _update_index(context.id, _index_entry(data))
+        return
+
+    _update_index(context.id, _index_entry(_serialize_context_fields(context)))
+
+    record = state.record(context)
+    if record:
+        record["generation"] = state.generation
+        line = _safe_json_serialize(record, ensure_ascii=False) + "\n"
+        state.records += 1
+        state.size += len(line)
+        _queue_journal_write(context.id, "append", line)
+
+
+def _is_untouched(context: AgentContext) -> bool:
+    # a lazily loaded chat nothing was logged to yet, its snapshot and journal are on disk already
+    return context.loader is not None and not context.log.logs
+
+
+def flush_journals():
+    """Write all queued journal records and snapshots"""
+    global _journal_timer, _chats_index_dirty
+    with _journal_lock:
+        _journal_timer = None
+        writes = dict(_journal_writes)
+        _journal_writes.clear()
+        for ctxid, ops in writes.items():
+            try:
+                for op, content in ops:
+                    if op == "snapshot":
+                        _write_snapshot(ctxid, content)
+                    elif files.exists(_get_chat_file_path(ctxid)):
+                        # no snapshot means the chat was removed meanwhile
+                        with open(_get_journal_file_path(ctxid), "a", encoding="utf-8") as f:
+                            f.write(content)
+            except Exception as e:
+                print(f"Error writing chat journal {ctxid}: {e}")
+        if _chats_index_dirty:
+            _chats_index_dirty = False
+            try:
+                files.write_file(CHATS_INDEX_FILE, _safe_json_serialize(_chats_index, ensure_ascii=False))
+            except Exception as e:
+                print(f"Error writing chats index: {e}")
+
+
+atexit.register(flush_journals)
 
 
 def save_tmp_chats():
@@ -51,30 +142,120 @@ def save_tmp_chats():
         save_tmp_chat(context)
 
 
-def load_tmp_chats():
-    """Load all contexts from the chats folder"""
+def load_tmp_chats(lazy: bool = False):
+    """Load all contexts from the chats folder
+
+    With lazy, only chat metadata is loaded now, mostly from the chats index.
+    Chat files are parsed in the background and each context is fully loaded on first use.
+    """
     _convert_v080_chats()
     folders = files.list_files(CHATS_FOLDER, "*")
-    json_files = []
-    for folder_name in folders:
-        json_files.append(_get_chat_file_path(folder_name))
+    if lazy:
+        return _load_tmp_chats_lazy(folders)
 
     ctxids = []
-    for file in json_files:
+    for folder_name in folders:
+        file = _get_chat_file_path(folder_name)
         try:
-            js = files.read_file(file)
-            data = json.loads(js)
+            data = _read_chat_data(folder_name)
             ctx = _deserialize_context(data)
+            _update_index(ctx.id, _index_entry(data))
             ctxids.append(ctx.id)
         except Exception as e:
             print(f"Error loading chat {file}: {e}")
     return ctxids
 
 
+def _load_tmp_chats_lazy(folders: list[str]):
+    try:
+        index = json.loads(files.read_file(CHATS_INDEX_FILE))
+    except Exception:
+        index = {}
+
+    config = initialize_agent()  # shared until a context is loaded
+    executor = ThreadPoolExecutor(max_workers=LOAD_WORKERS, thread_name_prefix="ChatLoad")
+    ctxids = []
+    for folder_name in folders:
+        future = executor.submit(_read_chat_data, folder_name)
+        try:
+            entry = index.get(folder_name)
+            if not entry:
+                # not indexed yet, the metadata is in the chat file
+                entry = _index_entry(future.result())
+            ctx = _deserialize_context_lazy(entry, config, future)
+            _update_index(ctx.id, entry)
+            ctxids.append(ctx.id)
+        except Exception as e:
+            print(f"Error loading chat {_get_chat_file_path(folder_name)}: {e}")
+    executor.shutdown(wait=False)
+    return ctxids
+
+
+def _read_chat_data(ctxid: str) -> dict:
+    data = json.loads(files.read_file(_get_chat_file_path(ctxid)))
+    # the snapshot plus what was journaled after it
+    return _replay_journal(data, _get_journal_file_path(ctxid))
+
+
+def _index_entry(data: dict) -> dict:
+    # data holds the active project, chats are found by it before they are loaded
+    keys = ("id", "name", "created_at", "type", "last_message", "data", "output_data")
+    return {k: data[k] for k in keys if k in data}
+
+
+def _update_index(ctxid: str, entry: dict | None):
+    global _chats_index_dirty
+    with _journal_lock:
+        if _chats_index.get(ctxid) == entry:
+            return
+        if entry is None:
+            _chats_index.pop(ctxid, None)
+        else:
+            _chats_index[ctxid] = entry
+        _chats_index_dirty = True
+        _schedule_flush()
+
+
 def _get_chat_file_path(ctxid: str):
     return files.get_abs_path(CHATS_FOLDER, ctxid, CHAT_FILE_NAME)
 
 
+def _get_journal_file_path(ctxid: str):
+    return files.get_abs_path(CHATS_FOLDER, ctxid, JOURNAL_FILE_NAME)
+
+
+def _write_snapshot(ctxid: str, js: str):
+    path = _get_chat_file_path(ctxid)
+    files.make_dirs(path)
+    # replaced in one step, a crash leaves the old snapshot or the new one, never a partial file
+    tmp = path + ".tmp"
+    files.write_file(tmp, js)
+    os.replace(tmp, path)
+    # records left in the journal belong to the old snapshot and are skipped by their generation
+    journal = _get_journal_file_path(ctxid)
+    if os.path.exists(journal):
+        os.remove(journal)
+
+
+def _queue_journal_write(ctxid: str, op: str, content: str):
+    with _journal_lock:
+        ops = _journal_writes.setdefault(ctxid, [])
+        if op == "snapshot":
+            ops.clear()  # anything queued before is part of the snapshot
+        ops.append((op, content))
+        _schedule_flush()
+
+
+def _schedule_flush():
+    global _journal_timer
+    with _journal_lock:
+        # debounce, one background write for everything queued meanwhile
+        if not _journal_timer:
+            _journal_timer = threading.Timer(JOURNAL_DEBOUNCE, flush_journals)
+            _journal_timer.daemon = True
+            _journal_timer.start()
+
+
 def _convert_v080_chats():
     json_files = files.list_files(CHATS_FOLDER, "*.json")
     for file in json_files:
@@ -105,8 +286,11 @@ def export_json_chat(context: AgentContext):
 
 def remove_chat(ctxid):
     """Remove a chat or task context"""
-    path = get_chat_folder_path(ctxid)
-    files.delete_dir(path)
+    with _journal_lock:
+        _journal_writes.pop(ctxid, None)
+        path = get_chat_folder_path(ctxid)
+        files.delete_dir(path)
+    _update_index(ctxid, None)
 
 
 def remove_msg_files(ctxid):
@@ -116,14 +300,15 @@ def remove_msg_files(ctxid):
 
 
 def _serialize_context(context: AgentContext):
-    # serialize agents
-    agents = []
-    agent = context.agent0
-    while agent:
-        agents.append(_serialize_agent(agent))
-        agent = agent.data.get(Agent.DATA_NAME_SUBORDINATE, None)
+    context.hydrate()  # lazily loaded chats are never saved with just their metadata
+    return {
+        **_serialize_context_fields(context),
+        "agents": [_serialize_agent(agent) for agent in _get_agents(context)],
+        "log": _serialize_log(context.log),
+    }
 
 
+def _serialize_context_fields(context: AgentContext):
     data = {k: v for k, v in context.data.items() if not k.startswith("_")}
     output_data = {k: v for k, v in context.output_data.items() if not k.startswith("_")}
 
@@ -141,16 +326,23 @@ def _serialize_context(context: AgentContext):
             if context.last_message
             else datetime.fromtimestamp(0).isoformat()
         ),
-        "agents": agents,
         "streaming_agent": (
             context.streaming_agent.number if context.streaming_agent else 0
         ),
-        "log": _serialize_log(context.log),
         "data": data,
         "output_data": output_data,
     }
 
 
+def _get_agents(context: AgentContext) -> list[Agent]:
+    agents = []
+    agent = context.agent0
+    while agent:
+        agents.append(agent)
+        agent = agent.data.get(Agent.DATA_NAME_SUBORDINATE, None)
+    return agents
+
+
 def _serialize_agent(agent: Agent):
     data = {k: v for k, v in agent.data.items() if not k.startswith("_")}
 
@@ -174,6 +366,120 @@ def _serialize_log(log: Log):
     }
 
 
+class _JournalState:
+    """What of a context is persisted already, journal records only hold the difference"""
+
+    def __init__(self, context: AgentContext):
+        self.generation = str(uuid.uuid4())
+        self.records = 0
+        self.size = 0
+        self.log_guid = context.log.guid
+        self.log_version = context.log.get_version()
+        self.log_progress = (context.log.progress, context.log.progress_no)
+        self.fields = self._dump_fields(_serialize_context_fields(context))
+        self.agents = [self._agent_state(agent) for agent in _get_agents(context)]
+
+    def needs_snapshot(self, context: AgentContext) -> bool:
+        return (
+            context.log.guid != self.log_guid  # log was reset
+            or self.records >= JOURNAL_COMPACT_RECORDS
+            or self.size >= JOURNAL_COMPACT_SIZE
+        )
+
+    def record(self, context: AgentContext) -> dict | None:
+        """Build a journal record of the changes and take them as persisted"""
+        record = {}
+
+        fields = self._dump_fields(_serialize_context_fields(context))
+        changed = {k: json.loads(v) for k, v in fields.items() if self.fields.get(k) != v}
+        if changed:
+            record["context"] = changed
+        self.fields = fields
+
+        agents = _get_agents(context)
+        states = [self._agent_state(agent) for agent in agents]
+        updates = []
+        for i, (agent, new) in enumerate(zip(agents, states)):
+            old = self.agents[i] if i < len(self.agents) else None
+            update: dict[str, Any] = {}
+            if not old or old["data"] != new["data"]:
+                update["data"] = json.loads(new["data"])
+            ops = self._history_ops(old, agent) if old else None
+            if ops is None:
+                update["history"] = agent.history.serialize()
+            elif ops:
+                update["ops"] = ops
+            if update:
+                updates.append({"index": i, "number": agent.number, **update})
+        if updates or len(agents) != len(self.agents):
+            record["agents"] = len(agents)
+            record["agent_updates"] = updates
+        self.agents = states
+
+        log = context.log
+        version = log.get_version()
+        progress = (log.progress, log.progress_no)
+        if version != self.log_version or progress != self.log_progress:
+            nos = dict.fromkeys(log.updates[self.log_version :])
+            record["log"] = {
+                "items": [log.logs[no].output() for no in nos],
+                "progress": log.progress,
+                "progress_no": log.progress_no,
+            }
+        self.log_version = version
+        self.log_progress = progress
+
+        return record or None
+
+    @staticmethod
+    def _dump_fields(fields: dict) -> dict[str, str]:
+        return {k: _safe_json_serialize(v, ensure_ascii=False) for k, v in fields.items()}
+
+    @staticmethod
+    def _agent_state(agent: Agent) -> dict:
+        hist = agent.history
+        data = {k: v for k, v in agent.data.items() if not k.startswith("_")}
+        return {
+            "history": hist,
+            "revision": hist.revision,
+            "bulks": len(hist.bulks),
+            "topics": len(hist.topics),
+            "current": hist.current,
+            "messages": len(hist.current.messages),
+            "data": _safe_json_serialize(data, ensure_ascii=False),
+        }
+
+    @staticmethod
+    def _history_ops(old: dict, agent: Agent) -> list | None:
+        # appended messages and new topics as operations, None when history was rewritten
+        hist = agent.history
+        if (
+            hist is not old["history"]
+            or hist.revision != old["revision"]
+            or len(hist.bulks) != old["bulks"]
+        ):
+            return None
+
+        ops = []
+        current, start = old["current"], old["messages"]
+        if hist.current is not current:
+            # the old current topic was closed and a new one started
+            if len(hist.topics) != old["topics"] + 1 or hist.topics[-1] is not current:
+                return None
+            if len(current.messages) > start:
+                ops.append(["messages", [m.to_dict() for m in current.messages[start:]]])
+            ops.append(["topic"])
+            current, start = hist.current, 0
+        elif len(hist.topics) != old["topics"]:
+            return None
+
+        if len(current.messages) < start:
+            return None
+        if len(current.messages) > start:
+            ops.append(["messages", [m.to_dict() for m in current.messages[start:]]])
+        return ops
+
+
 def _deserialize_context(data):
     config = initialize_agent()
     log = _deserialize_log(data.get("log", None))
@@ -182,18 +488,9 @@ def _deserialize_context(data):
         config=config,
         id=data.get("id", None),  # get new id
         name=data.get("name", None),
-        created_at=(
-            datetime.fromisoformat(
-                # older chats may not have created_at - backcompat
-                data.get("created_at", datetime.fromtimestamp(0).isoformat())
-            )
-        ),
+        created_at=_deserialize_datetime(data.get("created_at", None)),
         type=AgentContextType(data.get("type", AgentContextType.USER.value)),
-        last_message=(
-            datetime.fromisoformat(
-                data.get("last_message", datetime.fromtimestamp(0).isoformat())
-            )
-        ),
+        last_message=_deserialize_datetime(data.get("last_message", None)),
         log=log,
         paused=False,
         data=data.get("data", {}),
@@ -201,7 +498,49 @@ def _deserialize_context(data):
         # agent0=agent0,
         # streaming_agent=straming_agent,
     )
+    _restore_agents(context, data, config)
+    return context
 
+
+def _deserialize_context_lazy(entry: dict, config: AgentConfig, future: "Future[dict]"):
+    def load(context: AgentContext):
+        try:
+            data = future.result()  # parsed in the background, or waited for here
+        except Exception as e:
+            print(f"Error loading chat {context.id}: {e}")
+            context.agent0 = Agent(0, context.config, context)
+            return
+        config = initialize_agent()
+        context.config = config
+        log = _deserialize_log(data.get("log", None))
+        log.adopt(context.log)  # items logged before loading, e.g. by log_to_all
+        log.context = context
+        context.log = log
+        # metadata may have changed since the context was created from the index
+        context.data = {**data.get("data", {}), **context.data}
+        context.output_data = {**data.get("output_data", {}), **context.output_data}
+        _restore_agents(context, data, config)
+
+    return AgentContext(
+        config=config,
+        id=entry["id"],
+        name=entry.get("name", None),
+        created_at=_deserialize_datetime(entry.get("created_at", None)),
+        type=AgentContextType(entry.get("type", AgentContextType.USER.value)),
+        last_message=_deserialize_datetime(entry.get("last_message", None)),
+        paused=False,
+        data=dict(entry.get("data", {})),
+        output_data=dict(entry.get("output_data", {})),
+        loader=load,
+    )
+
+
+def _deserialize_datetime(value: str | None) -> datetime:
+    # older chats may not have created_at - backcompat
+    return datetime.fromisoformat(value or datetime.fromtimestamp(0).isoformat())
+
+
+def _restore_agents(context: AgentContext, data: dict, config: AgentConfig):
     agents = data.get("agents", [])
     agent0 = _deserialize_agents(agents, config, context)
     streaming_agent = agent0
@@ -211,8 +550,6 @@ def _deserialize_context(data):
     context.agent0 = agent0
     context.streaming_agent = streaming_agent
 
-    return context
-
 
 def _deserialize_agents(
     agents: list[dict[str, Any]], config: AgentConfig, context: AgentContext
@@ -279,6 +616,72 @@ def _deserialize_log(data: dict[str, Any]) -> "Log":
     return log
 
 
+def _replay_journal(data: dict, path: str) -> dict:
+    """Apply journal records to serialized context data"""
+    generation = data.pop(JOURNAL_GENERATION_KEY, None)
+    if not os.path.exists(path):
+        return data
+
+    agents: list[dict] = data.setdefault("agents", [])
+    histories: dict[int, dict] = {}  # parsed agent histories, serialized again at the end
+    log = data.setdefault("log", {})
+    log_items = {item.get("no", i): item for i, item in enumerate(log.get("logs", []))}
+
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                break  # incomplete last write
+            if record.get("generation") != generation:
+                continue  # written before the snapshot was, already part of it
+
+            data.update(record.get("context", {}))
+
+            if "agents" in record:
+                count = record["agents"]
+                del agents[count:]
+                for i in [i for i in histories if i >= count]:
+                    del histories[i]
+                while len(agents) < count:
+                    agents.append({"number": len(agents), "data": {}, "history": ""})
+
+            for update in record.get("agent_updates", []):
+                i = update["index"]
+                agents[i]["number"] = update["number"]
+                if "data" in update:
+                    agents[i]["data"] = update["data"]
+                if "history" in update:
+                    agents[i]["history"] = update["history"]
+                    histories.pop(i, None)
+                elif "ops" in update:
+                    if i not in histories:
+                        histories[i] = (
+                            json.loads(agents[i]["history"])
+                            if agents[i]["history"]
+                            else history.History(None).to_dict()
+                        )
+                    hist = histories[i]
+                    for op in update["ops"]:
+                        if op[0] == "messages":
+                            hist["current"]["messages"].extend(op[1])
+                            hist["counter"] = hist.get("counter", 0) + len(op[1])
+                        elif op[0] == "topic":
+                            hist["topics"].append(hist["current"])
+                            hist["current"] = {"_cls": "Topic", "summary": "", "messages": []}
+
+            if "log" in record:
+                for item in record["log"]["items"]:
+                    log_items[item["no"]] = item
+                log["progress"] = record["log"]["progress"]
+                log["progress_no"] = record["log"]["progress_no"]
+
+    for i, hist in histories.items():
+        agents[i]["history"] = json.dumps(hist, ensure_ascii=False)
+    log["logs"] = [log_items[no] for no in sorted(log_items)][-LOG_SIZE:]
+    return data
+
+
 def _safe_json_serialize(obj, **kwargs):
     def serializer(o):
         if isinstance(o, dict):
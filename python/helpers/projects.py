@@ -153,6 +153,11 @@ def update_project(name: str, data: EditProjectData):
     save_project_variables(name, current["variables"])
     save_project_secrets(name, current["secrets"])
 
+    # project instructions and variables are part of the system prompt
+    from python.helpers import prompt_builder
+
+    prompt_builder.invalidate()
+
     reactivate_project_in_chats(name)
     return name
 
@@ -260,7 +265,6 @@ def reactivate_project_in_chats(name: str):
     for context in AgentContext.all():
         if context.get_data(CONTEXT_DATA_KEY_PROJECT) == name:
             activate_project(context.id, name)
-        persist_chat.save_tmp_chat(context)
 
 
 def deactivate_project_in_chats(name: str):
@@ -269,7 +273,6 @@ def deactivate_project_in_chats(name: str):
     for context in AgentContext.all():
         if context.get_data(CONTEXT_DATA_KEY_PROJECT) == name:
             deactivate_project(context.id)
-        persist_chat.save_tmp_chat(context)
 
 
 def build_system_prompt_vars(name: str):
@@ -0,0 +1,196 @@
+"""Prompt building with reuse between loop iterations.
+
+The system prompt is rendered by the system_prompt extensions and reused while
+get_system_prompt_key() stays the same. The key covers what the default extensions
+read: prompt files, the system_prompt extension folder and agents/ (profile prompts
+and extensions) by their stamps, profile, vision, the project and its files, behaviour
+rules, secrets, settings and MCP tools. An extension reading any other state returns
+it from Extension.system_prompt_key(), or sets Extension.cache_system_prompt = False
+to have the prompt rendered on every iteration. Code changing these inputs in-process
+calls invalidate(), folder stamps are otherwise reused for TREE_STAMP_TTL seconds.
+"""
+
+import os
+import threading
+import time
+from bisect import bisect_right
+from typing import TYPE_CHECKING, Awaitable, Callable
+
+from langchain_core.messages import BaseMessage
+from langchain_core.prompts import ChatPromptTemplate
+
+from python.helpers import files, history, tokens
+
+if TYPE_CHECKING:
+    from agent import Agent
+
+TREE_STAMP_TTL = 5.0  # seconds a prompt folder stamp is reused, edits made outside of invalidate() show up after it
+
+_tree_stamps: dict[tuple[str, ...], tuple[float, tuple[int, int, int]]] = {}
+_tree_stamps_lock = threading.Lock()
+_generation = 0  # part of the system prompt key, moved by invalidate()
+
+
+class PromptBuilder:
+    """Keeps the last prompt an agent built, so each loop iteration only renders what changed.
+
+    The system prompt is reused while get_system_prompt_key stays the same, and history
+    messages rendered before are reused while the records behind them are unchanged.
+    """
+
+    def __init__(self, agent: "Agent"):
+        self.agent = agent
+        self.system_key: tuple | None = None
+        self.system: list[str] = []
+        self.outputs: list[history.OutputMessage] = []  # outputs rendered so far
+        self.messages: list[BaseMessage] = []  # the outputs rendered and grouped to alternate
+        self.starts: list[int] = []  # index of the first output in each message
+
+    async def get_system_prompt(self, render: Callable[[], Awaitable[list[str]]]) -> list[str]:
+        key = await get_system_prompt_key(self.agent)
+        if key is None or key != self.system_key:
+            self.system = await render()
+            self.system_key = key
+        return list(self.system)
+
+    def output_langchain(self, outputs: list[history.OutputMessage]) -> list[BaseMessage]:
+        """Same as history.output_langchain, but renders only outputs that changed since the last call"""
+        same = 0
+        limit = min(len(outputs), len(self.outputs))
+        while same < limit and _same_output(outputs[same], self.outputs[same]):
+            same += 1
+
+        # the message holding the first changed output is rendered again,
+        # or the last message if new outputs might merge into it
+        if self.outputs:
+            group = bisect_right(self.starts, min(same, len(self.outputs) - 1)) - 1
+            start = self.starts[group]
+        else:
+            group = start = 0
+        del self.messages[group:]
+        del self.starts[group:]
+
+        for index in range(start, len(outputs)):
+            output = outputs[index]
+            message = history.output_langchain([output])[0]
+            if self.messages and isinstance(self.messages[-1], type(message)):
+                self.messages[-1] = history.group_messages_abab([self.messages[-1], message])[0]
+            else:
+                self.messages.append(message)
+                self.starts.append(index)
+        self.outputs = list(outputs)
+        return list(self.messages)
+
+
+class CtxWindow:
+    """Prompt of the last LLM call, its text and tokens are only computed when asked for"""
+
+    def __init__(self, messages: list[BaseMessage]):
+        self.messages = messages
+        self._text: str | None = None
+        self._tokens: int | None = None
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            self._text = ChatPromptTemplate.from_messages(self.messages).format()
+        return self._text
+
+    @property
+    def tokens(self) -> int:
+        if self._tokens is None:
+            self._tokens = tokens.approximate_tokens(self.text)
+        return self._tokens
+
+
+def invalidate():
+    """Render system prompts again on the next iteration, for code changing prompt files, projects or settings"""
+    global _generation
+    with _tree_stamps_lock:
+        _tree_stamps.clear()
+        _generation += 1
+
+
+async def get_system_prompt_key(agent: "Agent") -> tuple | None:
+    """Key of the inputs of the agent's system prompt, None when it has to be rendered every time"""
+    from python.helpers import projects, memory, settings
+    from python.helpers.extension import get_extension_classes
+    from python.helpers.secrets import DEFAULT_SECRETS_FILE
+    from python.helpers.mcp_handler import MCPConfig
+
+    extensions = []
+    for cls in await get_extension_classes("system_prompt", agent):
+        if not cls.cache_system_prompt:
+            return None
+        extension_key = cls(agent=agent).system_prompt_key()
+        if extension_key is not None:
+            extensions.append((cls.__module__, extension_key))
+
+    project = projects.get_context_project_name(agent.context)
+    mcp_config = MCPConfig.get_instance()
+    dirs = [
+        files.get_abs_path("prompts"),
+        files.get_abs_path("agents"),
+        files.get_abs_path("python/extensions/system_prompt"),
+    ]
+    return (
+        tuple(extensions),
+        _generation,
+        agent.config.profile,
+        agent.config.chat_model.vision,
+        project,
+        _cached_tree_stamp(*dirs),
+        _cached_tree_stamp(projects.get_project_meta_folder(project)) if project else None,
+        _file_stamp(files.get_abs_path(memory.get_memory_subdir_abs(agent), "behaviour.md")),
+        _file_stamp(files.get_abs_path(DEFAULT_SECRETS_FILE)),
+        _file_stamp(settings.SETTINGS_FILE),
+        mcp_config.get_tools_prompt() if mcp_config.servers else "",
+    )
+
+
+def _file_stamp(path: str) -> tuple[int, int] | None:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _cached_tree_stamp(*dirs: str) -> tuple[int, int, int]:
+    # walking the folders on every loop iteration costs more than the prompt it saves
+    now = time.monotonic()
+    with _tree_stamps_lock:
+        cached = _tree_stamps.get(dirs)
+        if cached and now - cached[0] < TREE_STAMP_TTL:
+            return cached[1]
+    stamp = _tree_stamp(*dirs)
+    with _tree_stamps_lock:
+        _tree_stamps[dirs] = (now, stamp)
+    return stamp
+
+
+def _tree_stamp(*dirs: str) -> tuple[int, int, int]:
+    # file count, newest modification and total size of all files under the dirs
+    count = newest = size = 0
+    pending = list(dirs)
+    while pending:
+        try:
+            entries = os.scandir(pending.pop())
+        except OSError:
+            continue
+        with entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name != "__pycache__":
+                        pending.append(entry.path)
+                    continue
+                stat = entry.stat()
+                count += 1
+                newest = max(newest, stat.st_mtime_ns)
+                size += stat.st_size
+    return count, newest, size
+
+
+def _same_output(a: history.OutputMessage, b: history.OutputMessage) -> bool:
+    # records hand out their own content objects, so unchanged records give identical ones
+    return a["ai"] == b["ai"] and a["content"] is b["content"]
@@ -0,0 +1,99 @@
+import heapq
+import itertools
+import threading
+from datetime import datetime
+from typing import Any, Generic, Hashable, Protocol, TypeVar
+
+COMPACT_RATIO = 2  # heap entries per live task after which stale entries are dropped
+
+
+class Schedulable(Protocol):
+    uuid: str
+
+    def get_schedule_key(self) -> Hashable:
+        """Everything the next fire time depends on, the time is computed again when it changes"""
+        ...
+
+    def get_next_fire(self, now: datetime, last_fired: datetime | None) -> datetime | None:
+        """Next time the task is due, after last_fired, None if it is not due at all"""
+        ...
+
+
+T = TypeVar("T", bound=Schedulable)
+
+
+class ScheduleQueue(Generic[T]):
+    """Min-heap of the next fire time of each task.
+
+    Fire times are computed once per task and again only when its schedule key changes,
+    so finding the due tasks costs O(log n) per due task instead of a scan of all tasks.
+    A task never fires twice for the same time, its next fire time always follows the last one.
+    """
+
+    def __init__(self):
+        self._heap: list[tuple[float, int, str]] = []  # (fire timestamp, sequence, uuid)
+        self._entries: dict[str, tuple[float, int]] = {}  # current heap entry by uuid, others are stale
+        self._tasks: dict[str, T] = {}
+        self._keys: dict[str, Any] = {}
+        self._last_fired: dict[str, datetime] = {}
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+
+    def sync(self, tasks: list[T], now: datetime):
+        """Follow the task list, fire times are computed for new and changed tasks only"""
+        with self._lock:
+            present = set()
+            for task in tasks:
+                present.add(task.uuid)
+                self._tasks[task.uuid] = task  # a reload replaces the task objects
+                key = task.get_schedule_key()
+                if task.uuid in self._keys and self._keys[task.uuid] == key:
+                    continue
+                self._keys[task.uuid] = key
+                self._schedule(task, now)
+            for uuid in [uuid for uuid in self._tasks if uuid not in present]:
+                del self._tasks[uuid]
+                self._keys.pop(uuid, None)
+                self._entries.pop(uuid, None)
+                self._last_fired.pop(uuid, None)
+            if len(self._heap) > COMPACT_RATIO * len(self._entries) + 16:
+                self._heap = [(ts, seq, uuid) for uuid, (ts, seq) in self._entries.items()]
+                heapq.heapify(self._heap)
+
+    def pop_due(self, now: datetime) -> list[T]:
+        """Tasks due by now, each is scheduled again for its next fire time"""
+        due: list[T] = []
+        with self._lock:
+            now_ts = now.timestamp()
+            while self._heap and self._heap[0][0] <= now_ts:
+                ts, seq, uuid = heapq.heappop(self._heap)
+                if self._entries.get(uuid) != (ts, seq):
+                    continue  # rescheduled or removed since
+                del self._entries[uuid]
+                task = self._tasks[uuid]
+                self._last_fired[uuid] = datetime.fromtimestamp(ts, now.tzinfo)
+                due.append(task)
+                self._schedule(task, now)
+        return due
+
+    def next_fire(self) -> float | None:
+        """Timestamp of the earliest fire time, None if no task is scheduled"""
+        with self._lock:
+            while self._heap:
+                ts, seq, uuid = self._heap[0]
+                if self._entries.get(uuid) == (ts, seq):
+                    return ts
+                heapq.heappop(self._heap)
+        return None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _schedule(self, task: T, now: datetime):
+        self._entries.pop(task.uuid, None)
+        fire = task.get_next_fire(now, self._last_fired.get(task.uuid))
+        if fire is None:
+            return
+        entry = (fire.timestamp(), next(self._sequence))
+        self._entries[task.uuid] = entry
+        heapq.heappush(self._heap, (*entry, task.uuid))
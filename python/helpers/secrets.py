@@ -35,75 +35,190 @@ class EnvLine:
     )
 
 
+class SecretsMasker:
+    """Replaces many secret values in a single pass, the leftmost value wins and the longest
+    where several start at the same place.
+
+    The values are compiled once into a SecretsAutomaton that finds every value in one scan
+    of the text, whatever the number of secrets. The streaming filters and buffers share it.
+    """
+
+    def __init__(self, replacements: Dict[str, str]):
+        # value -> text to put in its place
+        self.replacements = replacements
+        # longest first
+        self.values: List[str] = sorted(replacements, key=len, reverse=True)
+        self._automaton: Optional[SecretsAutomaton] = None
+
+    def mask(self, text: str) -> str:
+        if not self.values or not text:
+            return text
+        matches: Dict[int, int] = {}
+        self.get_automaton().scan(text, matches)
+        masked, _end = self.replace_matches(text, matches, len(text))
+        return masked
+
+    def replace_matches(
+        self, text: str, matches: Dict[int, int], cut: int, offset: int = 0
+    ) -> Tuple[str, int]:
+        """Text before the cut with the values found in it replaced whole, matches as found by
+        SecretsAutomaton.scan with text starting at the given position. Also returns where the
+        result ends in text, past the cut when a value crosses it."""
+        parts: List[str] = []
+        index = 0
+        for start in sorted(matches):
+            i = start - offset
+            if i < index:
+                continue  # inside a value already replaced
+            if i >= cut:
+                break
+            end = i + matches[start]
+            parts.append(text[index:i])
+            parts.append(self.replacements[text[i:end]])
+            index = end
+        if index < cut:
+            parts.append(text[index:cut])
+            index = cut
+        return "".join(parts), index
+
+    def get_automaton(self) -> "SecretsAutomaton":
+        # built on first use, then shared read only
+        if self._automaton is None:
+            self._automaton = SecretsAutomaton(self.values)
+        return self._automaton
+
+
+class SecretsAutomaton:
+    """Aho-Corasick automaton over secret values, read only once built.
+
+    States are trie nodes, 0 is the root. After feeding a text, the state is the
+    longest suffix of the text that is a prefix of some value.
+    """
+
+    def __init__(self, values: List[str]):
+        self.goto: List[Dict[str, int]] = [{}]  # char -> next state, per state
+        self.depth: List[int] = [0]  # length of the prefix a state stands for
+        self.ends: List[int] = [0]  # length of the value ending at a state, 0 if none
+        self.fail: List[int] = [0]  # state of the longest proper suffix that is also a prefix
+        self.output: List[int] = [0]  # nearest state on the fail chain where a value ends
+
+        for value in values:
+            state = 0
+            for char in value:
+                next_state = self.goto[state].get(char)
+                if next_state is None:
+                    next_state = self.goto[state][char] = len(self.depth)
+                    self.goto.append({})
+                    self.depth.append(self.depth[state] + 1)
+                    self.ends.append(0)
+                    self.fail.append(0)
+                    self.output.append(0)
+                state = next_state
+            self.ends[state] = len(value)
+
+        # fail links breadth first, parents before children
+        queue = list(self.goto[0].values())
+        for state in queue:
+            for char, child in self.goto[state].items():
+                fail = self.fail[state]
+                while fail and char not in self.goto[fail]:
+                    fail = self.fail[fail]
+                fail = self.goto[fail].get(char, 0)
+                self.fail[child] = fail
+                self.output[child] = fail if self.ends[fail] else self.output[fail]
+                queue.append(child)
+
+        # at the root, text up to the next first character of a value is skipped in one search
+        first = "".join(re.escape(char) for char in sorted(self.goto[0]))
+        self.starts = re.compile(f"[{first}]" if first else "$^")
+
+    def scan(
+        self, text: str, matches: Dict[int, int], state: int = 0, position: int = 0, since: int = 0
+    ) -> int:
+        """Feed text from the given state, text starting at the given position of the stream.
+        Notes the longest value found starting at each position from since on in matches,
+        and returns the state after the text."""
+        goto, fail, ends, output = self.goto, self.fail, self.ends, self.output
+        search = self.starts.search
+        i, length = 0, len(text)
+        while i < length:
+            char = text[i]
+            i += 1
+            next_state = goto[state].get(char)
+            while next_state is None and state:
+                state = fail[state]
+                next_state = goto[state].get(char)
+            if next_state is None:
+                # back at the root, skip to the next character a value starts with
+                start = search(text, i)
+                if not start:
+                    break
+                i = start.start()
+                continue
+            state = next_state
+
+            # note every value ending here by where it starts
+            found = state if ends[state] else output[state]
+            while found:
+                start_at = position + i - ends[found]
+                if start_at >= since and ends[found] > matches.get(start_at, 0):
+                    matches[start_at] = ends[found]
+                found = output[found]
+        return state
+
+
 class StreamingSecretsFilter:
     """Stateful streaming filter that masks secrets on the fly.
 
-    - Replaces full secret values with placeholders §§secret(KEY) when detected.
-    - Holds the longest suffix of the current buffer that matches any secret prefix
-      (with minimum trigger length of 3) to avoid leaking partial secrets across chunks.
-    - On finalize(), any unresolved partial is masked with '***'.
+    - Replaces full secret values with placeholders §§secret(KEY) when detected,
+      the longest value wins where values overlap.
+    - Holds the longest suffix of the stream that matches any secret prefix
+      to avoid leaking partial secrets across chunks.
+    - On finalize(), any unresolved partial (with minimum trigger length of 3) is masked with '***'.
+
+    Matching runs on the automaton of a SecretsMasker, built once and shared by all
+    streams, so a stream only keeps its automaton state, the held back text and the
+    values found in it, and each chunk costs time proportional to its length.
     """
 
-    def __init__(self, key_to_value: Dict[str, str], min_trigger: int = 3):
+    def __init__(
+        self,
+        key_to_value: Dict[str, str],
+        min_trigger: int = 3,
+        masker: Optional[SecretsMasker] = None,
+    ):
         self.min_trigger = max(1, int(min_trigger))
-        # Map value -> key for placeholder construction
-        self.value_to_key: Dict[str, str] = {
-            v: k for k, v in key_to_value.items() if isinstance(v, str) and v
-        }
-        # Only keep non-empty values
-        self.secret_values: List[str] = [v for v in self.value_to_key.keys() if v]
-        # Precompute all prefixes for quick suffix matching
-        self.prefixes: Set[str] = set()
-        for v in self.secret_values:
-            for i in range(self.min_trigger, len(v) + 1):
-                self.prefixes.add(v[:i])
-        self.max_len: int = max((len(v) for v in self.secret_values), default=0)
+        # shared with the secrets manager when given
+        self.masker = masker or SecretsMasker(
+            {v: alias_for_key(k) for k, v in key_to_value.items() if isinstance(v, str) and v}
+        )
+        self.automaton = self.masker.get_automaton()
 
         # Internal buffer of pending text that is not safe to flush yet
         self.pending: str = ""
-
-    def _replace_full_values(self, text: str) -> str:
-        """Replace all full secret values with placeholders in the given text."""
-        # Sort by length desc to avoid partial overlaps
-        for val in sorted(self.secret_values, key=len, reverse=True):
-            if not val:
-                continue
-            key = self.value_to_key.get(val, "")
-            if key:
-                text = text.replace(val, alias_for_key(key))
-        return text
-
-    def _longest_suffix_prefix(self, text: str) -> int:
-        """Return length of longest suffix of text that is a known secret prefix.
-        Returns 0 if none found (or only shorter than min_trigger)."""
-        max_check = min(len(text), self.max_len)
-        for length in range(max_check, self.min_trigger - 1, -1):
-            suffix = text[-length:]
-            if suffix in self.prefixes:
-                return length
-        return 0
+        self.offset: int = 0  # stream position of the first pending character
+        self.state: int = 0
+        self.matches: Dict[int, int] = {}  # stream position -> longest value found starting there
 
     def process_chunk(self, chunk: str) -> str:
         if not chunk:
             return ""
 
+        self.state = self.automaton.scan(
+            chunk, self.matches, self.state, self.offset + len(self.pending), self.offset
+        )
         self.pending += chunk
 
-        # Replace any full secret occurrences first
-        self.pending = self._replace_full_values(self.pending)
+        # Hold the longest suffix that could still form a secret
+        return self._flush(len(self.pending) - self.automaton.depth[self.state])
 
-        # Determine the longest suffix that could still form a secret
-        hold_len = self._longest_suffix_prefix(self.pending)
-        if hold_len > 0:
-            # Flush everything except the hold suffix
-            emit = self.pending[:-hold_len]
-            self.pending = self.pending[-hold_len:]
-        else:
-            # Safe to flush everything
-            emit = self.pending
-            self.pending = ""
-
-        return emit
+    def _flush(self, cut: int) -> str:
+        """Emit pending text before the cut, values starting there are replaced whole."""
+        result, index = self.masker.replace_matches(self.pending, self.matches, cut, self.offset)
+        self.pending = self.pending[index:]
+        self.offset += index
+        self.matches = {s: n for s, n in self.matches.items() if s >= self.offset}
+        return result
 
     def finalize(self) -> str:
         """Flush any remaining buffered text. If pending contains an unresolved partial
@@ -111,17 +226,56 @@ class StreamingSecretsFilter:
         if not self.pending:
             return ""
 
-        hold_len = self._longest_suffix_prefix(self.pending)
-        if hold_len > 0:
-            safe = self.pending[:-hold_len]
+        hold_len = 0
+        if not self.automaton.ends[self.state]:
+            hold_len = self.automaton.depth[self.state]
+            if hold_len < self.min_trigger:
+                hold_len = 0
+        result = self._flush(max(0, len(self.pending) - hold_len))
+        if self.pending:
             # Mask unresolved partial
-            result = safe + "***"
-        else:
-            result = self.pending
+            result += "***"
+
         self.pending = ""
+        self.offset = self.state = 0
+        self.matches = {}
         return result
 
 
+class StreamingMaskBuffer:
+    """Incrementally masked copy of a streamed text.
+
+    update(full) returns the same text as SecretsManager.mask_values(full), but only the
+    newly streamed part is scanned. The automaton state is carried across updates by a
+    StreamingSecretsFilter, text is committed up to the start of the deepest live match
+    and the raw tail after it is masked on its own until it is safe.
+    """
+
+    def __init__(self, masker: SecretsMasker):
+        self.masker = masker
+        self.masked: str = ""
+        self.raw: str = ""
+        self.filter = StreamingSecretsFilter({}, masker=masker)
+
+    def update(self, full: str) -> str:
+        """Mask the streamed text so far, processing only what was added since the last call."""
+        if not full.startswith(self.raw):
+            # not a continuation (new stream or rewritten text), start over
+            self.masked, self.raw = "", ""
+            self.filter = StreamingSecretsFilter({}, masker=self.masker)
+        if not self.masker.values:
+            self.raw = full
+            return full
+        self.masked += self.filter.process_chunk(full[len(self.raw) :])
+        self.raw = full
+        # values complete in the held back tail are shown masked, the tail stays raw
+        stream = self.filter
+        tail, _end = self.masker.replace_matches(
+            stream.pending, stream.matches, len(stream.pending), stream.offset
+        )
+        return self.masked + tail
+
+
 class SecretsManager:
     PLACEHOLDER_PATTERN = ALIAS_PATTERN
     MASK_VALUE = "***"
@@ -146,6 +300,8 @@ class SecretsManager:
         self._raw_snapshots: Dict[str, str] = {}
         self._secrets_cache = None
         self._last_raw_text = None
+        # compiled maskers by (min_length, placeholder), dropped with the secrets cache
+        self._maskers: Dict[Tuple[int, str], SecretsMasker] = {}
 
     def read_secrets_raw(self) -> str:
         """Read raw secrets file content from local filesystem (same system)."""
@@ -256,7 +412,14 @@ class SecretsManager:
 
     def create_streaming_filter(self) -> "StreamingSecretsFilter":
         """Create a streaming-aware secrets filter snapshotting current secret values."""
-        return StreamingSecretsFilter(self.load_secrets())
+        return StreamingSecretsFilter(self.load_secrets(), masker=self.get_masker(0))
+
+    def create_mask_buffer(
+        self, min_length: int = 4, placeholder: str = "§§secret({key})"
+    ) -> "StreamingMaskBuffer":
+        """Create an incrementally masked buffer for a streamed text, snapshotting current secret values.
+        Produces the same output as mask_values() on the full text with the same arguments."""
+        return StreamingMaskBuffer(self.get_masker(min_length, placeholder))
 
     def replace_placeholders(self, text: str) -> str:
         """Replace secret placeholders with actual values"""
@@ -301,18 +464,22 @@ class SecretsManager:
         """Replace actual secret values with placeholders in text"""
         if not text:
             return text
+        return self.get_masker(min_length, placeholder).mask(text)
 
-        secrets = self.load_secrets()
-        result = text
-
-        # Sort by length (longest first) to avoid partial replacements
-        for key, value in sorted(
-            secrets.items(), key=lambda x: len(x[1]), reverse=True
-        ):
-            if value and len(value.strip()) >= min_length:
-                result = result.replace(value, alias_for_key(key, placeholder))
-
-        return result
+    def get_masker(
+        self, min_length: int = 4, placeholder: str = "§§secret({key})"
+    ) -> SecretsMasker:
+        """Masker for current secret values, compiled once until the secrets cache is cleared"""
+        with self._lock:
+            masker = self._maskers.get((min_length, placeholder))
+            if masker is None:
+                replacements: Dict[str, str] = {}
+                for key, value in self.load_secrets().items():
+                    if value and len(value.strip()) >= min_length:
+                        # first key wins for values shared by several keys
+                        replacements.setdefault(value, alias_for_key(key, placeholder))
+                masker = self._maskers[(min_length, placeholder)] = SecretsMasker(replacements)
+            return masker
 
     def get_masked_secrets(self) -> str:
         """Get content with values masked for frontend display (preserves comments and unrecognized lines)"""
@@ -351,6 +518,7 @@ class SecretsManager:
             self._secrets_cache = None
             self._raw_snapshots = {}
             self._last_raw_text = None
+            self._maskers = {}
 
     @classmethod
     def _invalidate_all_caches(cls):
@@ -4,6 +4,7 @@ import json
 import os
 import re
 import subprocess
+import threading
 from typing import Any, Literal, TypedDict, cast
 
 import models
@@ -100,6 +101,7 @@ class Settings(TypedDict):
     mcp_servers: str
     mcp_client_init_timeout: int
     mcp_client_tool_timeout: int
+    mcp_client_compact_schemas: bool
     mcp_server_enabled: bool
     mcp_server_token: str
 
@@ -162,7 +164,40 @@ PASSWORD_PLACEHOLDER = "****PSWD****"
 API_KEY_PLACEHOLDER = "************"
 
 SETTINGS_FILE = files.get_abs_path("tmp/settings.json")
-_settings: Settings | None = None
+_settings: Settings | None = None  # normalized read-only snapshot, replaced as a whole
+_settings_lock = threading.Lock()
+_version: str | None = None
+
+
+class _Snapshot(dict):
+    """Read-only settings dict shared by all readers, copy() returns a mutable deep copy"""
+
+    def _read_only(self, *args, **kwargs):
+        raise TypeError("Settings snapshot is read-only, change a copy() and pass it to set_settings()")
+
+    __setitem__ = __delitem__ = __ior__ = _read_only
+    clear = pop = popitem = setdefault = update = _read_only
+
+    def copy(self) -> dict:  # type: ignore[override]
+        return {
+            key: value.copy() if isinstance(value, _Snapshot) else value
+            for key, value in self.items()
+        }
+
+    def __copy__(self) -> dict:
+        return self.copy()
+
+    def __deepcopy__(self, memo) -> dict:
+        return self.copy()
+
+    def __reduce__(self):
+        return (dict, (self.copy(),))
+
+
+def _freeze(value: Any) -> Any:
+    if isinstance(value, dict):
+        return _Snapshot({key: _freeze(item) for key, item in value.items()})
+    return value
 
 
 def convert_out(settings: Settings) -> SettingsOutput:
@@ -1101,6 +1136,16 @@ def convert_out(settings: Settings) -> SettingsOutput:
         }
     )
 
+    mcp_client_fields.append(
+        {
+            "id": "mcp_client_compact_schemas",
+            "title": "Compact MCP tool schemas",
+            "description": "Describe MCP tool arguments as short lists instead of full JSON schemas in the system prompt. Saves tokens with many tools, complex arguments are still given as JSON.",
+            "type": "switch",
+            "value": settings["mcp_client_compact_schemas"],
+        }
+    )
+
     mcp_client_section: SettingsSection = {
         "id": "mcp_client",
         "title": "External MCP Servers",
@@ -1313,7 +1358,7 @@ def _get_api_key_field(settings: Settings, provider: str, title: str) -> Setting
 
 
 def convert_in(settings: dict) -> Settings:
-    current = get_settings()
+    current = cast(Settings, get_settings().copy())
     for section in settings["sections"]:
         if "fields" in section:
             for field in section["fields"]:
@@ -1334,24 +1379,50 @@ def convert_in(settings: dict) -> Settings:
     return current
 
 def get_settings() -> Settings:
-    global _settings
-    if not _settings:
-        _settings = _read_settings_file()
-    if not _settings:
-        _settings = get_default_settings()
-    norm = normalize_settings(_settings)
-    return norm
+    """Current settings, already normalized. The snapshot is shared and read-only, use copy() to change it."""
+    snapshot = _settings
+    if snapshot is None:
+        with _settings_lock:
+            if _settings is None:
+                _swap_settings(
+                    _read_settings_file() or normalize_settings(get_default_settings())
+                )
+            snapshot = _settings
+    return snapshot  # type: ignore
+
+
+def get_history_ctx_size() -> int:
+    """Tokens of the chat model context window reserved for history"""
+    set = get_settings()
+    return int(set["chat_model_ctx_length"] * set["chat_model_ctx_history"])
+
+
+def get_mcp_client_tool_timeout() -> int:
+    return get_settings()["mcp_client_tool_timeout"]
+
+
+def get_mcp_client_compact_schemas() -> bool:
+    return get_settings()["mcp_client_compact_schemas"]
 
 
 def set_settings(settings: Settings, apply: bool = True):
-    global _settings
-    previous = _settings
-    _settings = normalize_settings(settings)
-    _write_settings_file(_settings)
+    with _settings_lock:
+        previous = _settings
+        normalized = normalize_settings(settings)
+        _write_settings_file(normalized)
+        # auth values were just written to dotenv, the token follows them
+        normalized["mcp_server_token"] = create_auth_token()
+        _swap_settings(normalized)
     if apply:
         _apply_settings(previous)
 
 
+def _swap_settings(settings: Settings):
+    # readers hold on to the snapshot they got, a single assignment replaces it for new readers
+    global _settings
+    _settings = cast(Settings, _freeze(settings))
+
+
 def set_settings_delta(delta: dict, apply: bool = True):
     current = get_settings()
     new = {**current, **delta}
@@ -1359,13 +1430,13 @@ def set_settings_delta(delta: dict, apply: bool = True):
 
 
 def merge_settings(original: Settings, delta: dict) -> Settings:
-    merged = original.copy()
+    merged = cast(Settings, original.copy())
     merged.update(delta)
     return merged
 
 
 def normalize_settings(settings: Settings) -> Settings:
-    copy = settings.copy()
+    copy = cast(Settings, settings.copy())
     default = get_default_settings()
 
     # adjust settings values to match current version if needed
@@ -1526,6 +1597,7 @@ def get_default_settings() -> Settings:
         mcp_servers='{\n    "mcpServers": {}\n}',
         mcp_client_init_timeout=10,
         mcp_client_tool_timeout=120,
+        mcp_client_compact_schemas=False,
         mcp_server_enabled=False,
         mcp_server_token=create_auth_token(),
         a2a_server_enabled=False,
@@ -1551,6 +1623,11 @@ def _apply_settings(previous: Settings | None):
                 agent.config = ctx.config
                 agent = agent.get_data(agent.DATA_NAME_SUBORDINATE)
 
+        # system prompts are rendered again with the new config
+        from python.helpers import prompt_builder
+
+        prompt_builder.invalidate()
+
         # reload whisper model if necessary
         if not previous or _settings["stt_model_size"] != previous["stt_model_size"]:
             task = defer.DeferredTask().start_task(
@@ -1737,4 +1814,8 @@ def create_auth_token() -> str:
 
 
 def _get_version():
-    return git.get_version()
+    # read from git once, normalize_settings needs it for every settings change
+    global _version
+    if _version is None:
+        _version = git.get_version()
+    return _version
@@ -3,9 +3,9 @@ import select
 import subprocess
 import time
 import sys
-from typing import Optional, Tuple
+from typing import AsyncIterator, Optional, Tuple
 from python.helpers import tty_session, runtime
-from python.helpers.shell_ssh import clean_string
+from python.helpers.terminal_output import clean_string
 
 class LocalInteractiveSession:
     def __init__(self, cwd: str|None = None):
@@ -29,6 +29,17 @@ class LocalInteractiveSession:
         self.full_output = ""
         await self.session.sendline(command)
  
+    async def read_events(self, tick: float = 0.1) -> AsyncIterator[str]:
+        """Raw output as soon as the terminal produces it, an empty string after each tick without output"""
+        if not self.session:
+            raise Exception("Shell not connected")
+        while True:
+            chunk = await self.session.read(timeout=tick)
+            if chunk is None:
+                yield ""
+            else:
+                yield chunk + self.session.read_nowait()
+
     async def read_output(self, timeout: float = 0, reset_full_output: bool = False) -> Tuple[str, Optional[str]]:
         if not self.session:
             raise Exception("Shell not connected")
@@ -0,0 +1,97 @@
+import threading
+import time
+
+# process-wide change counters for the web UI, they only ever grow
+# _version moves on any visible change (logs, progress, notifications, chats)
+# _contexts_version only when the chats/tasks list itself changes
+# _shared_version on changes every client shows (notifications), _context_versions per context
+_condition = threading.Condition(threading.RLock())
+_version = 0
+_contexts_version = 0
+_shared_version = 0
+_context_versions: dict[str, int] = {}
+
+LIST_REFRESH_INTERVAL = 1.0  # seconds, list fields changing with chat activity (log version, length) are resent this often at most
+_list_refreshed_at = 0.0
+_list_timer: threading.Timer | None = None
+
+
+def mark_dirty(context_id: str | None = None):
+    # a change of one context only wakes the streams of that context, without an id it concerns all
+    global _version, _shared_version
+    with _condition:
+        _version += 1
+        if context_id:
+            _context_versions[context_id] = _context_versions.get(context_id, 0) + 1
+        else:
+            _shared_version += 1
+        _condition.notify_all()
+
+
+def mark_contexts_dirty():
+    global _version, _contexts_version, _list_refreshed_at
+    with _condition:
+        _version += 1
+        _contexts_version += 1
+        _list_refreshed_at = time.monotonic()
+        _condition.notify_all()
+
+
+def mark_list_fields_dirty():
+    """Fields of a context shown in the chats list changed with its activity, e.g. its log version.
+
+    Marked on every log update, the contexts version moves once per LIST_REFRESH_INTERVAL at most,
+    so streaming in one chat does not have every open client rebuild the list on each chunk.
+    """
+    global _list_timer
+    with _condition:
+        if _list_timer:
+            return
+        delay = _list_refreshed_at + LIST_REFRESH_INTERVAL - time.monotonic()
+        if delay <= 0:
+            mark_contexts_dirty()
+            return
+        _list_timer = threading.Timer(delay, _refresh_list)
+        _list_timer.daemon = True
+        _list_timer.start()
+
+
+def _refresh_list():
+    global _list_timer
+    with _condition:
+        _list_timer = None
+        mark_contexts_dirty()
+
+
+def forget_context(context_id: str):
+    with _condition:
+        _context_versions.pop(context_id, None)
+
+
+def get_version() -> int:
+    return _version
+
+
+def get_contexts_version() -> int:
+    return _contexts_version
+
+
+def get_context_version(context_id: str) -> tuple[int, int, int]:
+    # everything a client showing the context has to see: shared changes, the list and the context
+    return _shared_version, _contexts_version, _context_versions.get(context_id, 0)
+
+
+def wait_for_change(version: int, timeout: float | None = None) -> int:
+    # block until the version differs from the given one or the timeout passes
+    with _condition:
+        _condition.wait_for(lambda: _version != version, timeout)
+        return _version
+
+
+def wait_for_context_change(
+    context_id: str, version: tuple[int, int, int], timeout: float | None = None
+) -> tuple[int, int, int]:
+    # like wait_for_change, changes of other contexts do not end the wait
+    with _condition:
+        _condition.wait_for(lambda: get_context_version(context_id) != version, timeout)
+        return get_context_version(context_id)
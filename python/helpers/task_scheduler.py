@@ -1,13 +1,15 @@
 import asyncio
 from datetime import datetime, timezone, timedelta
+from functools import lru_cache
 import os
 import random
 import threading
+import time
 from urllib.parse import urlparse
 import uuid
 from enum import Enum
 from os.path import exists
-from typing import Any, Callable, Dict, Literal, Optional, Type, TypeVar, Union, cast, ClassVar
+from typing import Any, Callable, Dict, Hashable, Literal, Optional, Type, TypeVar, Union, cast, ClassVar
 
 import nest_asyncio
 nest_asyncio.apply()
@@ -22,11 +24,18 @@ from python.helpers.print_style import PrintStyle
 from python.helpers.defer import DeferredTask
 from python.helpers.files import get_abs_path, make_dirs, read_file, write_file
 from python.helpers.localization import Localization
-from python.helpers import projects
+from python.helpers import projects, state_monitor
+from python.helpers.schedule_queue import ScheduleQueue
 import pytz
 from typing import Annotated
 
 SCHEDULER_FOLDER = "tmp/scheduler"
+CRONTAB_CACHE_SIZE = 1024  # parsed crontab expressions kept, tasks mostly share a few
+
+
+@lru_cache(maxsize=CRONTAB_CACHE_SIZE)
+def get_crontab(expression: str) -> CronTab:
+    return CronTab(crontab=expression)  # type: ignore
 
 # ----------------------
 # Task Models
@@ -184,6 +193,12 @@ class BaseTask(BaseModel):
     def get_next_run(self) -> datetime | None:
         return None
 
+    def get_schedule_key(self) -> Hashable:
+        return (self.state,)
+
+    def get_next_fire(self, now: datetime, last_fired: datetime | None) -> datetime | None:
+        return None
+
     def is_dedicated(self) -> bool:
         return self.context_id == self.uuid
 
@@ -341,7 +356,7 @@ class ScheduledTask(BaseTask):
 
     def check_schedule(self, frequency_seconds: float = 60.0) -> bool:
         with self._lock:
-            crontab = CronTab(crontab=self.schedule.to_crontab())  # type: ignore
+            crontab = get_crontab(self.schedule.to_crontab())
 
             # Get the timezone from the schedule or use UTC as fallback
             task_timezone = pytz.timezone(self.schedule.timezone or Localization.get().get_timezone())
@@ -363,9 +378,27 @@ class ScheduledTask(BaseTask):
 
     def get_next_run(self) -> datetime | None:
         with self._lock:
-            crontab = CronTab(crontab=self.schedule.to_crontab())  # type: ignore
+            crontab = get_crontab(self.schedule.to_crontab())
             return crontab.next(now=datetime.now(timezone.utc), return_datetime=True)  # type: ignore
 
+    def get_schedule_key(self) -> Hashable:
+        with self._lock:
+            return (self.state, self.schedule.to_crontab(), self.schedule.timezone)
+
+    def get_next_fire(self, now: datetime, last_fired: datetime | None) -> datetime | None:
+        with self._lock:
+            if self.state != TaskState.IDLE:
+                return None
+            # strictly after the last fire time, a job never runs twice in its minute
+            reference = max(now, last_fired) if last_fired else now
+            task_timezone = pytz.timezone(self.schedule.timezone or Localization.get().get_timezone())
+            try:
+                crontab = get_crontab(self.schedule.to_crontab())
+            except ValueError as e:
+                PrintStyle.error(f"Invalid schedule of task '{self.name}': {e}")
+                return None
+            return crontab.next(now=reference.astimezone(task_timezone), return_datetime=True)  # type: ignore
+
 
 class PlannedTask(BaseTask):
     type: Literal[TaskType.PLANNED] = TaskType.PLANNED
@@ -422,6 +455,20 @@ class PlannedTask(BaseTask):
         with self._lock:
             return self.plan.get_next_launch_time()
 
+    def get_schedule_key(self) -> Hashable:
+        with self._lock:
+            return (self.state, self.plan.get_next_launch_time())
+
+    def get_next_fire(self, now: datetime, last_fired: datetime | None) -> datetime | None:
+        with self._lock:
+            if self.state != TaskState.IDLE:
+                return None
+            # overdue launches fire right away, each launch time only once
+            next_launch_time = self.plan.get_next_launch_time()
+            if next_launch_time is None or (last_fired and next_launch_time <= last_fired):
+                return None
+            return next_launch_time
+
     async def on_run(self):
         with self._lock:
             # Get the next launch time and set it as in_progress
@@ -482,6 +529,15 @@ class SchedulerTaskList(BaseModel):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self._lock = threading.RLock()
+        self._version = 0  # saves in this process, the file stamp alone can miss two quick saves
+
+    def get_version(self) -> tuple:
+        """Changes whenever tasks.json was saved here or written by another process"""
+        try:
+            stat = os.stat(get_abs_path(SCHEDULER_FOLDER, "tasks.json"))
+            return (self._version, stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            return (self._version,)
 
     async def reload(self) -> "SchedulerTaskList":
         path = get_abs_path(SCHEDULER_FOLDER, "tasks.json")
@@ -527,6 +583,12 @@ class SchedulerTaskList(BaseModel):
                 )
 
             write_file(path, json_data)
+            self._version += 1
+            # task state is part of the tasks list in the UI
+            state_monitor.mark_contexts_dirty()
+            # the job loop schedules changed tasks right away
+            if TaskScheduler._instance is not None:
+                TaskScheduler._instance.notify_changed()
 
             # Debug: Verify after saving
             if exists(path):
@@ -631,6 +693,9 @@ class TaskScheduler:
         if not hasattr(self, '_initialized'):
             self._tasks = SchedulerTaskList.get()
             self._printer = PrintStyle(italic=True, font_color="green", padding=False)
+            self._queue: ScheduleQueue[Union[ScheduledTask, AdHocTask, PlannedTask]] = ScheduleQueue()
+            self._synced_version: tuple | None = None
+            self._wake: tuple[asyncio.AbstractEventLoop, asyncio.Event] | None = None
             self._initialized = True
 
     async def reload(self):
@@ -665,8 +730,42 @@ class TaskScheduler:
         return self._tasks.find_task_by_name(name)
 
     async def tick(self):
-        for task in await self._tasks.get_due_tasks():
-            await self._run_task(task)
+        # tasks.json is only read again after a change, here or by another process
+        version = self._tasks.get_version()
+        if version != self._synced_version:
+            await self._tasks.reload()
+            self._synced_version = version
+            self._queue.sync(self._tasks.get_tasks(), datetime.now(timezone.utc))
+
+        for task in self._queue.pop_due(datetime.now(timezone.utc)):
+            if task.state == TaskState.IDLE:
+                await self._run_task(task)
+
+    async def wait_for_due(self, timeout: float):
+        """Sleep until the next task is due, a task changes or timeout seconds passed"""
+        loop = asyncio.get_running_loop()
+        if self._wake is None or self._wake[0] is not loop:
+            self._wake = (loop, asyncio.Event())
+        event = self._wake[1]
+        next_fire = self._queue.next_fire()
+        if next_fire is not None:
+            timeout = min(timeout, max(0.0, next_fire - time.time()))
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        event.clear()
+
+    def notify_changed(self):
+        """Wake wait_for_due to pick up changed tasks, callable from any thread"""
+        wake = self._wake
+        if wake is None:
+            return
+        loop, event = wake
+        try:
+            loop.call_soon_threadsafe(event.set)
+        except RuntimeError:
+            pass  # loop closed
 
     async def run_task_by_uuid(self, task_uuid: str, task_context: str | None = None):
         # First reload tasks to ensure we have the latest state
@@ -0,0 +1,164 @@
+import re
+from collections import deque
+from typing import Callable
+
+THRESHOLD = 1_000_000  # ~1MB, larger outputs should be dumped to file, not read from terminal
+PENDING_MAX = 4096  # raw chars of an unfinished line before it is compacted
+ESCAPE_MAX = 64  # raw chars kept back when a long line is committed in pieces, may hold a partial escape
+
+_BYTE_ESCAPE = re.compile(r"(?<!\\)\\x[0-9A-Fa-f]{2}")
+
+
+class TerminalOutput:
+    """Cleaned output of a terminal, built from raw chunks as they arrive.
+
+    Complete lines are cleaned once, only the unfinished last line is cleaned again on new data.
+    The start and the end are kept up to the threshold, the middle of a larger output is dropped,
+    so memory and the cost of every chunk stay bounded however much a command prints.
+    """
+
+    def __init__(self, threshold: int = THRESHOLD):
+        self.threshold = threshold
+        self.length = 0  # cleaned chars committed, including the dropped middle
+        self._head: list[str] = []
+        self._head_len = 0
+        self._head_cap = threshold // 2
+        self._tail: deque[str] = deque()
+        self._tail_len = 0
+        self._tail_cap = threshold - self._head_cap
+        self._lead = ""  # raw lines before any real output, prompt residue at the start is stripped
+        self._pending = ""  # raw text of the unfinished last line
+        self._pending_clean = ""
+
+    def append(self, raw: str):
+        """Add a raw chunk, escape codes and line overwrites are resolved as in clean_string"""
+        if not raw:
+            return
+        self._pending += raw
+        end = self._pending.rfind("\n")
+        if end >= 0:
+            complete, self._pending = self._pending[: end + 1], self._pending[end + 1 :]
+            if self._started():
+                self._commit(clean_string(complete, head=False))
+            else:
+                self._lead += complete
+                cleaned = clean_string(self._lead)
+                if cleaned.strip():
+                    self._lead = ""
+                    self._commit(cleaned)
+        self._compact_pending()
+        if self._started():
+            pending = clean_string(self._pending, head=False)
+        else:
+            pending = clean_string(self._lead + self._pending)
+        self._pending_clean = _BYTE_ESCAPE.sub("", pending)
+
+    def text(self, placeholder: Callable[[int], str] | None = None) -> str:
+        """The whole cleaned output, over the threshold its middle is replaced like messages.truncate_text does"""
+        total = self.length + len(self._pending_clean)
+        if total <= self.threshold or not placeholder:
+            return "".join(self._head) + "".join(self._tail) + self._pending_clean
+        replacement = placeholder(total - self.threshold)
+        start_len = (self.threshold - len(replacement)) // 2
+        end_len = self.threshold - len(replacement) - start_len
+        return "".join(self._head)[:start_len] + replacement + self.tail(end_len)
+
+    def tail(self, length: int) -> str:
+        """The last length chars of the cleaned output, cheap for a short tail"""
+        parts = [self._pending_clean]
+        size = len(self._pending_clean)
+        for chunks in (self._tail, self._head):
+            for chunk in reversed(chunks):
+                if size >= length:
+                    break
+                parts.append(chunk)
+                size += len(chunk)
+        text = "".join(reversed(parts))
+        return text[-length:] if length > 0 else ""
+
+    def last_lines(self, count: int) -> list[str]:
+        """The last count lines as splitlines() gives them, read from the end only"""
+        window = 1024
+        while True:
+            text = self.tail(window)
+            if text.count("\n") > count or len(text) < window:
+                return text.splitlines()[-count:]
+            window *= 4
+
+    def _started(self) -> bool:
+        return self.length > 0
+
+    def _commit(self, text: str):
+        text = _BYTE_ESCAPE.sub("", text)  # remove any single byte \xXX escapes
+        if not text:
+            return
+        self.length += len(text)
+        room = self._head_cap - self._head_len
+        if room > 0:
+            self._head.append(text[:room])
+            self._head_len += len(self._head[-1])
+            text = text[room:]
+            if not text:
+                return
+        self._tail.append(text)
+        self._tail_len += len(text)
+        while self._tail_len - len(self._tail[0]) >= self._tail_cap:
+            self._tail_len -= len(self._tail.popleft())
+
+    def _compact_pending(self):
+        # progress bars rewrite one line with \r for minutes, never clean all of it again on every chunk
+        if len(self._pending) < PENDING_MAX or not self._started():
+            return
+        line = self._pending
+        cut = line.rfind("\r", 0, len(line) - 1)
+        if cut > 0:
+            # only the content after the last overwrite stays, or the one before if nothing followed
+            line = clean_string(line[:cut], head=False) + line[cut:]
+        if len(line) >= PENDING_MAX and "\r" not in line:
+            # a long line that is not overwritten, commit all but its end in pieces
+            cut = len(line) - ESCAPE_MAX
+            escape = line.rfind("\x1b", 0, cut)
+            if escape >= cut - ESCAPE_MAX:
+                cut = escape
+            while cut > 0 and line[cut - 1].isspace():
+                cut -= 1  # trailing spaces are stripped at the end of the line only
+            if cut > 0:
+                self._commit(clean_string(line[:cut], head=False))
+                line = line[cut:]
+        self._pending = line
+
+
+def clean_string(input_string, head: bool = True):
+    # head=False for text that continues an output already cleaned, its start is kept as is
+    # Remove ANSI escape codes
+    ansi_escape = re.compile(r"\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])")
+    cleaned = ansi_escape.sub("", input_string)
+
+    # remove null bytes
+    cleaned = cleaned.replace("\x00", "")
+
+    if head:
+        # remove ipython \r\r\n> sequences from the start
+        cleaned = re.sub(r'^[ \r]*(?:\r*\n>[ \r]*)*', '', cleaned)
+        # also remove any amount of '> ' sequences from the start
+        cleaned = re.sub(r'^(>\s*)+', '', cleaned)
+
+    # Replace '\r\n' with '\n'
+    cleaned = cleaned.replace("\r\n", "\n")
+
+    if head:
+        # remove leading \r and spaces
+        cleaned = cleaned.lstrip("\r ")
+
+    # Split the string by newline characters to process each segment separately
+    lines = cleaned.split("\n")
+
+    for i in range(len(lines)):
+        # Handle carriage returns '\r' by splitting and taking the last part
+        parts = [part for part in lines[i].split("\r") if part.strip()]
+        if parts:
+            lines[i] = parts[
+                -1
+            ].rstrip()  # Overwrite with the last part after the last '\r'
+
+    return "\n".join(lines)
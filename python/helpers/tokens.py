@@ -1,22 +1,86 @@
-from typing import Literal
+from collections import OrderedDict
+import math
+import threading
+from typing import Literal, Sequence
 import tiktoken
 
 APPROX_BUFFER = 1.1
 TRIM_BUFFER = 0.8
+CACHE_SIZE = 4096  # number of texts whose token counts are remembered
+CACHE_MIN_LENGTH = 256  # shorter texts are cheaper to count again than to hash and cache
+DEFAULT_CHARS_PER_TOKEN = 4.0  # cl100k_base on mixed english text and code
+CALIBRATION_SAMPLES = 3  # texts per model counted exactly to calibrate the heuristic
+CALIBRATION_MAX_CHARS = 20000  # longer samples are cut to this length
+
+_encodings: dict[str, tiktoken.Encoding] = {}
+_cache: OrderedDict[tuple[str, int, int], int] = OrderedDict()
+_cache_lock = threading.Lock()
+_calibration: dict[str, tuple[int, int, int]] = {}  # model -> (chars, tokens, samples)
+
+
+def get_encoding(encoding_name="cl100k_base") -> tiktoken.Encoding:
+    encoding = _encodings.get(encoding_name)
+    if not encoding:
+        encoding = _encodings[encoding_name] = tiktoken.get_encoding(encoding_name)
+    return encoding
 
 
 def count_tokens(text: str, encoding_name="cl100k_base") -> int:
     if not text:
         return 0
 
-    # Get the encoding
-    encoding = tiktoken.get_encoding(encoding_name)
+    # short texts are not worth caching
+    if len(text) < CACHE_MIN_LENGTH:
+        return len(get_encoding(encoding_name).encode(text, disallowed_special=()))
+
+    key = (encoding_name, len(text), hash(text))
+    with _cache_lock:
+        count = _cache.get(key)
+        if count is not None:
+            _cache.move_to_end(key)
+            return count
 
     # Encode the text and count the tokens
-    tokens = encoding.encode(text, disallowed_special=())
-    token_count = len(tokens)
+    count = len(get_encoding(encoding_name).encode(text, disallowed_special=()))
+    _cache_put(key, count)
+    return count
+
 
-    return token_count
+def count_tokens_batch(texts: Sequence[str], encoding_name="cl100k_base") -> list[int]:
+    """Count tokens of many texts, the uncached ones are encoded in one batch"""
+    counts: list[int] = [0] * len(texts)
+    missing: dict[tuple[str, int, int], list[int]] = {}
+    with _cache_lock:
+        for i, text in enumerate(texts):
+            if not text:
+                continue
+            key = (encoding_name, len(text), hash(text))
+            count = _cache.get(key)
+            if count is not None:
+                _cache.move_to_end(key)
+                counts[i] = count
+            else:
+                missing.setdefault(key, []).append(i)
+
+    if missing:
+        keys = list(missing)
+        encoded = get_encoding(encoding_name).encode_batch(
+            [texts[missing[key][0]] for key in keys], disallowed_special=()
+        )
+        for key, tokens in zip(keys, encoded):
+            for i in missing[key]:
+                counts[i] = len(tokens)
+            if key[1] >= CACHE_MIN_LENGTH:
+                _cache_put(key, len(tokens))
+    return counts
+
+
+def _cache_put(key: tuple[str, int, int], count: int):
+    with _cache_lock:
+        _cache[key] = count
+        _cache.move_to_end(key)
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
 
 
 def approximate_tokens(
@@ -25,6 +89,41 @@ def approximate_tokens(
     return int(count_tokens(text) * APPROX_BUFFER)
 
 
+def approximate_tokens_batch(texts: Sequence[str]) -> list[int]:
+    return [int(count * APPROX_BUFFER) for count in count_tokens_batch(texts)]
+
+
+def estimate_tokens(text: str, model: str = "") -> int:
+    """Near free token estimate for hot paths like rate limiting and stream callbacks.
+    Always the calibrated chars per token heuristic, paths needing the tokenizer's count
+    use approximate_tokens instead."""
+    if not text:
+        return 0
+    # the first longer texts of each model are counted exactly to calibrate the ratio
+    if (
+        model
+        and len(text) >= CACHE_MIN_LENGTH
+        and _calibration.get(model, (0, 0, 0))[2] < CALIBRATION_SAMPLES
+    ):
+        calibrate(model, text[:CALIBRATION_MAX_CHARS])
+    return math.ceil(len(text) / get_chars_per_token(model) * APPROX_BUFFER)
+
+
+def get_chars_per_token(model: str = "") -> float:
+    chars, tokens, _ = _calibration.get(model, (0, 0, 0))
+    return chars / tokens if tokens else DEFAULT_CHARS_PER_TOKEN
+
+
+def calibrate(model: str, text: str, tokens: int | None = None):
+    """Refine the model's chars per token ratio with a text and its known token count"""
+    if not text:
+        return
+    if tokens is None:
+        tokens = count_tokens(text)
+    chars, total, samples = _calibration.get(model, (0, 0, 0))
+    _calibration[model] = (chars + len(text), total + tokens, samples + 1)
+
+
 def trim_to_tokens(
     text: str,
     max_tokens: int,
@@ -1,4 +1,4 @@
-import asyncio, os, sys, platform, errno
+import asyncio, os, sys, platform, errno, codecs
 
 _IS_WIN = platform.system() == "Windows"
 if _IS_WIN:
@@ -7,8 +7,11 @@ if _IS_WIN:
 
 
 #  Make stdin / stdout tolerant to broken UTF-8 so input() never aborts
-sys.stdin.reconfigure(errors="replace")  # type: ignore
-sys.stdout.reconfigure(errors="replace")  # type: ignore
+#  (replaced streams, like pytest's capture, may not support reconfigure)
+if hasattr(sys.stdin, "reconfigure"):
+    sys.stdin.reconfigure(errors="replace")  # type: ignore
+if hasattr(sys.stdout, "reconfigure"):
+    sys.stdout.reconfigure(errors="replace")  # type: ignore
 
 
 # ──────────────────────────── PUBLIC CLASS ────────────────────────────
@@ -106,6 +109,13 @@ class TTYSession:
         except asyncio.TimeoutError:
             return None
 
+    def read_nowait(self) -> str:
+        # Return all decoded text already produced, without waiting
+        chunks = []
+        while not self._buf.empty():
+            chunks.append(self._buf.get_nowait())
+        return "".join(chunks)
+
     # backward-compat alias:
     readline = read
 
@@ -138,11 +148,15 @@ class TTYSession:
         if self._proc is None:
             raise RuntimeError("TTYSpawn is not started")
         reader = self._proc.stdout
+        # multi-byte characters may be split between reads
+        decoder = codecs.getincrementaldecoder(self.encoding)("replace")
         while True:
-            chunk = await reader.read(4096)  # grab whatever is ready # type: ignore
+            chunk = await reader.read(1 << 16)  # grab whatever is ready # type: ignore
             if not chunk:
                 break
-            self._buf.put_nowait(chunk.decode(self.encoding, "replace"))
+            text = decoder.decode(chunk)
+            if text:
+                self._buf.put_nowait(text)
 
 
 # ──────────────────────────── POSIX IMPLEMENTATION ────────────────────
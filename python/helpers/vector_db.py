@@ -1,4 +1,5 @@
 from typing import Any, List, Sequence
+import asyncio
 import uuid
 from langchain_community.vectorstores import FAISS
 
@@ -14,12 +15,13 @@ from langchain_community.vectorstores.utils import (
     DistanceStrategy,
 )
 from langchain.embeddings import CacheBackedEmbeddings
-from simpleeval import simple_eval
+from python.helpers.metadata_filter import IndexedFaiss, MetadataFilter, parse_filter
+from python.helpers import vector_index
 
 from agent import Agent
 
 
-class MyFaiss(FAISS):
+class MyFaiss(IndexedFaiss):
     # override aget_by_ids
     def get_by_ids(self, ids: Sequence[str], /) -> List[Document]:
         # return all self.docstore._dict[id] in ids
@@ -35,17 +37,14 @@ class MyFaiss(FAISS):
 class VectorDB:
 
     _cached_embeddings: dict[str, CacheBackedEmbeddings] = {}
+    _dimensions: dict[str, int] = {}  # by embeddings model, so new stores do not embed a probe text
 
     @staticmethod
     def _get_embeddings(agent: Agent, cache: bool = True):
         model = agent.get_embedding_model()
         if not cache:
             return model  # return raw embeddings if cache is False
-        namespace = getattr(
-            model,
-            "model_name",
-            "default",
-        )
+        namespace = VectorDB._get_namespace(model)
         if namespace not in VectorDB._cached_embeddings:
             store = InMemoryByteStore()
             VectorDB._cached_embeddings[namespace] = (
@@ -57,11 +56,24 @@ class VectorDB:
             )
         return VectorDB._cached_embeddings[namespace]
 
+    @staticmethod
+    def _get_namespace(model) -> str:
+        return getattr(
+            model,
+            "model_name",
+            "default",
+        )
+
     def __init__(self, agent: Agent, cache: bool = True):
         self.agent = agent
         self.cache = cache  # store cache preference
         self.embeddings = self._get_embeddings(agent, cache=cache)
-        self.index = faiss.IndexFlatIP(len(self.embeddings.embed_query("example")))
+        self.embeddings_name = self._get_namespace(
+            getattr(self.embeddings, "underlying_embeddings", self.embeddings)
+        )
+        if self.embeddings_name not in VectorDB._dimensions:
+            VectorDB._dimensions[self.embeddings_name] = len(self.embeddings.embed_query("example"))
+        self.index = faiss.IndexFlatIP(VectorDB._dimensions[self.embeddings_name])
 
         self.db = MyFaiss(
             embedding_function=self.embeddings,
@@ -71,6 +83,7 @@ class VectorDB:
             distance_strategy=DistanceStrategy.COSINE,
             # normalize_L2=True,
             relevance_score_fn=cosine_normalizer,
+            index_type=vector_index.DEFAULT_INDEX_TYPE,
         )
 
     async def search_by_similarity_threshold(
@@ -86,17 +99,33 @@ class VectorDB:
             filter=comparator,
         )
 
+    async def search_many_by_similarity_threshold(
+        self, queries: list[str], limit: int, threshold: float, filter: str = ""
+    ) -> list[list[tuple[Document, float]]]:
+        """Documents and relevance scores found for each query, the queries are embedded
+        in one call and searched as one matrix, the filter selects candidates once"""
+        if not queries:
+            return []
+        comparator = get_comparator(filter) if filter else None
+
+        unique = list(dict.fromkeys(queries))
+        vectors = dict(zip(unique, await self.embeddings.aembed_documents(unique)))
+        loop = asyncio.get_running_loop()
+        found = await loop.run_in_executor(
+            None,
+            self.db.similarity_search_many_by_vectors,
+            [vectors[query] for query in queries],
+            [limit] * len(queries),
+            [comparator] * len(queries),
+        )
+        relevance = self.db._select_relevance_score_fn()
+        return [
+            [(doc, relevance(score)) for doc, score in docs if relevance(score) >= threshold]
+            for docs in found
+        ]
+
     async def search_by_metadata(self, filter: str, limit: int = 0) -> list[Document]:
-        comparator = get_comparator(filter)
-        all_docs = self.db.get_all_docs()
-        result = []
-        for doc in all_docs.values():
-            if comparator(doc.metadata):
-                result.append(doc)
-                # stop if limit reached and limit > 0
-                if limit > 0 and len(result) >= limit:
-                    break
-        return result
+        return self.db.search_by_filter(get_comparator(filter), limit)
 
     async def insert_documents(self, docs: list[Document]):
         ids = [str(uuid.uuid4()) for _ in range(len(docs))]
@@ -108,6 +137,21 @@ class VectorDB:
             self.db.add_documents(documents=docs, ids=ids)
         return ids
 
+    async def insert_embedded_documents(self, docs: list[Document], vectors: Sequence[Sequence[float]]):
+        """Insert documents with their precomputed vectors, nothing is embedded"""
+        ids = [str(uuid.uuid4()) for _ in range(len(docs))]
+
+        if ids:
+            for doc, id in zip(docs, ids):
+                doc.metadata["id"] = id  # add ids to documents metadata
+
+            self.db.add_embeddings(
+                [(doc.page_content, vector) for doc, vector in zip(docs, vectors)],
+                metadatas=[doc.metadata for doc in docs],
+                ids=ids,
+            )
+        return ids
+
     async def delete_documents_by_ids(self, ids: list[str]):
         # aget_by_ids is not yet implemented in faiss, need to do a workaround
         rem_docs = await self.db.aget_by_ids(
@@ -138,13 +182,6 @@ def cosine_normalizer(val: float) -> float:
     return res
 
 
-def get_comparator(condition: str):
-    def comparator(data: dict[str, Any]):
-        try:
-            result = simple_eval(condition, {}, data)
-            return result
-        except Exception as e:
-            # PrintStyle.error(f"Error evaluating condition: {e}")
-            return False
-
-    return comparator
+def get_comparator(condition: str) -> MetadataFilter:
+    # parsed once, indexed conditions narrow the search before scoring
+    return parse_filter(condition)
@@ -0,0 +1,99 @@
+import math
+
+import numpy as np
+
+# faiss needs to be patched for python 3.12 on arm #TODO remove once not needed
+from python.helpers import faiss_monkey_patch
+import faiss
+
+# index types of a memory store, "auto" is flat search until the store is large enough for HNSW
+# "ivf_pq" is lossy, vectors are compressed about 16 times and recall@10 drops to about 0.2,
+# only for stores that would not fit in memory otherwise
+INDEX_TYPES = ("auto", "flat", "hnsw", "ivf_flat", "ivf_pq")
+DEFAULT_INDEX_TYPE = "auto"
+ANN_THRESHOLD = 50_000  # vectors after which an ANN index replaces flat search, below it flat search is fast enough
+
+HNSW_M = 32  # graph neighbours per vector
+HNSW_EF_SEARCH = 128  # candidates explored per search, at least twice the results fetched
+IVF_NPROBE = 32  # inverted lists scanned per search
+IVF_TRAIN_SIZE = 50_000  # vectors sampled to train IVF centroids and PQ codebooks
+IVF_MIN_TRAIN = 10_000  # fewer vectors give poor centroids and codebooks, flat is kept until then
+EXACT_SEARCH_LIMIT = 4096  # selections up to this size are scored exactly instead of through the ANN index
+COMPACT_RATIO = 0.25  # share of deleted vectors after which an ANN index is rebuilt without them
+
+
+def get_index_type(index: faiss.Index) -> str:
+    """Index type of a built faiss index"""
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(index, faiss.IndexIVFPQ):
+        return "ivf_pq"
+    if isinstance(index, faiss.IndexIVF):
+        return "ivf_flat"
+    return "flat"
+
+
+def get_target_type(index_type: str, count: int) -> str:
+    """Index type a store of the configured type and count vectors should have"""
+    if index_type == "auto":
+        index_type = "hnsw"
+    if index_type == "flat" or count < ANN_THRESHOLD:
+        return "flat"
+    if index_type.startswith("ivf") and count < IVF_MIN_TRAIN:
+        return "flat"
+    return index_type
+
+
+def create_index(index_type: str, dim: int, vectors: np.ndarray) -> faiss.Index:
+    """Build an inner product index of the type over the vectors, IVF types are trained on them"""
+    if index_type == "flat":
+        index = faiss.IndexFlatIP(dim)
+    elif index_type == "hnsw":
+        index = faiss.index_factory(dim, f"HNSW{HNSW_M}", faiss.METRIC_INNER_PRODUCT)
+    elif index_type in ("ivf_flat", "ivf_pq"):
+        nlist = max(16, min(65536, int(4 * math.sqrt(len(vectors)))))
+        codes = "Flat" if index_type == "ivf_flat" else f"PQ{_pq_size(dim)}"
+        index = faiss.index_factory(dim, f"IVF{nlist},{codes}", faiss.METRIC_INNER_PRODUCT)
+        sample = vectors
+        if len(vectors) > IVF_TRAIN_SIZE:
+            rows = np.random.default_rng(0).choice(len(vectors), IVF_TRAIN_SIZE, replace=False)
+            sample = vectors[rows]
+        index.train(sample)  # type: ignore
+    else:
+        raise ValueError(f"Unknown index type '{index_type}', expected one of {INDEX_TYPES}")
+    index.add(vectors)  # type: ignore
+    _enable_reconstruct(index)
+    return index
+
+
+def rebuild_index(index: faiss.Index, vectors: np.ndarray) -> faiss.Index:
+    """Same index with only the vectors, keeps what IVF types were trained on"""
+    rebuilt = faiss.clone_index(index)
+    rebuilt.reset()
+    rebuilt.add(vectors)  # type: ignore
+    _enable_reconstruct(rebuilt)
+    return rebuilt
+
+
+def search_params(index: faiss.Index, selector: faiss.IDSelector | None, count: int):
+    """Search parameters of the index type for count results, with the selector if any"""
+    kwargs = {"sel": selector} if selector is not None else {}
+    if isinstance(index, faiss.IndexHNSW):
+        return faiss.SearchParametersHNSW(efSearch=max(HNSW_EF_SEARCH, 2 * count), **kwargs)
+    if isinstance(index, faiss.IndexIVF):
+        return faiss.SearchParametersIVF(nprobe=IVF_NPROBE, **kwargs)
+    return faiss.SearchParameters(**kwargs) if kwargs else None
+
+
+def _pq_size(dim: int) -> int:
+    # sub-quantizers of about 8 dimensions, their count has to divide dim
+    for size in range(max(1, dim // 8), 0, -1):
+        if dim % size == 0:
+            return size
+    return 1
+
+
+def _enable_reconstruct(index: faiss.Index):
+    # IVF indexes only find vectors by position with a direct map, needed to move or compact them
+    if isinstance(index, faiss.IndexIVF):
+        index.make_direct_map()
@@ -1,4 +1,5 @@
 import asyncio
+from contextlib import aclosing
 from dataclasses import dataclass
 import shlex
 import time
@@ -7,9 +8,10 @@ from python.helpers import files, rfc_exchange, projects, runtime
 from python.helpers.print_style import PrintStyle
 from python.helpers.shell_local import LocalInteractiveSession
 from python.helpers.shell_ssh import SSHInteractiveSession
+from python.helpers.terminal_output import TerminalOutput, clean_string
 from python.helpers.docker import DockerContainerManager
 from python.helpers.strings import truncate_text as truncate_text_string
-from python.helpers.messages import truncate_text as truncate_text_agent
+from python.helpers import log as log_helper
 import re
 
 # Timeouts for python, nodejs, and terminal runtimes.
@@ -28,6 +30,9 @@ OUTPUT_TIMEOUTS: dict[str, int] = {
     "dialog_timeout": 5,
 }
 
+# Chars of the output end shown in the log while a command runs, the log shows no more anyway
+UI_TAIL_LEN = log_helper.CONTENT_MAX_LEN
+
 @dataclass
 class ShellWrap:
     id: int
@@ -234,12 +239,11 @@ class CodeExecution(Tool):
     async def get_terminal_output(
         self,
         session=0,
-        reset_full_output=True,
         first_output_timeout=30,  # Wait up to x seconds for first output
         between_output_timeout=15,  # Wait up to x seconds between outputs
         dialog_timeout=5,  # potential dialog detection timeout
         max_exec_timeout=180,  # hard cap on total runtime
-        sleep_time=0.1,
+        sleep_time=0.1,  # longest wait without output before timeouts are checked
         prefix="",
         timeouts: dict | None = None,
     ):
@@ -256,141 +260,142 @@ class CodeExecution(Tool):
 
         start_time = time.time()
         last_output_time = start_time
-        full_output = ""
-        truncated_output = ""
+        output = TerminalOutput()
         got_output = False
 
         # if prefix, log right away
         if prefix:
             self.log.update(content=prefix)
 
-        while True:
-            await asyncio.sleep(sleep_time)
-            full_output, partial_output = await self.state.shells[session].session.read_output(
-                timeout=1, reset_full_output=reset_full_output
-            )
-            reset_full_output = False  # only reset once
-
-            await self.agent.handle_intervention()
-
-            now = time.time()
-            if partial_output:
-                PrintStyle(font_color="#85C1E9").stream(partial_output)
-                # full_output += partial_output # Append new output
-                truncated_output = self.fix_full_output(full_output)
-                self.set_progress(truncated_output)
-                heading = self.get_heading_from_output(truncated_output, 0)
-                self.log.update(content=prefix + truncated_output, heading=heading)
-                last_output_time = now
-                got_output = True
-
-                # Check for shell prompt at the end of output
-                last_lines = (
-                    truncated_output.splitlines()[-3:] if truncated_output else []
-                )
-                last_lines.reverse()
-                for idx, line in enumerate(last_lines):
-                    for pat in self.prompt_patterns:
-                        if pat.search(line.strip()):
-                            PrintStyle.info(
-                                "Detected shell prompt, returning output early."
-                            )
-                            last_lines.reverse()
-                            heading = self.get_heading_from_output(
-                                "\n".join(last_lines), idx + 1, True
-                            )
-                            self.log.update(heading=heading)
-                            self.mark_session_idle(session)
-                            return truncated_output
-
-            # Check for max execution time
-            if now - start_time > max_exec_timeout:
-                sysinfo = self.agent.read_prompt(
-                    "fw.code.max_time.md", timeout=max_exec_timeout
-                )
-                response = self.agent.read_prompt("fw.code.info.md", info=sysinfo)
-                if truncated_output:
-                    response = truncated_output + "\n\n" + response
-                PrintStyle.warning(sysinfo)
-                heading = self.get_heading_from_output(truncated_output, 0)
-                self.log.update(content=prefix + response, heading=heading)
-                return response
+        # wakes up on new output right away, on silence every sleep_time
+        events = self.state.shells[session].session.read_events(tick=sleep_time)
+        async with aclosing(events):
+            async for chunk in events:
+                if self.agent.intervention:
+                    # output so far is saved to history on intervention
+                    self.set_progress(self.render_output(output))
+                await self.agent.handle_intervention()
+
+                now = time.time()
+                if chunk:
+                    PrintStyle(font_color="#85C1E9").stream(clean_string(chunk, head=False))
+                    output.append(chunk)
+                    last_lines = output.last_lines(3)
+                    heading = self.get_heading_from_output("\n".join(last_lines), 0)
+                    self.log.update(content=prefix + output.tail(UI_TAIL_LEN), heading=heading)
+                    last_output_time = now
+                    got_output = True
+
+                    # Check for shell prompt at the end of output
+                    last_lines.reverse()
+                    for idx, line in enumerate(last_lines):
+                        for pat in self.prompt_patterns:
+                            if pat.search(line.strip()):
+                                PrintStyle.info(
+                                    "Detected shell prompt, returning output early."
+                                )
+                                last_lines.reverse()
+                                heading = self.get_heading_from_output(
+                                    "\n".join(last_lines), idx + 1, True
+                                )
+                                truncated_output = self.render_output(output)
+                                self.log.update(content=prefix + truncated_output, heading=heading)
+                                self.mark_session_idle(session)
+                                return truncated_output
 
-            # Waiting for first output
-            if not got_output:
-                if now - start_time > first_output_timeout:
-                    sysinfo = self.agent.read_prompt(
-                        "fw.code.no_out_time.md", timeout=first_output_timeout
-                    )
-                    response = self.agent.read_prompt("fw.code.info.md", info=sysinfo)
-                    PrintStyle.warning(sysinfo)
-                    self.log.update(content=prefix + response)
-                    return response
-            else:
-                # Waiting for more output after first output
-                if now - last_output_time > between_output_timeout:
+                # Check for max execution time
+                if now - start_time > max_exec_timeout:
                     sysinfo = self.agent.read_prompt(
-                        "fw.code.pause_time.md", timeout=between_output_timeout
+                        "fw.code.max_time.md", timeout=max_exec_timeout
                     )
                     response = self.agent.read_prompt("fw.code.info.md", info=sysinfo)
+                    truncated_output = self.render_output(output)
                     if truncated_output:
                         response = truncated_output + "\n\n" + response
                     PrintStyle.warning(sysinfo)
-                    heading = self.get_heading_from_output(truncated_output, 0)
+                    heading = self.get_heading_from_output("\n".join(output.last_lines(3)), 0)
                     self.log.update(content=prefix + response, heading=heading)
                     return response
 
-                # potential dialog detection
-                if now - last_output_time > dialog_timeout:
-                    # Check for dialog prompt at the end of output
-                    last_lines = (
-                        truncated_output.splitlines()[-2:] if truncated_output else []
-                    )
-                    for line in last_lines:
-                        for pat in self.dialog_patterns:
-                            if pat.search(line.strip()):
-                                PrintStyle.info(
-                                    "Detected dialog prompt, returning output early."
-                                )
-
-                                sysinfo = self.agent.read_prompt(
-                                    "fw.code.pause_dialog.md", timeout=dialog_timeout
-                                )
-                                response = self.agent.read_prompt(
-                                    "fw.code.info.md", info=sysinfo
-                                )
-                                if truncated_output:
-                                    response = truncated_output + "\n\n" + response
-                                PrintStyle.warning(sysinfo)
-                                heading = self.get_heading_from_output(
-                                    truncated_output, 0
-                                )
-                                self.log.update(
-                                    content=prefix + response, heading=heading
-                                )
-                                return response
+                # Waiting for first output
+                if not got_output:
+                    if now - start_time > first_output_timeout:
+                        sysinfo = self.agent.read_prompt(
+                            "fw.code.no_out_time.md", timeout=first_output_timeout
+                        )
+                        response = self.agent.read_prompt("fw.code.info.md", info=sysinfo)
+                        PrintStyle.warning(sysinfo)
+                        self.log.update(content=prefix + response)
+                        return response
+                else:
+                    # Waiting for more output after first output
+                    if now - last_output_time > between_output_timeout:
+                        sysinfo = self.agent.read_prompt(
+                            "fw.code.pause_time.md", timeout=between_output_timeout
+                        )
+                        response = self.agent.read_prompt("fw.code.info.md", info=sysinfo)
+                        truncated_output = self.render_output(output)
+                        if truncated_output:
+                            response = truncated_output + "\n\n" + response
+                        PrintStyle.warning(sysinfo)
+                        heading = self.get_heading_from_output("\n".join(output.last_lines(3)), 0)
+                        self.log.update(content=prefix + response, heading=heading)
+                        return response
+
+                    # potential dialog detection
+                    if now - last_output_time > dialog_timeout:
+                        # Check for dialog prompt at the end of output
+                        last_lines = output.last_lines(2)
+                        for line in last_lines:
+                            for pat in self.dialog_patterns:
+                                if pat.search(line.strip()):
+                                    PrintStyle.info(
+                                        "Detected dialog prompt, returning output early."
+                                    )
+
+                                    sysinfo = self.agent.read_prompt(
+                                        "fw.code.pause_dialog.md", timeout=dialog_timeout
+                                    )
+                                    response = self.agent.read_prompt(
+                                        "fw.code.info.md", info=sysinfo
+                                    )
+                                    truncated_output = self.render_output(output)
+                                    if truncated_output:
+                                        response = truncated_output + "\n\n" + response
+                                    PrintStyle.warning(sysinfo)
+                                    heading = self.get_heading_from_output(
+                                        "\n".join(last_lines), 0
+                                    )
+                                    self.log.update(
+                                        content=prefix + response, heading=heading
+                                    )
+                                    return response
+        return self.render_output(output)
 
     async def handle_running_session(
         self,
         session=0,
-        reset_full_output=True, 
+        timeout=1,
         prefix=""
     ):
         if not self.state or session not in self.state.shells:
             return None
         if not self.state.shells[session].running:
             return None
-        
-        full_output, _ = await self.state.shells[session].session.read_output(
-            timeout=1, reset_full_output=reset_full_output
-        )
-        truncated_output = self.fix_full_output(full_output)
-        self.set_progress(truncated_output)
-        heading = self.get_heading_from_output(truncated_output, 0)
 
-        last_lines = (
-            truncated_output.splitlines()[-3:] if truncated_output else []
-        )
+        # take what the running command printed since it was last read
+        output = TerminalOutput()
+        deadline = time.time() + timeout
+        events = self.state.shells[session].session.read_events(tick=0.01)
+        async with aclosing(events):
+            async for chunk in events:
+                if not chunk or time.time() > deadline:
+                    break
+                output.append(chunk)
+        truncated_output = self.render_output(output)
+        last_lines = output.last_lines(3)
+        heading = self.get_heading_from_output("\n".join(last_lines), 0)
+
         last_lines.reverse()
         for idx, line in enumerate(last_lines):
             for pat in self.prompt_patterns:
@@ -463,13 +468,11 @@ class CodeExecution(Tool):
 
         return self.get_heading() + done_icon
 
-    def fix_full_output(self, output: str):
-        # remove any single byte \xXX escapes
-        output = re.sub(r"(?<!\\)\\x[0-9A-Fa-f]{2}", "", output)
-        # Strip every line of output before truncation
-        # output = "\n".join(line.strip() for line in output.splitlines())
-        output = truncate_text_agent(agent=self.agent, output=output, threshold=1000000) # ~1MB, larger outputs should be dumped to file, not read from terminal
-        return output
+    def render_output(self, output: TerminalOutput):
+        # larger outputs are truncated in the middle, they should be dumped to file, not read from terminal
+        return output.text(
+            lambda length: self.agent.read_prompt("fw.msg_truncated.md", length=length)
+        )
 
     def get_cwd(self):
         project_name = projects.get_context_project_name(self.agent.context)
@@ -0,0 +1,97 @@
+import sys, os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import json
+import time
+import pytest
+from python.helpers.dirty_json import DirtyJson, snapshot
+
+examples = [
+    '{"thoughts": ["a", "b\\n c"], "headline": "Hi", "tool_name": "response", "tool_args": {"text": "Hello \\"world\\" \\u00e9 end"}}',
+    'Text before\n```json\n{\n  "thoughts": [\n    "x"\n  ],\n  "tool_name": "code_execution_tool",\n  "tool_args": {"runtime": "python", "code": "print(1)\\nprint(2)", "n": 12, "f": -1.5e3, "b": true, "z": null}\n}\n```',
+    "{'a': 'single', b: unquoted value, c: [1, 2, 3,], d: {e: false}}",
+    '{"a": """multi\nline "quoted" text""", "b": 1}',
+    '{{ "a": {"b": 2}}}',
+    '[1, 2, "three", {"four": 4}]',
+    '{"a": 1, // comment\n "b": /* block */ 2}',
+    '{"a": tru, "b": nul, "c": Undefined, "d": FALSE}',
+    '{"a": "x\\q y", "b": "\\u12"}',
+    '{"a" 1, "b", "c": 2}',
+    '{"a": [1 2], "b": 3}',
+]
+
+
+def _comparable(prefix: str) -> bool:
+    # parse() leaves containers open at these endings and returns inconsistent structures,
+    # before the first opening character it parses plain text, which streaming skips
+    stripped = prefix.rstrip()
+    return (
+        stripped[-1:] not in ("{", "[", ",", "/")
+        and any(c in prefix for c in '{["')
+    )
+
+
+@pytest.mark.parametrize("example", examples)
+@pytest.mark.parametrize("step", [1, 3, 7])
+def test_feed_matches_parse(example: str, step: int):
+    parser = DirtyJson()
+    for i in range(0, len(example), step):
+        prefix = example[: i + step]
+        result = snapshot(parser.feed(example[i : i + step]))
+        try:
+            expected = DirtyJson.parse_string(prefix)
+        except Exception:
+            continue
+        if _comparable(prefix):
+            assert result == expected, prefix
+    assert snapshot(parser.result) == DirtyJson.parse_string(example)
+
+
+def test_feed_full_restarts_on_rewrite():
+    parser = DirtyJson()
+    parser.feed_full('{"text": "my password is hun')
+    result = parser.feed_full('{"text": "my password is §§secret(PASS)", "a": 1}')
+    assert result == {"text": "my password is §§secret(PASS)", "a": 1}
+
+
+def test_stream_cost_is_flat():
+    text = json.dumps(
+        {
+            "thoughts": ["thinking about it"] * 20,
+            "tool_name": "response",
+            "tool_args": {"text": "lorem ipsum \\n dolor sit amet " * 2500},
+        }
+    )
+    assert len(text) > 50_000
+    chunks = [text[i : i + 20] for i in range(0, len(text), 20)]
+    sample = len(chunks) // 10
+
+    def timed(parse_full, measured_only=False):
+        times = []
+        full = ""
+        for i, chunk in enumerate(chunks):
+            full += chunk
+            if measured_only and sample <= i < len(chunks) - sample:
+                continue
+            start = time.perf_counter()
+            parse_full(full)
+            times.append(time.perf_counter() - start)
+        return sum(times[:sample]) / sample, sum(times[-sample:]) / sample
+
+    parser = DirtyJson()
+    early, late = timed(lambda full: snapshot(parser.feed_full(full)))
+    # re-parsing everything on every chunk, only timed on the sampled chunks
+    full_early, full_late = timed(DirtyJson.parse_string, measured_only=True)
+    print(
+        f"\nper chunk, first vs last 10% of {len(text)} chars:"
+        f"\n  streaming: {early * 1e6:.1f}us -> {late * 1e6:.1f}us"
+        f"\n  full reparse: {full_early * 1e6:.1f}us -> {full_late * 1e6:.1f}us"
+    )
+    assert parser.result == json.loads(text)
+    assert late < early * 5
+    assert late * 20 < full_late
+
+
+if __name__ == "__main__":
+    test_stream_cost_is_flat()
@@ -0,0 +1,129 @@
+import sys, os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+import time
+import numpy as np
+import pytest
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from python.helpers import document_cache, files
+from python.helpers.document_cache import CachedDocument
+from python.helpers.vector_db import VectorDB
+
+DIM = 256
+
+
+class _Embeddings(Embeddings):
+    # deterministic vectors, each call takes as long as a round trip to an embedding API
+    model_name = "document-cache-test"
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.texts = 0
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        self.texts += len(texts)
+        time.sleep(self.latency * (1 + len(texts) // 16))  # batches of 16
+        return [
+            np.random.default_rng(abs(hash(text)) % (2**32)).standard_normal(DIM).tolist()
+            for text in texts
+        ]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embed_documents([text])[0]
+
+
+class _Agent:
+    def __init__(self, embeddings: Embeddings):
+        self.embeddings = embeddings
+
+    def get_embedding_model(self):
+        return self.embeddings
+
+
+@pytest.fixture(autouse=True)
+def cache_dir():
+    document_cache.clear()
+    yield
+    document_cache.clear()
+
+
+def test_cache_versions_and_eviction():
+    uri = "file:///docs/a.txt"
+    vectors = np.ones((2, 4), dtype=np.float32)
+    document_cache.put(uri, "v1", CachedDocument("content", {"key": (["a", "b"], vectors)}))
+
+    cached = document_cache.get(uri, "v1")
+    assert cached and cached.content == "content"
+    chunks, loaded = cached.indexes["key"]
+    assert chunks == ["a", "b"] and np.array_equal(loaded, vectors)
+    assert document_cache.get(uri, "v2") is None  # changed document
+    assert document_cache.get("file:///docs/b.txt", "v1") is None
+
+    # a written file has a new version
+    path = files.get_abs_path("tmp/tests/document_cache.txt")
+    files.write_file(path, "first")
+    version = document_cache.get_file_version(path)
+    os.utime(path, ns=(1, 1))
+    assert document_cache.get_file_version(path) != version
+    os.remove(path)
+    assert document_cache.get_file_version(path) is None
+
+    # the least recently used documents are evicted past the size limit
+    for name in "bcd":
+        document_cache.put(f"file:///docs/{name}.txt", "v1", CachedDocument(name * 1000))
+        time.sleep(0.01)
+    assert document_cache.get(uri, "v1")  # used again, now the most recent
+    size = os.path.getsize(document_cache._get_path("file:///docs/d.txt"))
+    document_cache.evict(max_size=int(size * 2.1))
+    assert document_cache.get(uri, "v1")
+    assert document_cache.get("file:///docs/d.txt", "v1")
+    assert not document_cache.get("file:///docs/b.txt", "v1")
+    assert not document_cache.get("file:///docs/c.txt", "v1")
+
+
+def test_cached_index_benchmark():
+    embeddings = _Embeddings(latency=0.005)
+    agent = _Agent(embeddings)
+    uri = "file:///docs/report.pdf"
+    index_key = document_cache.get_index_key(embeddings.model_name, 1000, 100)
+    text = "\n\n".join(f"Page {p}. " + " ".join(f"word{p}_{w}" for w in range(300)) for p in range(300))
+
+    async def index(cached: CachedDocument) -> VectorDB:
+        db = VectorDB(agent, cache=False)  # type: ignore
+        if index_key in cached.indexes:
+            chunks, vectors = cached.indexes[index_key]
+        else:
+            chunks = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100).split_text(cached.content)
+            vectors = np.asarray(await db.embeddings.aembed_documents(chunks), dtype=np.float32)
+            cached.indexes[index_key] = (chunks, vectors)
+        docs = [Document(chunk, metadata={"document_uri": uri}) for chunk in chunks]
+        await db.insert_embedded_documents(docs, vectors.tolist())
+        return db
+
+    start = time.perf_counter()
+    cached = CachedDocument(text)
+    cold = asyncio.run(index(cached))
+    document_cache.put(uri, "v1", cached)
+    cold_time = time.perf_counter() - start
+    embedded = embeddings.texts
+
+    start = time.perf_counter()
+    loaded = document_cache.get(uri, "v1")
+    assert loaded
+    warm = asyncio.run(index(loaded))
+    warm_time = time.perf_counter() - start
+
+    print(
+        f"\nindex {len(cold.db.index_to_docstore_id)} chunks, 5ms per 16 embedded:"
+        f" embedded {cold_time * 1e3:.1f}ms, from the cache {warm_time * 1e3:.1f}ms"
+    )
+    assert embeddings.texts == embedded  # nothing embedded again
+    query = embeddings.embed_query("word7_12")
+    assert [d.page_content for d in warm.db.similarity_search_by_vector(query, k=3)] == [
+        d.page_content for d in cold.db.similarity_search_by_vector(query, k=3)
+    ]
+    assert warm_time * 5 < cold_time
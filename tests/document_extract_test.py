@@ -0,0 +1,156 @@
+import sys, os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+import time
+import numpy as np
+import pymupdf
+import pytest
+from langchain_community.document_loaders.parsers.images import TesseractBlobParser
+from langchain_community.document_loaders.pdf import PyMuPDFLoader
+from langchain_core.embeddings import Embeddings
+from agent import InterventionException
+from python.helpers import document_cache, document_extract, files
+from python.helpers.document_query import DocumentQueryHelper
+
+PDF_PATH = files.get_abs_path("tmp/tests/document_extract.pdf")
+
+
+class _Embeddings(Embeddings):
+    model_name = "document-extract-test"
+
+    def __init__(self):
+        self.texts = 0
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        self.texts += len(texts)
+        return [np.random.default_rng(abs(hash(text)) % (2**32)).standard_normal(32).tolist() for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embed_documents([text])[0]
+
+
+class _Agent:
+    # what DocumentQueryHelper uses of an agent
+    def __init__(self, embeddings: Embeddings):
+        self.config = object()
+        self.embeddings = embeddings
+        self.interventions = 0
+        self.intervene_after = -1
+
+    def get_embedding_model(self):
+        return self.embeddings
+
+    async def handle_intervention(self):
+        self.interventions += 1
+        if self.interventions == self.intervene_after:
+            raise InterventionException("stop")
+
+
+@pytest.fixture(scope="module", autouse=True)
+def pdf():
+    os.makedirs(os.path.dirname(PDF_PATH), exist_ok=True)
+    doc = pymupdf.open()
+    for p in range(24):
+        page = doc.new_page()
+        lines = [f"Page {p} line {l}: " + " ".join(f"term{p}_{l}_{w}" for w in range(8)) for l in range(40)]
+        page.insert_textbox(pymupdf.Rect(40, 40, 560, 800), "\n".join(lines), fontsize=7)
+    doc.save(PDF_PATH)
+    doc.close()
+    document_cache.clear()
+    asyncio.run(document_extract.run(document_extract.pdf_page_count, PDF_PATH))  # workers started
+    yield PDF_PATH
+    document_cache.clear()
+    os.remove(PDF_PATH)
+
+
+def _load_whole(path: str) -> str:
+    # how the whole PDF was parsed on the event loop before
+    loader = PyMuPDFLoader(
+        path,
+        mode="single",
+        extract_tables="markdown",
+        extract_images=True,
+        images_inner_format="text",
+        images_parser=TesseractBlobParser(),
+        pages_delimiter="\n",
+    )
+    return "\n".join(element.page_content for element in loader.load())
+
+
+async def _max_stall(work) -> tuple[float, float]:
+    # longest time the event loop could not run other tasks while the work ran
+    stalls = []
+    done = False
+
+    async def ticker():
+        while not done:
+            start = time.perf_counter()
+            await asyncio.sleep(0.005)
+            stalls.append(time.perf_counter() - start - 0.005)
+
+    tick = asyncio.create_task(ticker())
+    await asyncio.sleep(0.02)
+    start = time.perf_counter()
+    await work()
+    elapsed = time.perf_counter() - start
+    await asyncio.sleep(0.02)
+    done = True
+    await tick
+    return max(stalls), elapsed
+
+
+def test_pdf_extraction_and_cache():
+    embeddings = _Embeddings()
+    agent = _Agent(embeddings)
+    helper = DocumentQueryHelper(agent)  # type: ignore
+    content = asyncio.run(helper.document_get_content(f"file://{PDF_PATH}", True))
+
+    # same text as parsing the whole document at once
+    assert content == _load_whole(PDF_PATH)
+    assert helper.store.vector_db
+    chunks = helper.store.vector_db.db.get_all_docs()
+    assert len(chunks) > 24 and embeddings.texts == len(chunks) + 1  # and the dimensions probe
+    indexes = sorted(doc.metadata["chunk_index"] for doc in chunks.values())
+    assert indexes == list(range(len(chunks)))
+
+    # a new context gets the content and the index from the cache
+    embedded = embeddings.texts
+    messages = []
+    helper = DocumentQueryHelper(agent, messages.append)  # type: ignore
+    assert asyncio.run(helper.document_get_content(f"file://{PDF_PATH}", True)) == content
+    assert "Using cached document content" in messages and embeddings.texts == embedded
+    assert helper.store.vector_db and len(helper.store.vector_db.db.get_all_docs()) == len(chunks)
+
+
+def test_intervention_stops_extraction(monkeypatch):
+    document_cache.clear()
+    monkeypatch.setattr(document_extract, "PDF_PAGES_PER_TASK", 2)
+    agent = _Agent(_Embeddings())
+    agent.intervene_after = 4
+    helper = DocumentQueryHelper(agent)  # type: ignore
+    with pytest.raises(InterventionException):
+        asyncio.run(helper.document_get_content(f"file://{PDF_PATH}", True))
+    assert agent.interventions == 4
+    assert not document_cache.get(helper.store.normalize_uri(PDF_PATH), document_cache.get_file_version(PDF_PATH) or "")
+
+
+def test_event_loop_stall_benchmark():
+    async def on_loop():
+        _load_whole(PDF_PATH)
+
+    parts = []
+
+    async def in_pool():
+        parts.extend([part async for part in document_extract.extract_pdf(PDF_PATH)])
+
+    loop_stall, loop_time = asyncio.run(_max_stall(on_loop))
+    pool_stall, pool_time = asyncio.run(_max_stall(in_pool))
+    print(
+        f"\nextract 24 pages with {document_extract.EXTRACT_WORKERS} workers: on the event loop"
+        f" {loop_time * 1e3:.0f}ms (stalled {loop_stall * 1e3:.0f}ms), in the pool"
+        f" {pool_time * 1e3:.0f}ms (stalled {pool_stall * 1e3:.1f}ms)"
+    )
+    assert "\n".join(parts) == _load_whole(PDF_PATH)
+    assert pool_stall * 5 < loop_stall
@@ -0,0 +1,138 @@
+import sys, os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+import time
+from types import SimpleNamespace
+import numpy as np
+import pytest
+from langchain_core.embeddings import Embeddings
+from python.helpers import document_cache, files, tokens
+from python.helpers.document_query import DEFAULT_SEARCH_THRESHOLD, DocumentQueryHelper
+
+DOCS_DIR = files.get_abs_path("tmp/tests/document_qa")
+TOPICS = ["engine", "brakes", "tyres", "battery", "gearbox", "lights", "seats", "wipers"]
+
+
+class _Embeddings(Embeddings):
+    # texts about the same topic get similar vectors
+    model_name = "document-qa-test"
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        vectors = []
+        for text in texts:
+            rng = np.random.default_rng(abs(hash(text)) % (2**32))
+            vector = 0.3 * rng.standard_normal(len(TOPICS))
+            for i, topic in enumerate(TOPICS):
+                vector[i] += text.count(topic)
+            vectors.append((vector / np.linalg.norm(vector)).tolist())
+        return vectors
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embed_documents([text])[0]
+
+
+class _Agent:
+    # what DocumentQueryHelper uses of an agent, the utility model takes a round trip per call
+    def __init__(self, ctx_length: int, latency: float = 0.0):
+        self.config = SimpleNamespace(chat_model=SimpleNamespace(ctx_length=ctx_length))
+        self.latency = latency
+        self.utility_calls = 0
+        self.messages = []
+
+    def get_embedding_model(self):
+        return _Embeddings()
+
+    async def handle_intervention(self):
+        pass
+
+    def parse_prompt(self, name: str) -> str:
+        return "Answer the queries from the document."
+
+    async def call_utility_model(self, system: str, message: str) -> str:
+        self.utility_calls += 1
+        await asyncio.sleep(self.latency)
+        return message.split('"')[1].lower().replace("what about the ", "")
+
+    async def call_chat_model(self, messages):
+        self.messages = messages
+        return "answer", ""
+
+
+@pytest.fixture(autouse=True)
+def documents():
+    os.makedirs(DOCS_DIR, exist_ok=True)
+    uris = []
+    for d in range(5):
+        path = os.path.join(DOCS_DIR, f"manual{d}.txt")
+        sections = [
+            f"Section {s} of manual {d} about the {TOPICS[s % len(TOPICS)]}. " + "Details follow. " * 50
+            for s in range(40)
+        ]
+        files.write_file(path, "\n\n".join(sections))
+        uris.append(f"file://{path}")
+    yield uris
+    document_cache.clear()
+    files.delete_dir(DOCS_DIR)
+
+
+def test_document_qa_selects_chunks_within_budget(documents):
+    questions = [f"What about the {topic}" for topic in TOPICS]
+    agent = _Agent(ctx_length=6000)
+    helper = DocumentQueryHelper(agent)  # type: ignore
+    ok, answer = asyncio.run(helper.document_qa(documents, questions))
+    assert ok and answer == "answer"
+    assert agent.utility_calls == len(questions)
+
+    prompt = agent.messages[0].content + agent.messages[1].content
+    assert tokens.approximate_tokens(prompt) <= 6000 * 0.7 + 50
+    # every question got context even though the budget is small
+    for topic in TOPICS:
+        assert f"about the {topic}" in agent.messages[1].content
+
+    # without a known context length all found chunks are used
+    agent = _Agent(ctx_length=0)
+    helper = DocumentQueryHelper(agent)  # type: ignore
+    asyncio.run(helper.document_qa(documents, questions))
+    assert tokens.approximate_tokens(agent.messages[1].content) > 6000
+
+
+def test_document_qa_retrieval_benchmark(documents):
+    questions = [f"What about the {topic}" for topic in TOPICS]
+    agent = _Agent(ctx_length=100000, latency=0.05)
+    helper = DocumentQueryHelper(agent)  # type: ignore
+
+    async def index():
+        await asyncio.gather(*[helper.document_get_content(uri, True) for uri in documents])
+
+    asyncio.run(index())
+    doc_filter = " or ".join(f"document_uri == '{helper.store.normalize_uri(uri)}'" for uri in documents)
+
+    async def one_by_one():
+        # how document_qa optimized and searched each question before
+        selected = {}
+        for question in questions:
+            query = (await agent.call_utility_model(system="", message=f'Search Query: "{question}"')).strip()
+            for chunk in await helper.store.search_documents(query, 100, DEFAULT_SEARCH_THRESHOLD, doc_filter):
+                selected[chunk.metadata["id"]] = chunk
+        return selected
+
+    async def shared_pass():
+        queries = await helper.optimize_queries(questions)
+        results = await helper.store.search_documents_many(queries, 100, DEFAULT_SEARCH_THRESHOLD, doc_filter)
+        return helper.select_chunks(results, 0)
+
+    start = time.perf_counter()
+    expected = asyncio.run(one_by_one())
+    single_time = time.perf_counter() - start
+    start = time.perf_counter()
+    found = asyncio.run(shared_pass())
+    shared_time = time.perf_counter() - start
+
+    print(
+        f"\n{len(questions)} questions over {len(documents)} documents, 50ms per utility call:"
+        f" one by one {single_time * 1e3:.0f}ms, concurrent with one search {shared_time * 1e3:.0f}ms"
+    )
+    assert {chunk.metadata["id"] for chunk in found} == set(expected)
+    assert shared_time * 2.5 < single_time
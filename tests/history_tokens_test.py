@@ -0,0 +1,96 @@
+import sys, os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import time
+from python.helpers import history
+
+
+def _recount(hist: history.History) -> int:
+    # the uncached way, summed over every record
+    def record_tokens(record) -> int:
+        if isinstance(record, history.Message):
+            return record.calculate_tokens()
+        if record.summary:
+            return history.tokens.approximate_tokens(record.summary)
+        if isinstance(record, history.Topic):
+            return sum(record_tokens(m) for m in record.messages)
+        return sum(record_tokens(r) for r in record.records)
+
+    return sum(record_tokens(r) for r in [*hist.bulks, *hist.topics, hist.current])
+
+
+def _build(messages: int, per_topic: int = 50) -> history.History:
+    hist = history.History(agent=None)
+    for i in range(messages):
+        hist.add_message(i % 2 == 1, f"message {i} " + "lorem ipsum " * (i % 7))
+        if i % per_topic == per_topic - 1:
+            hist.new_topic()
+    return hist
+
+
+def test_cached_totals_follow_changes():
+    hist = _build(300)
+    assert hist.get_tokens() == _recount(hist)
+
+    hist.add_message(False, "one more message")
+    assert hist.get_tokens() == _recount(hist)
+
+    hist.topics[0].summary = "short summary"
+    assert hist.get_tokens() == _recount(hist)
+
+    bulk = history.Bulk(history=hist)
+    bulk.records.append(hist.topics.pop(0))
+    bulk.summary = bulk.records[0].summary
+    hist.bulks.append(bulk)
+    hist.invalidate_tokens()
+    assert hist.get_tokens() == _recount(hist)
+
+    hist.current.messages[0].set_summary("trimmed")
+    hist.current.invalidate_tokens()
+    assert hist.get_tokens() == _recount(hist)
+
+    restored = history.deserialize_history(hist.serialize(), agent=None)
+    assert restored.get_tokens() == hist.get_tokens()
+
+
+def test_missing_counts_are_batched_on_load(monkeypatch):
+    hist = _build(120)
+    data = history._json_loads(hist.serialize())
+    for topic in [*data["topics"], data["current"]]:
+        for message in topic["messages"]:
+            message["tokens"] = 0  # saved without counts
+
+    monkeypatch.setattr(history.tokens, "approximate_tokens", None)  # no per message counting
+    restored = history.History.from_dict(data, history=history.History(agent=None))
+    monkeypatch.undo()
+    assert restored.get_tokens() == hist.get_tokens() == _recount(restored)
+
+
+def test_is_over_limit_is_constant_time():
+    def timed(hist: history.History, check) -> float:
+        check(hist)  # first call sums the records once
+        start = time.perf_counter()
+        for _ in range(200):
+            hist.add_message(False, "new message")
+            check(hist)
+        return (time.perf_counter() - start) / 200
+
+    small, large = _build(500), _build(5000)
+    small_time = timed(small, history.History.is_over_limit)
+    large_time = timed(large, history.History.is_over_limit)
+    total_time = timed(large, history.History.get_tokens)
+
+    start = time.perf_counter()
+    _recount(large)
+    recount_time = time.perf_counter() - start
+
+    print(
+        f"\nadd_message + is_over_limit: 500 messages {small_time * 1e6:.1f}us,"
+        f" 5000 messages {large_time * 1e6:.1f}us"
+        f"\nadd_message + get_tokens on 5000 messages {total_time * 1e6:.1f}us,"
+        f" full recount {recount_time * 1e6:.0f}us"
+    )
+    assert large.get_tokens() == _recount(large)
+    assert large_time < small_time * 3
+    assert total_time * 20 < recount_time
@@ -0,0 +1,129 @@
+import sys, os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from python.helpers import files  # loaded before log, files and strings import each other
+from python.helpers.log import Log
+from python.helpers import state_monitor
+import threading
+from types import SimpleNamespace
+import time
+
+
+def test_stream_updates_are_coalesced():
+    log = Log()
+    log.stream_window = 60
+    item = log.log(type="agent", heading="Generating...")
+    version = log.get_version()
+
+    text = ""
+    for i in range(300):
+        text += f"chunk {i} "
+        item.update_stream(content=text, kvps={"thoughts": [text]}, reasoning=text)
+
+    # reading within the window does not bump the version
+    assert log.get_version() == version
+    # one version bump for the whole stream once the window has passed
+    log.stream_window = 0
+    assert log.get_version() == version + 1
+    assert log.get_version() == version + 1
+    assert item.content == text
+    assert item.kvps == {"thoughts": [text], "reasoning": text}
+
+
+def test_stream_updates_bump_after_window():
+    log = Log()
+    log.stream_window = 0
+    item = log.log(type="agent")
+    version = log.get_version()
+    for i in range(5):
+        item.update_stream(content="x" * i)
+    assert log.get_version() == version + 5
+
+
+def test_output_includes_stream_updates_after_window():
+    log = Log()
+    log.stream_window = 60
+    first = log.log(type="agent", content="first")
+    version = log.get_version()
+    first.update_stream(content="first, streamed")
+    second = log.log(type="info", content="second")
+
+    assert [o["content"] for o in log.output(start=version)] == ["second"]
+    log.stream_window = 0
+    out = log.output(start=version)
+    assert [o["content"] for o in out] == ["second", "first, streamed"]
+
+
+def test_coalesced_stream_updates_wake_waiters_after_window():
+    log = Log()
+    log.stream_window = 0.2
+    item = log.log(type="agent")
+    log_version = log.get_version()
+    item.update_stream(content="pending")
+    version = state_monitor.get_version()
+
+    woken = []
+    start = time.monotonic()
+    waiter = threading.Thread(target=lambda: woken.append(state_monitor.wait_for_change(version, 5)))
+    waiter.start()
+    waiter.join()
+    # the timer bumps the log version when the window ends, without any reader
+    assert woken[0] != version
+    assert time.monotonic() - start >= 0.1
+    assert len(log.updates) == log_version + 1
+
+
+def test_chunks_within_window_do_not_signal():
+    log = Log()
+    log.stream_window = 60
+    item = log.log(type="agent", heading="Generating...")
+    version = state_monitor.get_version()
+    text = ""
+    for i in range(100):
+        text += f"chunk {i} "
+        item.update_stream(content=text)
+        log.output()
+        log.get_version()
+    # neither the chunks nor readers polling meanwhile signal a change
+    assert state_monitor.get_version() == version
+    log.reset()
+
+
+def test_streams_wait_only_on_their_context():
+    other = Log()
+    other.context = SimpleNamespace(id="other-chat")  # type: ignore
+    version = state_monitor.get_context_version("this-chat")
+
+    woken = []
+    waiter = threading.Thread(
+        target=lambda: woken.append(state_monitor.wait_for_context_change("this-chat", version, 0.3))
+    )
+    waiter.start()
+    other.set_progress("working in another chat")
+    waiter.join()
+    # activity in another chat does not wake this chat's stream
+    assert woken[0] == version
+
+    own = Log()
+    own.context = SimpleNamespace(id="this-chat")  # type: ignore
+    own.set_progress("working here")
+    assert state_monitor.get_context_version("this-chat") != version
+    state_monitor.forget_context("this-chat")
+    state_monitor.forget_context("other-chat")
+
+
+def test_list_fields_refresh_is_throttled():
+    log = Log()
+    log.context = SimpleNamespace(id="busy-chat")  # type: ignore
+    state_monitor.mark_contexts_dirty()
+    contexts_version = state_monitor.get_contexts_version()
+    for i in range(50):
+        log.log(type="info", content=f"line {i}")
+    # log version and length are shown in the chats list, they are resent once after the interval
+    assert state_monitor.get_contexts_version() == contexts_version
+    deadline = time.monotonic() + state_monitor.LIST_REFRESH_INTERVAL + 2
+    while state_monitor.get_contexts_version() == contexts_version and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert state_monitor.get_contexts_version() == contexts_version + 1
+    state_monitor.forget_context("busy-chat")
@@ -0,0 +1,139 @@
+import sys, os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+import time
+from contextlib import AsyncExitStack
+import pytest
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import stdio_client
+from python.helpers import files
+from python.helpers.mcp_handler import MCPServerLocal
+
+SERVER_PATH = files.get_abs_path("tmp/tests/mcp_stdio_server.py")
+SERVER_CODE = """
+import asyncio, os
+from mcp.server.fastmcp import FastMCP
+
+mcp = FastMCP("stand-in")
+
+@mcp.tool()
+async def echo(text: str) -> str:
+    return text
+
+@mcp.tool()
+async def pid(delay: float = 0) -> int:
+    await asyncio.sleep(delay)
+    return os.getpid()
+
+@mcp.tool()
+async def crash() -> str:
+    os._exit(1)
+
+mcp.run()
+"""
+
+
+@pytest.fixture(scope="module")
+def server():
+    files.write_file(SERVER_PATH, SERVER_CODE)
+    server = MCPServerLocal(
+        {"name": "stand-in", "command": sys.executable, "args": [SERVER_PATH], "pool_size": 2, "idle_timeout": 2}
+    )
+    assert [tool["name"] for tool in server.get_tools()] == ["echo", "pid", "crash"]
+    yield server
+    server.close()
+    os.remove(SERVER_PATH)
+
+
+def _result(result) -> str:
+    return result.content[0].text
+
+
+def test_sessions_reused_and_reconnected(server):
+    async def call(tool: str, **args):
+        return await server.call_tool(tool, args)
+
+    first = _result(asyncio.run(call("pid")))
+    assert _result(asyncio.run(call("pid"))) == first  # the same warm server process
+
+    # concurrent calls use up to pool_size sessions
+    async def concurrent():
+        return await asyncio.gather(*[call("pid", delay=0.3) for _ in range(4)])
+
+    start = time.perf_counter()
+    pids = {_result(result) for result in asyncio.run(concurrent())}
+    assert len(pids) == 2 and time.perf_counter() - start < 1.2 + 2.0  # two rounds, one more process started
+
+    # a crashed server is replaced by the next call
+    with pytest.raises(ConnectionError):
+        asyncio.run(call("crash"))
+    assert _result(asyncio.run(call("echo", text="back"))) == "back"
+
+    # idle sessions are closed after idle_timeout
+    client = server._MCPServerLocal__client  # type: ignore
+    assert len(client.pool) > 0
+    time.sleep(3)
+    assert len(client.pool) == 0
+    assert _result(asyncio.run(call("echo", text="again"))) == "again"
+
+
+def test_failed_call_drops_session(server):
+    client = server._MCPServerLocal__client  # type: ignore
+    first = _result(asyncio.run(server.call_tool("pid", {})))
+
+    async def failing(session):
+        await session.send_ping()
+        raise RuntimeError("request timed out")
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(client.pool.run(failing))
+    # the only warm session took the failed call and was dropped, the next call starts a new server
+    assert _result(asyncio.run(server.call_tool("pid", {}))) != first
+
+
+def test_closed_read_stream_is_not_alive():
+    import anyio
+    from python.helpers.mcp_session_pool import _PooledSession
+
+    async def check():
+        pooled = _PooledSession()
+        pooled.task = asyncio.create_task(asyncio.sleep(10))
+        send, receive = anyio.create_memory_object_stream(1)
+        pooled.read_stream = receive
+        assert pooled.is_alive()
+        await send.aclose()  # the transport ended, e.g. an SSE read timeout
+        assert not pooled.is_alive()
+        pooled.task.cancel()
+
+    asyncio.run(check())
+
+
+def test_call_latency_benchmark(server):
+    calls = 5
+
+    async def session_per_call():
+        # how every call connected before, spawning and initializing the server each time
+        for i in range(calls):
+            async with AsyncExitStack() as stack:
+                params = StdioServerParameters(command=sys.executable, args=[SERVER_PATH])
+                read_stream, write_stream = await stack.enter_async_context(stdio_client(params))
+                session = await stack.enter_async_context(ClientSession(read_stream, write_stream))
+                await session.initialize()
+                assert _result(await session.call_tool("echo", {"text": str(i)})) == str(i)
+
+    async def pooled():
+        for i in range(calls):
+            assert _result(await server.call_tool("echo", {"text": str(i)})) == str(i)
+
+    asyncio.run(server.call_tool("echo", {"text": "warm"}))
+    start = time.perf_counter()
+    asyncio.run(pooled())
+    warm_time = (time.perf_counter() - start) / calls
+    start = time.perf_counter()
+    asyncio.run(session_per_call())
+    cold_time = (time.perf_counter() - start) / calls
+
+    print(f"\nMCP stdio tool call: new session {cold_time * 1e3:.0f}ms, pooled session {warm_time * 1e3:.1f}ms")
+    assert warm_time * 20 < cold_time
@@ -0,0 +1,81 @@
+import sys, os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import json
+from unittest.mock import patch
+from python.helpers import mcp_handler
+from python.helpers.mcp_handler import MCPServerLocal, render_server_tools_prompt, _compact_schema
+
+SCHEMA = {
+    "type": "object",
+    "properties": {
+        "query": {"type": "string", "description": "Search text"},
+        "limit": {"type": "integer", "default": 10},
+        "mode": {"enum": ["fast", "exact"]},
+        "tags": {"type": "array", "items": {"type": "string"}},
+        "since": {"anyOf": [{"type": "string"}, {"type": "null"}]},
+        "filter": {
+            "type": "object",
+            "description": "Field filters",
+            "properties": {"field": {"type": "string"}, "value": {}},
+        },
+    },
+    "required": ["query"],
+}
+
+
+def _server(tools):
+    # a server that can not connect, tools are set on its client directly
+    server = MCPServerLocal({"name": "stand-in", "command": "/nonexistent/mcp-server"})
+    client = server._MCPServerLocal__client  # type: ignore
+    client.tools = tools
+    client.tools_version += 1
+    return server, client
+
+
+def test_full_rendering_keeps_json_schema():
+    prompt = render_server_tools_prompt("srv", "desc", [{"name": "find", "description": "Find", "input_schema": SCHEMA}])
+    assert "### srv.find:\nFind\n" in prompt
+    assert f"#### Input schema for tool_args:\n{json.dumps(SCHEMA)}\n" in prompt
+    assert '"tool_name": "srv.find"' in prompt
+
+
+def test_compact_rendering():
+    lines = _compact_schema(SCHEMA).splitlines()
+    assert lines[0] == "* query (string, required): Search text"
+    assert lines[1] == "* limit (integer, default 10)"
+    assert lines[2] == '* mode (one of "fast"|"exact")'
+    assert lines[3] == "* tags (array of string)"
+    assert lines[4] == "* since (string|null)"
+    assert lines[5].startswith('* filter (schema {"type":"object","properties":')
+    assert lines[5].endswith("): Field filters")
+    assert _compact_schema({"type": "object", "properties": {}}) == "none"
+    assert _compact_schema(None) == "none"
+
+
+def test_compact_prompt_is_smaller():
+    tools = [{"name": f"tool{i}", "description": "Tool", "input_schema": SCHEMA} for i in range(20)]
+    full = render_server_tools_prompt("srv", "desc", tools)
+    compact = render_server_tools_prompt("srv", "desc", tools, compact=True)
+    assert len(compact) < len(full) * 0.7
+
+
+def test_prompt_cached_until_tools_change():
+    server, client = _server([{"name": "find", "description": "Find", "input_schema": SCHEMA}])
+    try:
+        with patch.object(mcp_handler, "render_server_tools_prompt", wraps=render_server_tools_prompt) as render:
+            first = server.get_tools_prompt()
+            assert server.get_tools_prompt() is first
+            assert render.call_count == 1
+
+            compact = server.get_tools_prompt(compact=True)
+            assert compact != first and render.call_count == 2
+
+            client.tools = [{"name": "other", "description": "Other", "input_schema": None}]
+            client.tools_version += 1
+            updated = server.get_tools_prompt(compact=True)
+            assert f"### {server.name}.other:" in updated and render.call_count == 3
+            assert server.get_tools_prompt(compact=True) is updated
+    finally:
+        server.close()
@@ -0,0 +1,128 @@
+import sys, os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+import time
+import faiss
+import numpy as np
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores.utils import DistanceStrategy
+from langchain_core.embeddings import Embeddings
+from python.helpers.memory import Memory, MyFaiss
+
+DIM = 64
+AREAS = ["main", "fragments", "solutions"]
+
+
+class _CountingEmbeddings(Embeddings):
+    # deterministic vectors, each call takes as long as a round trip to an embedding API
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.calls = 0
+        self.texts = 0
+
+    def _vector(self, text: str) -> list[float]:
+        rng = np.random.default_rng(abs(hash(text)) % (2**32))
+        vector = rng.standard_normal(DIM)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        self.calls += 1
+        self.texts += len(texts)
+        time.sleep(self.latency)
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embed_documents([text])[0]
+
+    def embed_queries(self, texts: list[str]) -> list[list[float]]:
+        return self.embed_documents(texts)
+
+
+def _memory(count: int, embeddings: Embeddings) -> Memory:
+    db = MyFaiss(
+        embedding_function=embeddings,
+        index=faiss.IndexFlatIP(DIM),
+        docstore=InMemoryDocstore(),
+        index_to_docstore_id={},
+        distance_strategy=DistanceStrategy.COSINE,
+        relevance_score_fn=Memory._cosine_normalizer,
+    )
+    vectors = np.random.default_rng(0).standard_normal((count, DIM)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    db.add_embeddings(
+        [(f"memory {i}", vector) for i, vector in enumerate(vectors.tolist())],
+        metadatas=[{"area": AREAS[i % 3], "n": i} for i in range(count)],
+        ids=[f"id{i}" for i in range(count)],
+    )
+    return Memory(db, memory_subdir="tests")
+
+
+async def _search_one_by_one(memory: Memory, queries: list[str], limits: list[int], filters: list[str]):
+    # how every search embedded and searched before
+    results = []
+    for query, limit, condition in zip(queries, limits, filters):
+        results.append(
+            await memory.db.asearch(
+                query,
+                search_type="similarity_score_threshold",
+                k=limit,
+                score_threshold=0.55,
+                filter=Memory._get_comparator(condition) if condition else None,
+            )
+        )
+    return results
+
+
+def test_search_many_matches_single_searches():
+    embeddings = _CountingEmbeddings()
+    memory = _memory(3000, embeddings)
+    queries = ["recall query", "recall query", "keyword one", "keyword two", "keyword three"]
+    limits = [12, 8, 5, 5, 20]
+    filters = [
+        "area == 'main' or area == 'fragments'",
+        "area == 'solutions'",
+        "area == 'main'",
+        "n % 2 == 0",  # not indexed, filtered after the search
+        "",
+    ]
+
+    expected = asyncio.run(_search_one_by_one(memory, queries, limits, filters))
+    embeddings.calls = embeddings.texts = 0
+    found = asyncio.run(memory.search_many(queries, limits, 0.55, filters))
+    assert [[doc.id for doc in docs] for docs in found] == [[doc.id for doc in docs] for docs in expected]
+    assert any(found) and len(found[0]) == 12
+    # the repeated query is embedded once, all in a single call
+    assert (embeddings.calls, embeddings.texts) == (1, 4)
+
+    # the cache serves queries seen before
+    single = asyncio.run(memory.search_similarity_threshold("keyword one", 5, 0.55, "area == 'main'"))
+    assert [doc.id for doc in single] == [doc.id for doc in found[2]]
+    assert embeddings.calls == 1
+
+
+def test_search_many_benchmark():
+    embeddings = _CountingEmbeddings(latency=0.005)
+    memory = _memory(20000, embeddings)
+    queries = [f"keyword {i}" for i in range(8)]
+    limits = [10] * len(queries)
+    filters = ["area == 'main'"] * len(queries)
+
+    start = time.perf_counter()
+    expected = asyncio.run(_search_one_by_one(memory, queries, limits, filters))
+    single_time = time.perf_counter() - start
+    single_calls = embeddings.calls
+
+    embeddings.calls = 0
+    start = time.perf_counter()
+    found = asyncio.run(memory.search_many(queries, limits, 0.55, filters))
+    many_time = time.perf_counter() - start
+
+    print(
+        f"\n{len(queries)} queries on 20000 memories, 5ms per embedding call:"
+        f" one by one {single_time * 1e3:.1f}ms ({single_calls} calls),"
+        f" search_many {many_time * 1e3:.1f}ms ({embeddings.calls} call)"
+    )
+    assert [[doc.id for doc in docs] for docs in found] == [[doc.id for doc in docs] for docs in expected]
+    assert many_time * 3 < single_time
@@ -0,0 +1,159 @@
+import sys, os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+import time
+import faiss
+import numpy as np
+import pytest
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores.utils import DistanceStrategy
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from python.helpers import files, memory_wal
+from python.helpers.memory import Memory, MyFaiss
+from python.helpers.memory_wal import MemoryWal
+
+DB_DIR = files.get_abs_path("tmp/tests/memory_wal")
+EMBEDDINGS = DeterministicFakeEmbedding(size=64)
+
+
+@pytest.fixture(autouse=True)
+def db_dir(monkeypatch):
+    files.delete_dir(DB_DIR)
+    # checkpoints only when the tests ask for them
+    monkeypatch.setattr(memory_wal, "CHECKPOINT_MUTATIONS", 10**9)
+    monkeypatch.setattr(memory_wal, "CHECKPOINT_INTERVAL", 3600.0)
+    yield DB_DIR
+    memory_wal.checkpoint_all()  # not at exit, when the dir is gone
+    files.delete_dir(DB_DIR)
+
+
+def _new_memory() -> Memory:
+    db = MyFaiss(
+        embedding_function=EMBEDDINGS,
+        index=faiss.IndexFlatIP(64),
+        docstore=InMemoryDocstore(),
+        index_to_docstore_id={},
+        distance_strategy=DistanceStrategy.COSINE,
+        relevance_score_fn=Memory._cosine_normalizer,
+    )
+    memory_wal.save_db(db, DB_DIR)
+    db.wal = MemoryWal(db, DB_DIR)
+    return Memory(db, memory_subdir="tests")
+
+
+def _state(db: MyFaiss) -> tuple:
+    docs = {id: (doc.page_content, doc.metadata) for id, doc in db.docstore._dict.items()}  # type: ignore
+    vectors = {id: db.index.reconstruct(i).tolist() for i, id in db.index_to_docstore_id.items()}
+    return docs, vectors
+
+
+async def _mutate(memory: Memory) -> list[str]:
+    ids = await memory.insert_documents([Document(f"memory {i}", metadata={"area": "main"}) for i in range(20)])
+    await memory.delete_documents_by_ids(ids[:5])
+    updated = memory.get_document_by_id(ids[10])
+    assert updated
+    await memory.update_documents([Document("memory 10 updated", metadata=dict(updated.metadata))])
+    await memory.insert_text("single", {"area": "solutions"})
+    return ids
+
+
+def test_replay_restores_unsaved_mutations():
+    memory = _new_memory()
+    asyncio.run(_mutate(memory))
+    expected = _state(memory.db)
+
+    # nothing was snapshotted, a restart rebuilds the store from the log
+    loaded = Memory._load_db(DB_DIR, EMBEDDINGS)
+    assert _state(loaded) == expected
+    assert loaded.get_by_ids(list(expected[0]))[0].page_content == "memory 5"
+    assert not os.path.exists(os.path.join(DB_DIR, memory_wal.WAL_FILE))
+
+    # and the snapshot written after the replay loads without a log
+    assert _state(Memory._load_db(DB_DIR, EMBEDDINGS)) == expected
+
+
+def test_checkpoint_and_crash_leftovers():
+    memory = _new_memory()
+    asyncio.run(_mutate(memory))
+    assert memory.db.wal
+    memory.db.wal.checkpoint()
+    expected = _state(memory.db)
+    assert not os.path.exists(os.path.join(DB_DIR, memory_wal.WAL_FILE))
+    assert not os.path.exists(os.path.join(DB_DIR, memory_wal.CHECKPOINT_WAL_FILE))
+
+    # a checkpoint that crashed after rotating the log and writing its temp files
+    asyncio.run(memory.insert_text("after checkpoint"))
+    expected_after = _state(memory.db)
+    assert expected_after != expected
+    os.replace(
+        os.path.join(DB_DIR, memory_wal.WAL_FILE),
+        os.path.join(DB_DIR, memory_wal.CHECKPOINT_WAL_FILE),
+    )
+    memory_wal.save_db(memory.db, DB_DIR + "_copy")
+    for name in memory_wal.SNAPSHOT_FILES:
+        os.replace(os.path.join(DB_DIR + "_copy", name), os.path.join(DB_DIR, name + ".tmp"))
+    files.delete_dir(DB_DIR + "_copy")
+
+    # without the marker the temp files are dropped and the rotated log is replayed
+    memory_wal.recover(DB_DIR)
+    assert not os.path.exists(os.path.join(DB_DIR, "index.faiss.tmp"))
+    assert _state(Memory._load_db(DB_DIR, EMBEDDINGS)) == expected_after
+
+    # with the marker the snapshot is committed, replaying a log it has already is harmless
+    asyncio.run(memory.insert_text("after recovery"))
+    expected_after = _state(memory.db)
+    files.write_file(os.path.join(DB_DIR, memory_wal.SNAPSHOT_MARKER_FILE), "")
+    memory_wal.save_db(memory.db, DB_DIR + "_copy")
+    for name in memory_wal.SNAPSHOT_FILES:
+        os.replace(os.path.join(DB_DIR + "_copy", name), os.path.join(DB_DIR, name + ".tmp"))
+    files.delete_dir(DB_DIR + "_copy")
+    memory_wal.recover(DB_DIR)
+    assert not os.path.exists(os.path.join(DB_DIR, memory_wal.SNAPSHOT_MARKER_FILE))
+    assert os.path.exists(os.path.join(DB_DIR, memory_wal.WAL_FILE))
+    assert _state(Memory._load_db(DB_DIR, EMBEDDINGS)) == expected_after
+
+    # a torn record at the end of the log is cut off, later records still count
+    memory = Memory(Memory._load_db(DB_DIR, EMBEDDINGS), memory_subdir="tests")
+    with open(os.path.join(DB_DIR, memory_wal.WAL_FILE), "ab") as f:
+        f.write(b"\x80\x04\x95garbage")
+    assert memory.db.wal
+    assert memory.db.wal.replay() == 0
+    asyncio.run(memory.insert_text("after crash"))
+    assert _state(Memory._load_db(DB_DIR, EMBEDDINGS)) == _state(memory.db)
+
+
+def test_wal_append_benchmark():
+    memory = _new_memory()
+    db = memory.db
+    vectors = np.random.default_rng(0).standard_normal((20000, 64)).astype(np.float32)
+    db.add_embeddings(
+        [(f"memory {i}", vector) for i, vector in enumerate(vectors.tolist())],
+        metadatas=[{"area": "main", "id": f"id{i}"} for i in range(20000)],
+        ids=[f"id{i}" for i in range(20000)],
+    )
+    memory_wal.save_db(db, DB_DIR)
+
+    def saved(i: int):
+        # what every insert did before, add and save the whole store
+        asyncio.run(db.aadd_documents([Document(f"saved memory {i}")], ids=[f"saved{i}"]))
+        db.save_local(DB_DIR)
+
+    def logged(i: int):
+        asyncio.run(memory.insert_text(f"logged memory {i}"))
+
+    def timed(insert) -> float:
+        start = time.perf_counter()
+        for i in range(20):
+            insert(i)
+        return (time.perf_counter() - start) / 20
+
+    save_time = timed(saved)
+    wal_time = timed(logged)
+    print(
+        f"\ninsert into {db.index.ntotal} memories: save_local {save_time * 1e3:.2f}ms,"
+        f" write-ahead log {wal_time * 1e3:.2f}ms"
+    )
+    assert wal_time * 5 < save_time
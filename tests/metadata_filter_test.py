@@ -0,0 +1,162 @@
+import sys, os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+import random
+import time
+import faiss
+import numpy as np
+import pytest
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores.utils import DistanceStrategy
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from simpleeval import simple_eval
+from python.helpers.metadata_filter import IndexedFaiss, parse_filter
+from python.helpers.memory import Memory
+
+AREAS = ["main", "fragments", "solutions", "instruments"]
+
+
+def _simple_eval(condition: str, metadata: dict) -> bool:
+    try:
+        return bool(simple_eval(condition, names=metadata))
+    except Exception:
+        return False
+
+
+@pytest.mark.parametrize(
+    "condition",
+    [
+        "area == 'main'",
+        "area == 'main' or area == 'fragments'",
+        "area=='solutions' and knowledge_source",
+        "area != 'main'",
+        "not area == 'main'",
+        "1 < score <= 3",
+        "document_uri == 'file:///a.txt' or score > 2",
+        "int(score) == 2",  # calls are left to simple_eval
+    ],
+)
+def test_filter_matches_simple_eval(condition: str):
+    rnd = random.Random(0)
+    for _ in range(200):
+        metadata = {}
+        if rnd.random() < 0.9:
+            metadata["area"] = rnd.choice(AREAS)
+        if rnd.random() < 0.5:
+            metadata["knowledge_source"] = rnd.random() < 0.5
+        if rnd.random() < 0.5:
+            metadata["score"] = rnd.randint(0, 4)
+        if rnd.random() < 0.5:
+            metadata["document_uri"] = rnd.choice(["file:///a.txt", "file:///b.txt"])
+        assert parse_filter(condition)(metadata) == _simple_eval(condition, metadata), metadata
+    assert parse_filter(condition) is parse_filter(condition)
+
+
+def test_filter_supports_membership():
+    # simple_eval has no tuples or lists, the parsed filter does
+    assert parse_filter("area in ('main', 'solutions')")({"area": "main"})
+    assert not parse_filter("area not in ['main']")({"area": "main"})
+    assert not parse_filter("area in ('main',)")({})
+
+
+def _store(count: int, rnd: random.Random) -> IndexedFaiss:
+    embeddings = DeterministicFakeEmbedding(size=64)
+    db = IndexedFaiss(
+        embedding_function=embeddings,
+        index=faiss.IndexFlatIP(64),
+        docstore=InMemoryDocstore(),
+        index_to_docstore_id={},
+        distance_strategy=DistanceStrategy.COSINE,
+        relevance_score_fn=Memory._cosine_normalizer,
+    )
+    texts = [f"memory number {i}" for i in range(count)]
+    vectors = np.random.default_rng(0).standard_normal((count, 64)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    db.add_embeddings(
+        list(zip(texts, vectors.tolist())),
+        metadatas=[{"area": rnd.choice(AREAS), "n": i} for i in range(count)],
+        ids=[f"id{i}" for i in range(count)],
+    )
+    return db
+
+
+def _brute_force(db: IndexedFaiss, query: list[float], condition: str, k: int) -> list[str]:
+    flt = parse_filter(condition)
+    vectors = db.index.reconstruct_n(0, db.index.ntotal)
+    scores = vectors @ np.array(query, dtype=np.float32)
+    ranked = sorted(range(len(scores)), key=lambda i: -scores[i])
+    ids = [db.index_to_docstore_id[i] for i in ranked]
+    return [id for id in ids if flt(db.docstore.search(id).metadata)][:k]
+
+
+def test_indexed_search_scores_only_matching_vectors():
+    rnd = random.Random(1)
+    db = _store(2000, rnd)
+    query = db.index.reconstruct(3).tolist()
+    condition = "area == 'solutions' or area == 'instruments'"
+
+    found = db.similarity_search_with_score_by_vector(query, k=10, filter=parse_filter(condition))
+    assert [doc.id for doc, _ in found] == _brute_force(db, query, condition, 10)
+
+    # the index follows deletes and inserts
+    db.delete([f"id{i}" for i in range(0, 2000, 3)])
+    db.add_embeddings(
+        [("added", query)], metadatas=[{"area": "solutions", "n": -1}], ids=["added"]
+    )
+    found = db.similarity_search_with_score_by_vector(query, k=10, filter=parse_filter(condition))
+    assert [doc.id for doc, _ in found] == _brute_force(db, query, condition, 10)
+    assert found[0][0].id == "added"
+
+    by_filter = db.search_by_filter(parse_filter("area == 'main'"), limit=50)
+    expected = [d for d in db.docstore._dict.values() if d.metadata["area"] == "main"][:50]
+    assert by_filter == expected
+
+
+def test_relevance_search_through_langchain():
+    db = _store(500, random.Random(2))
+    docs = asyncio.run(
+        db.asearch(
+            "memory number 3",
+            search_type="similarity_score_threshold",
+            k=5,
+            score_threshold=0.0,
+            filter=parse_filter("area == 'main'"),
+        )
+    )
+    assert docs and all(doc.metadata["area"] == "main" for doc in docs)
+
+
+def test_indexed_search_benchmark():
+    rnd = random.Random(3)
+    db = _store(20000, rnd)
+    db.add_embeddings(
+        [(f"rare {i}", db.index.reconstruct(i).tolist()) for i in range(50)],
+        metadatas=[{"area": "rare", "n": i} for i in range(50)],
+        ids=[f"rare{i}" for i in range(50)],
+    )
+    queries = [db.index.reconstruct(i).tolist() for i in range(100, 120)]
+    condition = "area == 'rare'"
+
+    def old_comparator(metadata: dict) -> bool:
+        return _simple_eval(condition, metadata)
+
+    def timed(filter, fetch_k: int) -> tuple[float, int]:
+        found = 0
+        start = time.perf_counter()
+        for query in queries:
+            found += len(db.similarity_search_with_score_by_vector(query, k=10, filter=filter, fetch_k=fetch_k))
+        return (time.perf_counter() - start) / len(queries), found
+
+    old_time, old_found = timed(old_comparator, 20)
+    full_time, full_found = timed(old_comparator, db.index.ntotal)
+    new_time, new_found = timed(parse_filter(condition), 20)
+    print(
+        f"\nfilter on 50 of {db.index.ntotal} memories, k=10:"
+        f"\n  post filter fetch_k=20: {old_time * 1e3:.2f}ms, {old_found} found"
+        f"\n  post filter all: {full_time * 1e3:.2f}ms, {full_found} found"
+        f"\n  indexed prefilter: {new_time * 1e3:.2f}ms, {new_found} found"
+    )
+    assert new_found == full_found == 10 * len(queries)
+    assert new_time * 10 < full_time
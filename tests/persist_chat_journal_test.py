@@ -0,0 +1,199 @@
+import sys, os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import json
+import pytest
+from agent import AgentContext
+from initialize import initialize_agent
+from python.helpers import persist_chat, files
+
+CHATS_FOLDER = "tmp/tests/chats"
+CHATS_INDEX_FILE = "tmp/tests/chats_index.json"
+
+
+@pytest.fixture(autouse=True)
+def chats_folder(monkeypatch):
+    monkeypatch.setattr(persist_chat, "CHATS_FOLDER", CHATS_FOLDER)
+    monkeypatch.setattr(persist_chat, "CHATS_INDEX_FILE", CHATS_INDEX_FILE)
+    yield
+    persist_chat.flush_journals()
+    files.delete_dir(CHATS_FOLDER)
+    if files.exists(CHATS_INDEX_FILE):
+        os.remove(files.get_abs_path(CHATS_INDEX_FILE))
+
+
+def _comparable(data: dict) -> dict:
+    data = json.loads(persist_chat._safe_json_serialize(data))
+    for agent in data["agents"]:
+        agent["history"] = json.loads(agent["history"]) if agent["history"] else None
+    return data
+
+
+def _replayed(ctxid: str) -> dict:
+    data = json.loads(files.read_file(persist_chat._get_chat_file_path(ctxid)))
+    return persist_chat._replay_journal(data, persist_chat._get_journal_file_path(ctxid))
+
+
+def _chat_loop(context: AgentContext, i: int):
+    agent = context.agent0
+    agent.history.add_message(False, f"user message {i}")
+    agent.history.add_message(True, {"text": f"ai message {i} " * 50})
+    context.log.log(type="agent", heading=f"step {i}", content=f"content {i} " * 50)
+    if i % 3 == 2:
+        agent.history.new_topic()
+        context.name = f"chat {i}"
+
+
+def test_journal_replays_to_snapshot():
+    context = AgentContext(config=initialize_agent(), name="journal")
+    persist_chat.save_tmp_chat(context)
+
+    for i in range(10):
+        _chat_loop(context, i)
+        persist_chat.journal_tmp_chat(context)
+    persist_chat.flush_journals()
+
+    assert files.exists(persist_chat._get_journal_file_path(context.id))
+    assert _comparable(_replayed(context.id)) == _comparable(
+        persist_chat._serialize_context(context)
+    )
+    AgentContext.remove(context.id)
+
+
+def test_journal_compacts_and_snapshot_resets_it(monkeypatch):
+    monkeypatch.setattr(persist_chat, "JOURNAL_COMPACT_RECORDS", 3)
+    context = AgentContext(config=initialize_agent(), name="journal")
+    persist_chat.save_tmp_chat(context)
+    journal = persist_chat._get_journal_file_path(context.id)
+
+    for i in range(5):
+        _chat_loop(context, i)
+        persist_chat.journal_tmp_chat(context)
+    persist_chat.flush_journals()
+    # three records, a snapshot, then one more record
+    with open(journal) as f:
+        assert len(f.readlines()) == 1
+
+    # a full save replaces journal and queued records
+    _chat_loop(context, 5)
+    persist_chat.journal_tmp_chat(context)
+    persist_chat.save_tmp_chat(context)
+    persist_chat.flush_journals()
+    assert not os.path.exists(journal)
+    assert _comparable(_replayed(context.id)) == _comparable(
+        persist_chat._serialize_context(context)
+    )
+    AgentContext.remove(context.id)
+
+
+def test_journal_writes_less_than_snapshots():
+    context = AgentContext(config=initialize_agent(), name="journal")
+    persist_chat.save_tmp_chat(context)
+
+    snapshot_bytes = 0
+    for i in range(60):
+        _chat_loop(context, i)
+        persist_chat.journal_tmp_chat(context)
+        snapshot_bytes += len(
+            persist_chat._safe_json_serialize(persist_chat._serialize_context(context))
+        )
+    persist_chat.flush_journals()
+    journal_bytes = os.path.getsize(persist_chat._get_journal_file_path(context.id))
+    print(f"\nbytes written, 60 iterations: snapshots {snapshot_bytes}, journal {journal_bytes}")
+    assert journal_bytes * 10 < snapshot_bytes
+    AgentContext.remove(context.id)
+
+
+def test_lazy_load_hydrates_on_use():
+    contexts = [AgentContext(config=initialize_agent(), name=f"lazy {i}") for i in range(3)]
+    for i, context in enumerate(contexts):
+        _chat_loop(context, i)
+        persist_chat.save_tmp_chat(context)
+        persist_chat.journal_tmp_chat(context)
+    _chat_loop(contexts[0], 3)
+    persist_chat.journal_tmp_chat(contexts[0])
+    persist_chat.flush_journals()
+    expected = {c.id: _comparable(persist_chat._serialize_context(c)) for c in contexts}
+    for context in contexts:
+        AgentContext.remove(context.id)
+
+    ctxids = persist_chat.load_tmp_chats(lazy=True)
+    assert sorted(ctxids) == sorted(expected)
+    for ctxid in ctxids:
+        lazy = AgentContext._contexts[ctxid]
+        assert lazy.loader and lazy.agent0 is None
+        assert lazy.name == expected[ctxid]["name"]
+
+        loaded = AgentContext.get(ctxid)
+        assert loaded is lazy and not loaded.loader
+        actual = _comparable(persist_chat._serialize_context(loaded))
+        # log items are renumbered, empty kvps dropped and progress starts over on load
+        for data in (actual, expected[ctxid]):
+            data["log"]["progress"] = data["log"]["progress_no"] = None
+            for item in data["log"]["logs"]:
+                item.pop("no")
+                item["kvps"] = item["kvps"] or None
+        assert actual == expected[ctxid]
+        AgentContext.remove(ctxid)
+
+
+def test_lazy_load_keeps_project_and_early_log_items():
+    context = AgentContext(config=initialize_agent(), name="project chat")
+    _chat_loop(context, 0)
+    context.set_data("project", "demo")
+    expected = [item.content for item in context.log.logs] + ["logged before loading"]
+    persist_chat.save_tmp_chat(context)
+    persist_chat.flush_journals()
+    ctxid = context.id
+    AgentContext.remove(ctxid)
+
+    persist_chat.load_tmp_chats(lazy=True)
+    lazy = AgentContext._contexts[ctxid]
+    # the project is known without loading the chat
+    assert lazy.get_data("project") == "demo" and lazy.loader
+    # saving all chats leaves the ones not used unloaded and unwritten
+    chat_file = persist_chat._get_chat_file_path(ctxid)
+    mtime = os.path.getmtime(chat_file)
+    persist_chat.save_tmp_chats()
+    assert lazy.loader and os.path.getmtime(chat_file) == mtime
+
+    items = AgentContext.log_to_all(type="info", content="logged before loading")
+    loaded = AgentContext.get(ctxid)
+    assert loaded is lazy and not loaded.loader
+    assert [item.content for item in loaded.log.logs] == expected
+    # items returned by log_to_all still update the loaded log
+    item = next(item for item in items if item.log is loaded.log)
+    item.update(content="updated")
+    assert loaded.log.output()[-1]["content"] == "updated"
+    AgentContext.remove(ctxid)
+
+
+def test_snapshot_skips_journal_of_previous_snapshot():
+    context = AgentContext(config=initialize_agent(), name="journal")
+    persist_chat.save_tmp_chat(context)
+    journal = persist_chat._get_journal_file_path(context.id)
+    for i in range(3):
+        _chat_loop(context, i)
+        persist_chat.journal_tmp_chat(context)
+    persist_chat.flush_journals()
+    with open(journal) as f:
+        stale = f.read()
+
+    # a crash after the new snapshot was in place but before the journal was removed
+    persist_chat.save_tmp_chat(context)
+    assert not os.path.exists(persist_chat._get_chat_file_path(context.id) + ".tmp")
+    with open(journal, "w") as f:
+        f.write(stale)
+    assert _comparable(_replayed(context.id)) == _comparable(
+        persist_chat._serialize_context(context)
+    )
+
+    # records of the current snapshot are still replayed after the stale ones
+    _chat_loop(context, 3)
+    persist_chat.journal_tmp_chat(context)
+    persist_chat.flush_journals()
+    assert _comparable(_replayed(context.id)) == _comparable(
+        persist_chat._serialize_context(context)
+    )
+    AgentContext.remove(context.id)
@@ -0,0 +1,134 @@
+import sys, os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+import time
+from agent import AgentContext, LoopData
+from initialize import initialize_agent
+from python.helpers import extension, history, prompt_builder
+
+
+def _add_messages(hist: history.History, start: int, count: int):
+    for i in range(start, start + count):
+        # runs of same role messages are merged in the prompt
+        ai = i % 3 == 2
+        content = {"tool_name": "code", "result": f"result {i} " * 20} if i % 5 == 0 else f"message {i}"
+        hist.add_message(ai, content)
+        if i % 40 == 39:
+            hist.new_topic()
+
+
+def _extras(i: int) -> list[history.OutputMessage]:
+    return [history.OutputMessage(ai=False, content=f"extras {i}")]
+
+
+def test_incremental_messages_match_full_render():
+    builder = prompt_builder.PromptBuilder(agent=None)  # type: ignore
+    hist = history.History(agent=None)
+
+    for step in range(30):
+        _add_messages(hist, step * 7, 7)
+        if step == 10:
+            hist.topics[0].summary = "first topic summary"
+        if step == 20:
+            hist.current.messages[0].set_summary("shortened")
+        if step == 25:
+            bulk = history.Bulk(history=hist)
+            bulk.records = hist.topics[:2]
+            bulk.summary = "bulk summary"
+            hist.topics = hist.topics[2:]
+            hist.bulks.append(bulk)
+        outputs = hist.output() + _extras(step)
+        expected = history.output_langchain(outputs)
+        assert builder.output_langchain(outputs) == expected
+
+
+def test_system_prompt_is_reused_until_inputs_change():
+    context = AgentContext(config=initialize_agent(), name="prompt")
+    agent = context.agent0
+    try:
+        start = time.perf_counter()
+        first = asyncio.run(agent.get_system_prompt(LoopData()))
+        render_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        second = asyncio.run(agent.get_system_prompt(LoopData()))
+        cached_time = time.perf_counter() - start
+        assert first == second
+
+        prompt_builder.invalidate()
+        third = asyncio.run(agent.get_system_prompt(LoopData()))
+        assert third == first
+
+        print(f"\nsystem prompt: rendered {render_time * 1e3:.2f}ms, reused {cached_time * 1e3:.2f}ms")
+        assert cached_time < render_time
+    finally:
+        AgentContext.remove(context.id)
+
+
+def test_incremental_messages_are_faster():
+    hist = history.History(agent=None)
+    _add_messages(hist, 0, 2000)
+    builder = prompt_builder.PromptBuilder(agent=None)  # type: ignore
+    builder.output_langchain(hist.output())
+
+    full_time = incremental_time = 0.0
+    for i in range(20):
+        _add_messages(hist, 2000 + i, 1)
+        outputs = hist.output() + _extras(i)
+
+        start = time.perf_counter()
+        expected = history.output_langchain(outputs)
+        full_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        actual = builder.output_langchain(outputs)
+        incremental_time += time.perf_counter() - start
+        assert actual == expected
+
+    print(
+        f"\nhistory of 2000 messages to langchain: full {full_time / 20 * 1e3:.2f}ms,"
+        f" incremental {incremental_time / 20 * 1e3:.2f}ms"
+    )
+    assert incremental_time * 5 < full_time
+
+
+def test_tree_stamp_is_cached_until_invalidated(tmp_path):
+    (tmp_path / "a.md").write_text("a")
+    first = prompt_builder._cached_tree_stamp(str(tmp_path))
+    (tmp_path / "b.md").write_text("b")
+    # within the interval the folder is not walked again
+    assert prompt_builder._cached_tree_stamp(str(tmp_path)) == first
+    prompt_builder.invalidate()
+    assert prompt_builder._cached_tree_stamp(str(tmp_path)) == prompt_builder._tree_stamp(str(tmp_path)) != first
+
+
+def test_extensions_add_to_system_prompt_key(monkeypatch):
+    context = AgentContext(config=initialize_agent(), name="prompt")
+    agent = context.agent0
+    state = {"value": 1}
+
+    class Keyed(extension.Extension):
+        async def execute(self, system_prompt: list[str] = [], **kwargs):
+            system_prompt.append(f"value {state['value']}")
+
+        def system_prompt_key(self):
+            return state["value"]
+
+    defaults = asyncio.run(extension.get_extension_classes("system_prompt", agent))
+
+    async def classes(extension_point, agent=None):
+        return defaults + [Keyed]
+
+    monkeypatch.setattr(extension, "get_extension_classes", classes)
+    try:
+        assert asyncio.run(agent.get_system_prompt(LoopData()))[-1] == "value 1"
+        state["value"] = 2
+        assert asyncio.run(agent.get_system_prompt(LoopData()))[-1] == "value 2"
+
+        # an extension opting out has the prompt rendered every time
+        monkeypatch.setattr(Keyed, "cache_system_prompt", False)
+        assert asyncio.run(prompt_builder.get_system_prompt_key(agent)) is None
+    finally:
+        AgentContext.remove(context.id)
@@ -0,0 +1,188 @@
+import sys, os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import random
+import time
+import pytest
+from python.helpers import files
+from python.helpers.secrets import SecretsManager
+
+SECRETS_DIR = "tmp/tests/secrets"
+SECRETS_FILE = SECRETS_DIR + "/stream_mask.env"
+
+
+@pytest.fixture(autouse=True, scope="module")
+def cleanup():
+    yield
+    files.delete_dir(SECRETS_DIR)
+
+
+def _manager(secrets: dict[str, str]) -> SecretsManager:
+    files.write_file(
+        SECRETS_FILE, "\n".join(f'{k}="{v}"' for k, v in secrets.items())
+    )
+    manager = SecretsManager(SECRETS_FILE)
+    manager.clear_cache()
+    return manager
+
+
+def _random_secrets(rnd: random.Random, count: int) -> dict[str, str]:
+    alphabet = "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789"
+    secrets = {
+        f"KEY_{i}": "".join(rnd.choices(alphabet, k=rnd.randint(6, 40)))
+        for i in range(count)
+    }
+    # overlapping values: one secret is a prefix of another, short values are not masked
+    secrets["PREFIX"] = secrets["KEY_0"][:5]
+    secrets["SHORT"] = "abc"
+    return secrets
+
+
+def _random_text(rnd: random.Random, secrets: dict[str, str], length: int) -> str:
+    parts = []
+    values = list(secrets.values())
+    while sum(len(p) for p in parts) < length:
+        if rnd.random() < 0.2:
+            parts.append(rnd.choice(values))
+        else:
+            parts.append(" ".join(rnd.choice(["lorem", "ipsum", "dolor", "abc", "§§"]) for _ in range(5)))
+    return "".join(parts)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_mask_buffer_matches_full_masking(seed: int):
+    rnd = random.Random(seed)
+    secrets = _random_secrets(rnd, 10)
+    manager = _manager(secrets)
+    text = _random_text(rnd, secrets, 3000)
+
+    buffer = manager.create_mask_buffer()
+    full = ""
+    while len(full) < len(text):
+        full = text[: len(full) + rnd.randint(1, 30)]
+        assert buffer.update(full) == manager.mask_values(full)
+
+
+def test_mask_buffer_restarts_on_new_stream():
+    manager = _manager({"API_KEY": "sk-1234567890"})
+    buffer = manager.create_mask_buffer()
+    assert buffer.update("key: sk-1234567890 and more") == "key: §§secret(API_KEY) and more"
+    assert buffer.update("new sk-12") == "new sk-12"
+    assert buffer.update("new sk-1234567890") == "new §§secret(API_KEY)"
+
+
+def test_mask_buffer_cost_is_flat():
+    rnd = random.Random(1)
+    secrets = _random_secrets(rnd, 100)
+    manager = _manager(secrets)
+    text = _random_text(rnd, secrets, 100_000)
+    chunks = range(20, len(text), 20)
+    sample = len(chunks) // 10
+
+    def timed(mask, measured_only=False):
+        times = []
+        for i, end in enumerate(chunks):
+            if measured_only and sample <= i < len(chunks) - sample:
+                continue
+            start = time.perf_counter()
+            mask(text[:end])
+            times.append(time.perf_counter() - start)
+        return sum(times[:sample]) / sample, sum(times[-sample:]) / sample
+
+    buffer = manager.create_mask_buffer()
+    early, late = timed(buffer.update)
+    full_early, full_late = timed(manager.mask_values, measured_only=True)
+    print(
+        f"\nper chunk, first vs last 10% of {len(text)} chars, {len(secrets)} secrets:"
+        f"\n  incremental: {early * 1e6:.1f}us -> {late * 1e6:.1f}us"
+        f"\n  full text: {full_early * 1e6:.1f}us -> {full_late * 1e6:.1f}us"
+    )
+    assert late * 5 < full_late
+
+
+def test_mask_buffer_cost_does_not_grow_with_secrets():
+    rnd = random.Random(3)
+
+    def per_chunk(count: int) -> float:
+        secrets = _random_secrets(rnd, count)
+        manager = _manager(secrets)
+        text = _random_text(rnd, secrets, 20_000)
+        buffer = manager.create_mask_buffer()
+        buffer.update(text[:20])  # the shared automaton is built on first use
+        start = time.perf_counter()
+        for end in range(40, len(text), 20):
+            buffer.update(text[:end])
+        return (time.perf_counter() - start) / (len(text) // 20)
+
+    few, many = per_chunk(10), per_chunk(1000)
+    print(f"\nmask buffer per 20 char chunk: 10 secrets {few * 1e6:.1f}us, 1000 secrets {many * 1e6:.1f}us")
+    # the automaton state is carried over, each chunk is scanned once whatever the number of secrets
+    assert many < few * 5
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_streaming_filter_matches_full_masking(seed: int):
+    rnd = random.Random(seed)
+    secrets = _random_secrets(rnd, 10)
+    manager = _manager(secrets)
+    # ends with a character no secret has, so nothing is left unresolved
+    text = _random_text(rnd, secrets, 3000) + " "
+
+    stream_filter = manager.create_streaming_filter()
+    output, position = [], 0
+    while position < len(text):
+        size = rnd.randint(1, 30)
+        output.append(stream_filter.process_chunk(text[position : position + size]))
+        position += size
+    output.append(stream_filter.finalize())
+    assert "".join(output) == manager.get_masker(0).mask(text)
+
+
+def test_streaming_filter_holds_and_finalizes_partials():
+    manager = _manager({"API_KEY": "sk-1234567890"})
+    stream_filter = manager.create_streaming_filter()
+    assert stream_filter.process_chunk("key: s") == "key: "
+    assert stream_filter.process_chunk("k-1234") == ""
+    assert stream_filter.process_chunk("567890 done") == "§§secret(API_KEY) done"
+    assert stream_filter.process_chunk(" sk-12") == " "
+    assert stream_filter.finalize() == "***"
+    # short partials are let through at the end
+    assert stream_filter.process_chunk("x sk") == "x "
+    assert stream_filter.finalize() == "sk"
+
+
+def test_streaming_filter_state_is_small_and_shared():
+    rnd = random.Random(2)
+    secrets = _random_secrets(rnd, 100)
+    # a long multiline value like a PEM key
+    secrets["PEM"] = "-----BEGIN KEY-----\n" + "\n".join(
+        "".join(rnd.choices("ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789+/", k=64)) for _ in range(60)
+    ) + "\n-----END KEY-----"
+    manager = _manager(secrets)
+    text = _random_text(rnd, secrets, 100_000)
+
+    start = time.perf_counter()
+    first = manager.create_streaming_filter()
+    first_time = time.perf_counter() - start
+    start = time.perf_counter()
+    second = manager.create_streaming_filter()
+    second_time = time.perf_counter() - start
+    assert first.automaton is second.automaton
+
+    def per_chunk(stream_filter, text: str) -> float:
+        start = time.perf_counter()
+        for i in range(0, len(text), 5):
+            stream_filter.process_chunk(text[i : i + 5])
+        stream_filter.finalize()
+        return (time.perf_counter() - start) / (len(text) / 5)
+
+    short_time = per_chunk(first, _random_text(rnd, _random_secrets(rnd, 10), 100_000))
+    long_time = per_chunk(second, text)
+    print(
+        f"\nstreaming filter, {len(secrets)} secrets up to {len(secrets['PEM'])} chars:"
+        f" first filter {first_time * 1e3:.2f}ms, next {second_time * 1e6:.1f}us,"
+        f" per 5 char chunk {long_time * 1e6:.1f}us (short secrets {short_time * 1e6:.1f}us)"
+    )
+    assert second_time < first_time
+    assert long_time < short_time * 3
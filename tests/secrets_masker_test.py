@@ -0,0 +1,123 @@
+import sys, os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import random
+import time
+import pytest
+from python.helpers import files
+from python.helpers.secrets import SecretsManager, SecretsMasker
+
+SECRETS_DIR = "tmp/tests/secrets"
+SECRETS_FILE = SECRETS_DIR + "/masker.env"
+ALPHABET = "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789"
+
+
+@pytest.fixture(autouse=True, scope="module")
+def cleanup():
+    yield
+    files.delete_dir(SECRETS_DIR)
+
+
+def _secrets(rnd: random.Random, count: int) -> dict[str, str]:
+    secrets = {f"KEY_{i}": "".join(rnd.choices(ALPHABET, k=rnd.randint(8, 40))) for i in range(count)}
+    # values sharing prefixes and contained in each other
+    secrets["PREFIX"] = secrets["KEY_0"][:6]
+    secrets["INNER"] = secrets["KEY_1"][2:9]
+    secrets["LONGER"] = secrets["KEY_2"] + "xyz"
+    return secrets
+
+
+def _text(rnd: random.Random, secrets: dict[str, str], length: int) -> str:
+    values = list(secrets.values())
+    parts, size = [], 0
+    while size < length:
+        part = rnd.choice(values) if rnd.random() < 0.1 else " ".join(rnd.choices(["lorem", "ipsum", "dolor", "sit", "amet"], k=8))
+        parts.append(part)
+        size += len(part)
+    return "".join(parts)
+
+
+def _leftmost_longest(text: str, replacements: dict[str, str]) -> str:
+    result, i = [], 0
+    while i < len(text):
+        match = max((v for v in replacements if text.startswith(v, i)), key=len, default="")
+        if match:
+            result.append(replacements[match])
+            i += len(match)
+        else:
+            result.append(text[i])
+            i += 1
+    return "".join(result)
+
+
+def _replace_loop(text: str, replacements: dict[str, str]) -> str:
+    # one str.replace pass per secret, longest first
+    for value in sorted(replacements, key=len, reverse=True):
+        text = text.replace(value, replacements[value])
+    return text
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_masker_replaces_longest_match(seed: int):
+    rnd = random.Random(seed)
+    secrets = _secrets(rnd, 30)
+    replacements = {v: f"<{k}>" for k, v in secrets.items()}
+    text = _text(rnd, secrets, 5000)
+    assert SecretsMasker(replacements).mask(text) == _leftmost_longest(text, replacements)
+
+
+def test_masker_edge_cases():
+    masker = SecretsMasker({"ab": "1", "abc": "2", "b.c": "3", "a": "4"})
+    assert masker.mask("xabcab b.c abd a(") == "x21 3 1d 4("
+    assert SecretsMasker({}).mask("nothing") == "nothing"
+    # first characters special in a character class
+    assert SecretsMasker({"]x": "5", "^y": "6", "-z": "7", "\\w": "8"}).mask("a]x^y-z\\w w") == "a5678 w"
+    assert masker.mask("") == ""
+
+
+def test_manager_compiles_once_per_secrets_version():
+    files.write_file(SECRETS_FILE, 'API_KEY="sk-1234567890"\nSHORT="abc"')
+    manager = SecretsManager.get_instance(SECRETS_FILE)
+    manager.clear_cache()
+
+    masker = manager.get_masker()
+    assert manager.get_masker() is masker
+    assert manager.mask_values("key sk-1234567890 abc") == "key §§secret(API_KEY) abc"
+    assert manager.mask_values("sk-1234567890", placeholder="<{key}>") == "<API_KEY>"
+    assert manager.create_streaming_filter().masker is manager.get_masker(0)
+
+    manager.save_secrets('API_KEY="sk-0987654321"')
+    assert manager.get_masker() is not masker
+    assert manager.mask_values("key sk-1234567890 sk-0987654321") == "key sk-1234567890 §§secret(API_KEY)"
+
+
+def test_masker_benchmark():
+    rnd = random.Random(0)
+    print()
+    for count in (10, 100, 1000):
+        secrets = _secrets(rnd, count)
+        replacements = {v: f"§§secret({k})" for k, v in secrets.items()}
+        text = _text(rnd, secrets, 1_000_000)
+
+        start = time.perf_counter()
+        expected = _replace_loop(text, replacements)
+        loop_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        masker = SecretsMasker(replacements)
+        compile_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        masked = masker.mask(text)
+        mask_time = time.perf_counter() - start
+
+        print(
+            f"{count} secrets, {len(text)} chars: replace loop {loop_time * 1e3:.1f}ms,"
+            f" masker {mask_time * 1e3:.1f}ms (compiled in {compile_time * 1e3:.1f}ms)"
+        )
+        # the random values do not overlap except the planted ones, both agree there
+        assert masked == expected
+        if count == 1000:
+            # one scan whatever the number of secrets, the loop makes a pass per secret
+            assert mask_time < loop_time
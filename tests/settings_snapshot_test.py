@@ -0,0 +1,100 @@
+import sys, os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import copy
+import json
+import pickle
+import time
+import pytest
+from python.helpers import settings
+
+
+@pytest.fixture(autouse=True)
+def isolated(monkeypatch, tmp_path):
+    # no settings file, no writes, no side effects of applying
+    monkeypatch.setattr(settings, "SETTINGS_FILE", str(tmp_path / "settings.json"))
+    monkeypatch.setattr(settings, "_settings", None)
+    monkeypatch.setattr(settings, "_version", "v-test")
+    monkeypatch.setattr(settings, "_write_settings_file", lambda s: None)
+    monkeypatch.setattr(settings, "_apply_settings", lambda previous: None)
+    monkeypatch.setattr(settings, "create_auth_token", lambda: "token")
+
+
+def test_reads_share_one_normalized_snapshot():
+    first = settings.get_settings()
+    assert settings.get_settings() is first
+    assert first["version"] == "v-test"
+    assert first["mcp_server_token"] == "token"
+    assert settings.get_history_ctx_size() == int(
+        first["chat_model_ctx_length"] * first["chat_model_ctx_history"]
+    )
+
+
+def test_snapshot_is_read_only():
+    current = settings.get_settings()
+    with pytest.raises(TypeError):
+        current["chat_model_name"] = "other"  # type: ignore
+    with pytest.raises(TypeError):
+        current["api_keys"]["openai"] = "key"
+    with pytest.raises(TypeError):
+        current.update(chat_model_name="other")
+
+
+def test_copy_is_mutable_and_plain():
+    current = settings.get_settings()
+    for changed in (current.copy(), copy.copy(current), copy.deepcopy(current), pickle.loads(pickle.dumps(current))):
+        assert type(changed) is dict and type(changed["api_keys"]) is dict
+        changed["api_keys"]["openai"] = "key"
+        assert "openai" not in current["api_keys"]
+    assert json.loads(json.dumps(current)) == current.copy()
+
+
+def test_set_settings_swaps_snapshot():
+    before = settings.get_settings()
+    settings.set_settings_delta({"chat_model_ctx_length": 1000, "chat_model_ctx_history": 0.5})
+    after = settings.get_settings()
+    assert after is not before
+    assert before["chat_model_ctx_length"] != 1000 or before["chat_model_ctx_history"] != 0.5
+    assert after["chat_model_ctx_length"] == 1000
+    assert settings.get_history_ctx_size() == 500
+    with pytest.raises(TypeError):
+        after["chat_model_ctx_length"] = 1  # type: ignore
+
+
+def test_convert_in_does_not_touch_snapshot():
+    current = settings.get_settings()
+    name = current["chat_model_name"]
+    changed = settings.convert_in(
+        {"sections": [{"fields": [{"id": "chat_model_name", "value": "other"}, {"id": "api_key_test", "value": "key"}]}]}
+    )
+    assert changed["chat_model_name"] == "other" and changed["api_keys"]["api_key_test"] == "key"
+    assert current["chat_model_name"] == name and "api_key_test" not in current["api_keys"]
+
+
+def test_benchmark_message_loop_reads():
+    # settings reads of one message loop iteration: history limit checks, recall, tool call
+    def iteration(get):
+        for _ in range(4):
+            set = get()
+            int(set["chat_model_ctx_length"] * set["chat_model_ctx_history"])
+        get()["memory_recall_enabled"]
+        get()["memory_recall_delayed"]
+        get()["mcp_client_tool_timeout"]
+
+    def normalized_on_read():
+        # what every read cost before the snapshot
+        return settings.normalize_settings(settings.get_settings())
+
+    rounds = 200
+
+    def timed(get) -> float:
+        start = time.perf_counter()
+        for _ in range(rounds):
+            iteration(get)
+        return (time.perf_counter() - start) / rounds
+
+    before = timed(normalized_on_read)
+    after = timed(settings.get_settings)
+    print(f"\nsettings reads per loop iteration: normalized {before * 1e6:.1f}us, snapshot {after * 1e6:.1f}us")
+    assert after * 20 < before
@@ -0,0 +1,175 @@
+import sys, os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+import socket
+import threading
+import time
+import paramiko
+import pytest
+from python.helpers import files  # loaded before log, files and strings import each other
+from python.helpers.log import Log
+from python.helpers.shell_ssh import SSHInteractiveSession
+
+PROMPT = "root@stand-in:~# "
+LINE = "é" + "x" * 62 + "\n"  # 65 bytes, a multi-byte character at every line start
+
+
+class _Server(paramiko.ServerInterface):
+    def get_allowed_auths(self, username):
+        return "password"
+
+    def check_auth_password(self, username, password):
+        return paramiko.AUTH_SUCCESSFUL
+
+    def check_channel_request(self, kind, chanid):
+        return paramiko.OPEN_SUCCEEDED
+
+    def check_channel_pty_request(self, *args):
+        return True
+
+    def check_channel_shell_request(self, channel):
+        return True
+
+
+def _shell(sock: socket.socket, host_key: paramiko.PKey):
+    # answers "emit <bytes>" with that much output, every line with a prompt
+    transport = paramiko.Transport(sock)
+    transport.add_server_key(host_key)
+    transport.start_server(server=_Server())
+    channel = transport.accept(10)
+    if channel is None:
+        return
+    buffer = b""
+    while True:
+        data = channel.recv(1024)
+        if not data:
+            break
+        buffer += data
+        while b"\n" in buffer:
+            line, buffer = buffer.split(b"\n", 1)
+            command = line.decode().strip().split()
+            if command and command[0] == "emit":
+                block = (LINE * (1 << 14)).encode()
+                remaining = int(command[1]) // len(LINE.encode())
+                while remaining > 0:
+                    count = min(remaining, 1 << 14)
+                    channel.sendall(block[: count * len(LINE.encode())])
+                    remaining -= count
+            channel.sendall(PROMPT.encode())
+    transport.close()
+
+
+@pytest.fixture(scope="module")
+def sshd():
+    host_key = paramiko.RSAKey.generate(2048)
+    listener = socket.socket()
+    listener.bind(("127.0.0.1", 0))
+    listener.listen()
+
+    def serve():
+        while True:
+            try:
+                sock, _ = listener.accept()
+            except OSError:
+                return
+            threading.Thread(target=_shell, args=(sock, host_key), daemon=True).start()
+
+    threading.Thread(target=serve, daemon=True).start()
+    yield listener.getsockname()[1]
+    listener.close()
+
+
+def _session(port: int) -> SSHInteractiveSession:
+    session = SSHInteractiveSession(Log(), "127.0.0.1", port, "root", "password")
+    asyncio.run(session.connect(keepalive_interval=0))
+    return session
+
+
+async def _read_until_prompt(session: SSHInteractiveSession) -> tuple[int, str]:
+    # length of the output and its end, as the code execution tool reads it
+    length = 0
+    end = ""
+    async for chunk in session.read_events(tick=0.1):
+        length += len(chunk)
+        end = (end + chunk)[-100:]
+        if end.endswith(PROMPT):
+            return length, end
+
+
+def _old_read_output(session: SSHInteractiveSession, size: int) -> float:
+    # the reader before: 1024 byte reads and a 0.1s sleep after each
+    async def read():
+        received = b""
+        start = time.perf_counter()
+        while not received.endswith(PROMPT.encode()):
+            while session.shell.recv_ready():  # type: ignore
+                received += session.shell.recv(1024)  # type: ignore
+                await asyncio.sleep(0.1)
+            await asyncio.sleep(0.01)
+        return time.perf_counter() - start
+
+    session.shell.send(f"emit {size}\n".encode())  # type: ignore
+    return asyncio.run(read())
+
+
+def test_output_is_decoded_across_reads(sshd):
+    session = _session(sshd)
+    try:
+        size = 1 << 20
+
+        async def run():
+            await session.send_command(f"emit {size}")
+            chunks = []
+            async for chunk in session.read_events(tick=0.1):
+                chunks.append(chunk)
+                if "".join(chunks[-2:]).endswith(PROMPT):
+                    return "".join(chunks)
+
+        text = asyncio.run(run())
+        lines = size // len(LINE.encode())
+        assert text == LINE * lines + PROMPT
+
+        # read_output gives the same text cleaned, the full output is not cleaned again
+        async def run_output():
+            await session.send_command("emit 650")
+            full, part = "", ""
+            while not full.endswith(PROMPT.strip()):
+                await session.wait_readable(1)
+                full, part = await session.read_output()
+            return full
+
+        assert asyncio.run(run_output()) == "\n".join([LINE.strip()] * 10 + [PROMPT.strip()])
+    finally:
+        asyncio.run(session.close())
+
+
+def test_benchmark_throughput(sshd):
+    session = _session(sshd)
+    try:
+        old_size = 20_000
+        old_time = _old_read_output(session, old_size)
+
+        results = {}
+        for size in (1 << 20, 50 << 20):
+
+            async def run():
+                await session.send_command(f"emit {size}")
+                start = time.perf_counter()
+                length, end = await _read_until_prompt(session)
+                return time.perf_counter() - start, length
+
+            elapsed, length = asyncio.run(run())
+            assert length == size // len(LINE.encode()) * len(LINE) + len(PROMPT)
+            results[size] = elapsed
+
+        old_rate = old_size / old_time
+        print(
+            f"\nssh output: before {old_rate / 1024:.0f} KB/s,"
+            f" 1 MB {results[1 << 20]:.2f}s ({(1 << 20) / results[1 << 20] / 1024 / 1024:.1f} MB/s),"
+            f" 50 MB {results[50 << 20]:.2f}s ({(50 << 20) / results[50 << 20] / 1024 / 1024:.1f} MB/s)"
+        )
+        assert (1 << 20) / results[1 << 20] > 20 * old_rate
+    finally:
+        asyncio.run(session.close())
@@ -0,0 +1,92 @@
+import sys, os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import time
+from datetime import datetime, timedelta, timezone
+from python.helpers.schedule_queue import ScheduleQueue
+from python.helpers.task_scheduler import PlannedTask, ScheduledTask, TaskPlan, TaskSchedule, TaskState
+
+
+def _cron_task(minute: str = "*", hour: str = "*", uuid: str = "cron") -> ScheduledTask:
+    schedule = TaskSchedule(minute=minute, hour=hour, day="*", month="*", weekday="*", timezone="UTC")
+    return ScheduledTask(uuid=uuid, name=uuid, system_prompt="", prompt="", schedule=schedule)
+
+
+def _planned_task(todo: list[datetime], uuid: str = "plan") -> PlannedTask:
+    return PlannedTask(uuid=uuid, name=uuid, system_prompt="", prompt="", plan=TaskPlan.create(todo=todo))
+
+
+def test_cron_task_fires_once_per_time():
+    start = datetime(2026, 1, 1, 12, 0, 30, tzinfo=timezone.utc)
+    queue: ScheduleQueue = ScheduleQueue()
+    queue.sync([_cron_task()], start)
+    assert queue.next_fire() == datetime(2026, 1, 1, 12, 1, tzinfo=timezone.utc).timestamp()
+
+    assert queue.pop_due(start + timedelta(seconds=29)) == []
+    assert len(queue.pop_due(start + timedelta(seconds=30))) == 1
+    # woken up again in the same minute, also by a reload with new task objects
+    assert queue.pop_due(start + timedelta(seconds=31)) == []
+    queue.sync([_cron_task()], start + timedelta(seconds=31))
+    assert queue.pop_due(start + timedelta(seconds=59)) == []
+
+    # a running task is not scheduled, once idle it fires for the next minute only
+    running = _cron_task()
+    running.state = TaskState.RUNNING
+    queue.sync([running], start + timedelta(seconds=40))
+    assert queue.next_fire() is None
+    queue.sync([_cron_task()], start + timedelta(seconds=150))
+    assert len(queue.pop_due(start + timedelta(seconds=150))) == 0
+    assert len(queue.pop_due(start + timedelta(seconds=210))) == 1
+
+    # removed tasks are dropped
+    queue.sync([], start + timedelta(seconds=211))
+    assert queue.next_fire() is None and len(queue) == 0
+
+
+def test_planned_task_fires_on_the_second():
+    start = datetime(2026, 1, 1, 12, 0, 0, tzinfo=timezone.utc)
+    overdue = _planned_task([start - timedelta(hours=1)], uuid="overdue")
+    planned = _planned_task([start + timedelta(seconds=7), start + timedelta(seconds=9)])
+    queue: ScheduleQueue = ScheduleQueue()
+    queue.sync([overdue, planned], start)
+
+    assert [task.uuid for task in queue.pop_due(start)] == ["overdue"]
+    assert queue.next_fire() == (start + timedelta(seconds=7)).timestamp()
+    assert queue.pop_due(start + timedelta(seconds=6.9)) == []
+    assert [task.uuid for task in queue.pop_due(start + timedelta(seconds=7))] == ["plan"]
+    assert queue.pop_due(start + timedelta(seconds=8)) == []  # not launched again before its todo changes
+
+    # the launch moved the first todo to in progress
+    planned.plan.set_in_progress(start + timedelta(seconds=7))
+    queue.sync([planned], start + timedelta(seconds=8))
+    assert queue.next_fire() == (start + timedelta(seconds=9)).timestamp()
+
+
+def test_tick_benchmark():
+    now = datetime.now(timezone.utc)
+    # hours away from now, so no task is due whenever the test runs
+    hours = [(now.hour + 2 + i) % 24 for i in range(20)]
+    tasks = [_cron_task(minute=str(i % 60), hour=str(hours[i % 20]), uuid=f"task{i}") for i in range(10000)]
+    queue: ScheduleQueue = ScheduleQueue()
+    start = time.perf_counter()
+    queue.sync(tasks, now)
+    sync_time = time.perf_counter() - start
+
+    # each tick checked the schedule of every task before
+    start = time.perf_counter()
+    scanned = [task for task in tasks if task.check_schedule()]
+    scan_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(100):
+        due = queue.pop_due(now)
+    tick_time = (time.perf_counter() - start) / 100
+
+    print(
+        f"\n10000 cron tasks: sync {sync_time * 1e3:.0f}ms once, tick scanning all {scan_time * 1e3:.0f}ms,"
+        f" tick from the heap {tick_time * 1e6:.1f}us"
+    )
+    assert due == [] and len(queue) == len(tasks)
+    assert scanned == []
+    assert tick_time * 1000 < scan_time
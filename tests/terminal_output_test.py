@@ -0,0 +1,104 @@
+import sys, os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+import random
+import re
+import time
+import pytest
+from python.helpers.terminal_output import TerminalOutput, clean_string
+
+SAMPLES = [
+    "\r\r\n> > hello\r\nworld  \n\x1b[31mred\x1b[0m line\nprog 10%\rprog 50%\rprog 100%\ndone\n$ ",
+    " \r\n>\r\n> \nabc\n\n  indented\n" + "".join(f"{i}%\r" for i in range(3000)) + "ok\nlast",
+    "start\n" + "x" * 10000 + "\x1b[32m" + "y" * 5000 + "\n" + "tail \\x41 z",
+    "\n\n\nstart\n" + "line\n" * 1000 + "root@host:~# ",
+]
+
+
+def _cleaned(raw: str) -> str:
+    # what the tool made of the whole output before
+    return re.sub(r"(?<!\\)\\x[0-9A-Fa-f]{2}", "", clean_string(raw))
+
+
+def _feed(raw: str, output: TerminalOutput, max_chunk: int = 700):
+    i = 0
+    while i < len(raw):
+        size = random.randint(1, max_chunk)
+        output.append(raw[i : i + size])
+        i += size
+
+
+@pytest.mark.parametrize("raw", SAMPLES)
+def test_same_as_cleaning_whole_output(raw):
+    random.seed(len(raw))
+    expected = _cleaned(raw)
+    for _ in range(20):
+        output = TerminalOutput()
+        _feed(raw, output)
+        assert output.text() == expected
+        assert output.last_lines(3) == expected.splitlines()[-3:]
+        assert output.tail(50) == expected[-50:]
+
+
+def test_truncates_middle_like_truncate_text():
+    raw = "".join(f"line {i}\n" for i in range(2000))
+    output = TerminalOutput(threshold=1000)
+    _feed(raw, output, 37)
+    expected = clean_string(raw)
+
+    def placeholder(length):
+        return f"[{length} chars removed]"
+
+    replacement = placeholder(len(expected) - 1000)
+    start_len = (1000 - len(replacement)) // 2
+    end_len = 1000 - len(replacement) - start_len
+    assert output.text(placeholder) == expected[:start_len] + replacement + expected[-end_len:]
+    assert output.length == len(expected)
+    assert output._head_len + output._tail_len < 1100  # the middle is not kept
+
+
+def test_benchmark_large_output():
+    # a build printing 500 KB in 4 KB chunks
+    line = "compiling module with a fairly long path/name.c ... ok\r\n"
+    raw = line * (500_000 // len(line))
+    chunks = [raw[i : i + 4096] for i in range(0, len(raw), 4096)]
+
+    start = time.perf_counter()
+    full = ""
+    for chunk in chunks:
+        # before: the whole output cleaned and split on every read
+        full += chunk
+        _cleaned(full).splitlines()[-3:]
+    before = time.perf_counter() - start
+
+    start = time.perf_counter()
+    output = TerminalOutput()
+    for chunk in chunks:
+        output.append(chunk)
+        output.last_lines(3)
+        output.tail(15_000)
+    after = time.perf_counter() - start
+
+    assert output.text() == _cleaned(raw)
+    print(f"\n500 KB in {len(chunks)} chunks: whole output {before * 1000:.0f}ms, incremental {after * 1000:.0f}ms")
+    assert after * 10 < before
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="posix pty")
+def test_tty_session_decodes_split_characters():
+    from python.helpers.tty_session import TTYSession
+
+    async def run():
+        session = TTYSession(f"{sys.executable} -c \"print('é' * 100000)\"")
+        await session.start()
+        chunks = []
+        while (chunk := await session.read(timeout=2)) is not None:
+            chunks.append(chunk + session.read_nowait())
+        session.kill()
+        await session.wait()
+        return "".join(chunks)
+
+    text = asyncio.run(run())
+    assert text.strip() == "é" * 100000
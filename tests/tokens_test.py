@@ -0,0 +1,84 @@
+import sys, os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import time
+import pytest
+from python.helpers import tokens
+
+
+@pytest.fixture(autouse=True)
+def clean_state():
+    tokens._cache.clear()
+    tokens._calibration.clear()
+    yield
+    tokens._cache.clear()
+    tokens._calibration.clear()
+
+
+def _texts(count: int) -> list[str]:
+    return [
+        f"def function_{i}(value):\n    return value * {i}  # lorem ipsum dolor sit amet\n" * 10
+        for i in range(count)
+    ]
+
+
+def _uncached(text: str) -> int:
+    return len(tokens.get_encoding().encode(text, disallowed_special=()))
+
+
+def test_cached_counts_match_tokenizer():
+    texts = _texts(20) + ["short", ""]
+    for text in texts:
+        assert tokens.count_tokens(text) == _uncached(text)
+    # second round comes from the cache
+    assert len(tokens._cache) == 20
+    for text in texts:
+        assert tokens.count_tokens(text) == _uncached(text)
+
+    assert tokens.count_tokens_batch(texts + texts[:5]) == [_uncached(t) for t in texts + texts[:5]]
+    assert tokens.count_tokens_batch(_texts(30)) == [_uncached(t) for t in _texts(30)]
+    assert tokens.approximate_tokens_batch(texts) == [tokens.approximate_tokens(t) for t in texts]
+
+
+def test_cache_is_bounded(monkeypatch):
+    monkeypatch.setattr(tokens, "CACHE_SIZE", 10)
+    for text in _texts(25):
+        tokens.count_tokens(text)
+    assert len(tokens._cache) == 10
+
+
+def test_estimate_calibrates_per_model():
+    text = _texts(1)[0]
+    uncalibrated = tokens.estimate_tokens(text)
+    assert uncalibrated == tokens.estimate_tokens(text, "")
+
+    calibrated = tokens.estimate_tokens(text, "model")
+    assert tokens._calibration["model"][2] == 1
+    # after calibration the estimate is the exact count plus the buffer
+    assert abs(calibrated - _uncached(text) * tokens.APPROX_BUFFER) <= 1
+
+
+def test_estimate_is_cheaper_than_counting():
+    texts = _texts(200)
+    rounds = 5
+
+    def timed(count) -> float:
+        start = time.perf_counter()
+        for _ in range(rounds):
+            for text in texts:
+                count(text)
+        return (time.perf_counter() - start) / (rounds * len(texts))
+
+    exact_time = timed(_uncached)
+    tokens.count_tokens_batch(texts)
+    cached_time = timed(tokens.count_tokens)
+    tokens.estimate_tokens(texts[0], "model")
+    estimate_time = timed(lambda text: tokens.estimate_tokens(text, "model"))
+
+    print(
+        f"\nper text of {len(texts[0])} chars: exact {exact_time * 1e6:.1f}us,"
+        f" cached {cached_time * 1e6:.1f}us, heuristic {estimate_time * 1e6:.1f}us"
+    )
+    assert cached_time * 5 < exact_time
+    assert estimate_time * 10 < exact_time
@@ -0,0 +1,230 @@
+import sys, os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import time
+import faiss
+import numpy as np
+import pytest
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores.utils import DistanceStrategy
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from python.helpers import files, vector_index
+from python.helpers.metadata_filter import IndexedFaiss, parse_filter
+from python.helpers.memory import Memory
+from python.helpers.memory_wal import MemoryWal
+
+DIM = 64
+DB_DIR = files.get_abs_path("tmp/tests/vector_index")
+
+
+def _vectors(count: int, seed: int, dim: int = DIM) -> np.ndarray:
+    # clustered like real embeddings, uniform random vectors have no neighbours to find
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((64, dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, len(centers), count)] + 0.6 * rng.standard_normal((count, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def _store(index_type: str, dim: int = DIM) -> IndexedFaiss:
+    return IndexedFaiss(
+        embedding_function=DeterministicFakeEmbedding(size=dim),
+        index=faiss.IndexFlatIP(dim),
+        docstore=InMemoryDocstore(),
+        index_to_docstore_id={},
+        distance_strategy=DistanceStrategy.COSINE,
+        relevance_score_fn=Memory._cosine_normalizer,
+        index_type=index_type,
+    )
+
+
+def _add(db: IndexedFaiss, vectors: np.ndarray, start: int, prefix: str = "id"):
+    db.add_embeddings(
+        [(f"memory {start + i}", vector) for i, vector in enumerate(vectors.tolist())],
+        metadatas=[{"area": ["main", "fragments"][(start + i) % 2], "n": start + i} for i in range(len(vectors))],
+        ids=[f"{prefix}{start + i}" for i in range(len(vectors))],
+    )
+
+
+def _exact(db: IndexedFaiss, vectors: dict[str, np.ndarray], query: np.ndarray, k: int, condition: str = "") -> list[str]:
+    flt = parse_filter(condition) if condition else None
+    ids = [id for id in vectors if not flt or flt(db.docstore.search(id).metadata)]  # type: ignore
+    scores = np.array([vectors[id] @ query for id in ids])
+    return [ids[i] for i in np.argsort(-scores, kind="stable")[:k]]
+
+
+def _recall(found: list[str], expected: list[str]) -> float:
+    return len(set(found) & set(expected)) / len(expected)
+
+
+@pytest.fixture
+def small_threshold(monkeypatch):
+    monkeypatch.setattr(vector_index, "ANN_THRESHOLD", 1000)
+    monkeypatch.setattr(vector_index, "IVF_MIN_TRAIN", 1000)
+    yield
+    files.delete_dir(DB_DIR)
+
+
+@pytest.mark.parametrize("index_type", ["hnsw", "ivf_flat"])
+def test_ann_store_follows_changes(small_threshold, index_type: str):
+    db = _store(index_type)
+    vectors = _vectors(3000, 0)
+    _add(db, vectors[:900], 0)
+    assert not db.is_ann()
+    _add(db, vectors[900:2000], 900)
+    assert not db.is_ann()  # adding never builds the ANN index
+    assert db.migrate()
+    assert vector_index.get_index_type(db.index) == index_type
+    live = {f"id{i}": vectors[i] for i in range(2000)}
+
+    # deleted and updated documents stay in the index, but are never found
+    deleted = [f"id{i}" for i in range(0, 2000, 7)]
+    db.delete(deleted)
+    for id in deleted:
+        del live[id]
+    updated = [f"id{i}" for i in range(1, 2000, 11) if f"id{i}" in live]
+    db.delete(updated)
+    db.add_embeddings(
+        [(f"updated {id}", vectors[2000 + i]) for i, id in enumerate(updated)],
+        metadatas=[{"area": "main"} for _ in updated],
+        ids=updated,
+    )
+    for i, id in enumerate(updated):
+        live[id] = vectors[2000 + i]
+    assert db.get_deleted() and db.index.ntotal == 2000 + len(updated)
+
+    def check(db: IndexedFaiss):
+        recall = []
+        for q in range(2500, 2550):
+            query = vectors[q]
+            found = [doc.id for doc, _ in db.similarity_search_with_score_by_vector(query.tolist(), k=10)]
+            assert len(found) == len(set(found)) == 10 and set(found) <= set(live)
+            recall.append(_recall(found, _exact(db, live, query, 10)))
+
+            # indexed filters score their few candidates exactly
+            condition = "area == 'fragments'"
+            found = [doc.id for doc, _ in db.similarity_search_with_score_by_vector(query.tolist(), k=10, filter=parse_filter(condition))]
+            assert found == _exact(db, live, query, 10, condition)
+
+            found = [doc.id for doc, _ in db.similarity_search_with_score_by_vector(query.tolist(), k=5, filter=parse_filter("n > 1000"))]
+            assert all(db.docstore.search(id).metadata["n"] > 1000 for id in found)  # type: ignore
+        assert np.mean(recall) >= 0.9
+
+    check(db)
+
+    # a reload derives the deleted positions from the docstore
+    db.save_local(DB_DIR)
+    loaded = IndexedFaiss.load_local(
+        DB_DIR, DeterministicFakeEmbedding(size=DIM), allow_dangerous_deserialization=True, index_type=index_type
+    )
+    assert loaded.get_deleted() == db.get_deleted()
+    check(loaded)
+
+    # past the compaction ratio the index is rebuilt with the live vectors only
+    removed = [id for id in list(live)[: len(live) // 3]]
+    loaded.delete(removed)
+    for id in removed:
+        del live[id]
+    assert not loaded.get_deleted() and loaded.index.ntotal == len(live)
+    assert vector_index.get_index_type(loaded.index) == index_type
+    check(loaded)
+
+
+def test_migration_keeps_changes_made_while_building(small_threshold):
+    db = _store("hnsw")
+    vectors = _vectors(1600, 3)
+    _add(db, vectors[:1200], 0)
+    target, built, renumbered = db.prepare_migration()  # type: ignore
+    index = vector_index.create_index(target, DIM, built)
+
+    # added while the index was built, they are added to it when it is swapped in
+    _add(db, vectors[1200:1500], 1200)
+    assert db.finish_migration(index, len(built), renumbered)
+    assert db.is_ann() and db.index.ntotal == 1500
+    query = vectors[1400].tolist()
+    assert db.similarity_search_with_score_by_vector(query, k=1)[0][0].id == "id1400"
+
+    # a delete renumbers a flat index, a build from before it is dropped
+    db = _store("hnsw")
+    _add(db, vectors[:1200], 0)
+    target, built, renumbered = db.prepare_migration()  # type: ignore
+    db.delete(["id3"])
+    assert not db.finish_migration(vector_index.create_index(target, DIM, built), len(built), renumbered)
+    assert not db.is_ann()
+    assert db.migrate() and db.index.ntotal == 1199
+
+
+def test_wal_migrates_in_background_checkpoint(small_threshold):
+    db = _store("hnsw")
+    db.save_local(DB_DIR)
+    wal = MemoryWal(db, DB_DIR)
+    vectors = _vectors(1100, 4)
+    for start in range(0, 1100, 100):
+        batch = vectors[start : start + 100]
+        ids = [f"id{start + i}" for i in range(len(batch))]
+        wal.add([f"memory {id}" for id in ids], batch.tolist(), [{"area": "main"} for _ in ids], ids)
+    assert not db.is_ann()
+
+    wal.checkpoint(migrate=True)
+    assert vector_index.get_index_type(db.index) == "hnsw"
+    loaded = IndexedFaiss.load_local(
+        DB_DIR, DeterministicFakeEmbedding(size=DIM), allow_dangerous_deserialization=True, index_type="hnsw"
+    )
+    assert loaded.is_ann() and loaded.index.ntotal == 1100
+    wal.close()
+
+
+def test_index_type_change_rebuilds(small_threshold):
+    db = _store("flat")
+    vectors = _vectors(1500, 1)
+    _add(db, vectors, 0)
+    assert not db.is_ann()
+    query = vectors[7].tolist()
+    before = [doc.id for doc, _ in db.similarity_search_with_score_by_vector(query, k=5)]
+
+    assert db.set_index_type("hnsw")
+    assert vector_index.get_index_type(db.index) == "hnsw"
+    assert not db.set_index_type("auto")  # auto is hnsw at this size
+    assert [doc.id for doc, _ in db.similarity_search_with_score_by_vector(query, k=5)] == before
+
+    db.delete(["id1", "id2"])
+    assert db.set_index_type("flat")
+    assert not db.is_ann() and db.index.ntotal == 1498
+
+
+def test_ann_recall_benchmark():
+    count, dim = 50_000, 128
+    vectors = _vectors(count + 200, 2, dim)
+    queries = vectors[count:]
+    flat = _store("flat", dim)
+    _add(flat, vectors[:count], 0)
+
+    def timed(db: IndexedFaiss) -> tuple[float, list[list[str]]]:
+        results = []
+        start = time.perf_counter()
+        for query in queries:
+            results.append([doc.id for doc, _ in db.similarity_search_with_score_by_vector(query.tolist(), k=10)])
+        return (time.perf_counter() - start) / len(queries), results
+
+    flat_time, expected = timed(flat)
+    print(f"\n{count} vectors of {dim} dims, recall@10 against flat search ({flat_time * 1e3:.2f}ms):")
+    recalls = {}
+    for index_type in ("hnsw", "ivf_flat", "ivf_pq"):
+        db = _store(index_type, dim)
+        _add(db, vectors[:count], 0)
+        start = time.perf_counter()
+        assert db.migrate()  # moves to the ANN index past the threshold
+        build_time = time.perf_counter() - start
+        assert vector_index.get_index_type(db.index) == index_type
+
+        search_time, found = timed(db)
+        recalls[index_type] = np.mean([_recall(f, e) for f, e in zip(found, expected)])
+        print(
+            f"  {index_type}: recall {recalls[index_type]:.3f}, search {search_time * 1e3:.2f}ms,"
+            f" built in {build_time:.1f}s"
+        )
+        if index_type == "hnsw":
+            assert search_time * 3 < flat_time
+    assert recalls["hnsw"] >= 0.95
+    assert recalls["ivf_flat"] >= 0.9
+    assert recalls["ivf_pq"] >= 0.15  # lossy, compressed 16 times, for stores that do not fit in memory otherwise
@@ -253,6 +253,8 @@ function setConnectionStatus(connected) {
 let lastLogVersion = 0;
 let lastLogGuid = "";
 let lastSpokenNo = 0;
+let lastContextsVersion = -1;
+let lastStateVersion = -1;
 
 export async function poll() {
   let updated = false;
@@ -266,6 +268,8 @@ export async function poll() {
       notifications_from: notificationStore.lastNotificationVersion || 0,
       context: context || null,
       timezone: timezone,
+      version: lastStateVersion,
+      contexts_from: lastContextsVersion,
     });
 
     // Check if the response is valid
@@ -274,120 +278,195 @@ export async function poll() {
       return false;
     }
 
-    // deselect chat if it is requested by the backend
-    if (response.deselect_chat) {
-      chatsStore.deselectChat();
-      return
-    }
+    updated = await applyPollResponse(response);
+  } catch (error) {
+    console.error("Error:", error);
+    setConnectionStatus(false);
+  }
 
-    if (
-      response.context != context &&
-      !(response.context === null && context === null) &&
-      context !== null
-    ) {
-      return;
-    }
+  return updated;
+}
+globalThis.poll = poll;
+
+// apply state from /poll or a /poll_stream event, returns true if messages were updated
+async function applyPollResponse(response) {
+  let updated = false;
 
-    // if the chat has been reset, restart this poll as it may have been called with incorrect log_from
-    if (lastLogGuid != response.log_guid) {
-      const chatHistoryEl = document.getElementById("chat-history");
-      if (chatHistoryEl) chatHistoryEl.innerHTML = "";
-      lastLogVersion = 0;
-      lastLogGuid = response.log_guid;
+  // nothing changed on the server since the last response
+  if (response.not_modified) {
+    setConnectionStatus(true);
+    return false;
+  }
+
+  // deselect chat if it is requested by the backend
+  if (response.deselect_chat) {
+    chatsStore.deselectChat();
+    return false;
+  }
+
+  if (
+    response.context != context &&
+    !(response.context === null && context === null) &&
+    context !== null
+  ) {
+    return false;
+  }
+
+  // if the chat has been reset, restart this poll as it may have been called with incorrect log_from
+  if (lastLogGuid != response.log_guid) {
+    const chatHistoryEl = document.getElementById("chat-history");
+    if (chatHistoryEl) chatHistoryEl.innerHTML = "";
+    lastLogVersion = 0;
+    lastLogGuid = response.log_guid;
+    if (response.log_from) {
       await poll();
-      return;
+      return false;
     }
+  }
 
-    if (lastLogVersion != response.log_version) {
-      updated = true;
-      for (const log of response.logs) {
-        const messageId = log.id || log.no; // Use log.id if available
-        setMessage(
-          messageId,
-          log.type,
-          log.heading,
-          log.content,
-          log.temp,
-          log.kvps
-        );
-      }
-      afterMessagesUpdate(response.logs);
+  if (lastLogVersion != response.log_version) {
+    updated = true;
+    for (const log of response.logs) {
+      const messageId = log.id || log.no; // Use log.id if available
+      setMessage(
+        messageId,
+        log.type,
+        log.heading,
+        log.content,
+        log.temp,
+        log.kvps
+      );
     }
+    afterMessagesUpdate(response.logs);
+  }
 
-    lastLogVersion = response.log_version;
-    lastLogGuid = response.log_guid;
+  lastLogVersion = response.log_version;
+  lastLogGuid = response.log_guid;
+  lastStateVersion = response.version ?? -1;
 
-    updateProgress(response.log_progress, response.log_progress_active);
+  updateProgress(response.log_progress, response.log_progress_active);
 
-    // Update notifications from response
-    notificationStore.updateFromPoll(response);
+  // Update notifications from response
+  notificationStore.updateFromPoll(response);
 
-    //set ui model vars from backend
-    inputStore.paused = response.paused;
+  //set ui model vars from backend
+  inputStore.paused = response.paused;
 
-    // Update status icon state
-    setConnectionStatus(true);
+  // Update status icon state
+  setConnectionStatus(true);
 
+  // chats and tasks lists are only sent when they changed
+  if (response.contexts) {
     // Update chats list using store
-    let contexts = response.contexts || [];
-    chatsStore.applyContexts(contexts);
+    chatsStore.applyContexts(response.contexts);
 
     // Update tasks list using store
-    let tasks = response.tasks || [];
-    tasksStore.applyTasks(tasks);
+    tasksStore.applyTasks(response.tasks || []);
 
-    // Make sure the active context is properly selected in both lists
-    if (context) {
-      // Update selection in both stores
-      chatsStore.setSelected(context);
+    lastContextsVersion = response.contexts_version ?? -1;
+  }
 
-      const contextInChats = chatsStore.contains(context);
-      const contextInTasks = tasksStore.contains(context);
+  // Make sure the active context is properly selected in both lists
+  if (context) {
+    // Update selection in both stores
+    chatsStore.setSelected(context);
 
-      if (contextInTasks) {
-        tasksStore.setSelected(context);
-      }
+    const contextInChats = chatsStore.contains(context);
+    const contextInTasks = tasksStore.contains(context);
 
-      if (!contextInChats && !contextInTasks) {
-        if (chatsStore.contexts.length > 0) {
-          // If it doesn't exist in the list but other contexts do, fall back to the first
-          const firstChatId = chatsStore.firstId();
-          if (firstChatId) {
-            setContext(firstChatId);
-            chatsStore.setSelected(firstChatId);
-          }
-        } else if (typeof deselectChat === "function") {
-          // No contexts remain – clear state so the welcome screen can surface
-          deselectChat();
-        }
-      }
-    } else {
-      const welcomeStore =
-        globalThis.Alpine && typeof globalThis.Alpine.store === "function"
-          ? globalThis.Alpine.store("welcomeStore")
-          : null;
-      const welcomeVisible = Boolean(welcomeStore && welcomeStore.isVisible);
-
-      // No context selected, try to select the first available item unless welcome screen is active
-      if (!welcomeVisible && contexts.length > 0) {
+    if (contextInTasks) {
+      tasksStore.setSelected(context);
+    }
+
+    if (!contextInChats && !contextInTasks) {
+      if (chatsStore.contexts.length > 0) {
+        // If it doesn't exist in the list but other contexts do, fall back to the first
         const firstChatId = chatsStore.firstId();
         if (firstChatId) {
           setContext(firstChatId);
           chatsStore.setSelected(firstChatId);
         }
+      } else if (typeof deselectChat === "function") {
+        // No contexts remain – clear state so the welcome screen can surface
+        deselectChat();
+      }
+    }
+  } else {
+    const welcomeStore =
+      globalThis.Alpine && typeof globalThis.Alpine.store === "function"
+        ? globalThis.Alpine.store("welcomeStore")
+        : null;
+    const welcomeVisible = Boolean(welcomeStore && welcomeStore.isVisible);
+
+    // No context selected, try to select the first available item unless welcome screen is active
+    if (!welcomeVisible && chatsStore.contexts.length > 0) {
+      const firstChatId = chatsStore.firstId();
+      if (firstChatId) {
+        setContext(firstChatId);
+        chatsStore.setSelected(firstChatId);
       }
     }
-
-    lastLogVersion = response.log_version;
-    lastLogGuid = response.log_guid;
-  } catch (error) {
-    console.error("Error:", error);
-    setConnectionStatus(false);
   }
 
   return updated;
 }
-globalThis.poll = poll;
+
+// push updates from /poll_stream, the server only sends what changed since our cursor
+let stateStream = null;
+let stateStreamQueue = Promise.resolve();
+let stateStreamFailures = 0;
+const stateStreamMaxFailures = 3;
+
+async function openStateStream() {
+  closeStateStream();
+  const params = new URLSearchParams({
+    context: context || "",
+    log_guid: lastLogGuid,
+    log_from: lastLogVersion,
+    notifications_guid: notificationStore.lastNotificationGuid || "",
+    notifications_from: notificationStore.lastNotificationVersion || 0,
+    contexts_from: lastContextsVersion,
+    timezone: Intl.DateTimeFormat().resolvedOptions().timeZone,
+  });
+  const stream = await api.openEventSource("/poll_stream?" + params);
+  stateStream = stream;
+
+  stream.onopen = () => {
+    stateStreamFailures = 0;
+    setConnectionStatus(true);
+  };
+  stream.onmessage = (event) => {
+    const response = JSON.parse(event.data);
+    // apply events one at a time, in the order they came
+    stateStreamQueue = stateStreamQueue
+      .then(() => {
+        if (stream === stateStream) return applyPollResponse(response);
+      })
+      .catch((error) => console.error("Error:", error));
+  };
+  stream.onerror = () => {
+    // EventSource reconnects by itself and resumes from the last event id
+    setConnectionStatus(false);
+    if (stream.readyState !== EventSource.CLOSED) return;
+    if (++stateStreamFailures >= stateStreamMaxFailures) {
+      // the stream does not get through (proxy, old browser), poll instead
+      console.warn("Update stream unavailable, falling back to polling");
+      closeStateStream();
+      startPolling();
+    } else if (stream === stateStream) {
+      openStateStream();
+    }
+  };
+}
+
+function closeStateStream() {
+  if (stateStream) stateStream.close();
+  stateStream = null;
+}
+
+function restartStateStream() {
+  if (stateStream) openStateStream();
+}
 
 function afterMessagesUpdate(logs) {
   if (localStorage.getItem("speech") == "true") {
@@ -478,6 +557,7 @@ export const setContext = function (id) {
   lastLogGuid = "";
   lastLogVersion = 0;
   lastSpokenNo = 0;
+  lastStateVersion = -1;
 
   // Stop speech when switching chats
   speechStore.stopAudio();
@@ -492,6 +572,9 @@ export const setContext = function (id) {
 
   //skip one speech if enabled when switching context
   if (localStorage.getItem("speech") == "true") skipOneSpeech = true;
+
+  // the update stream follows one chat, reopen it for the new one
+  restartStateStream();
 };
 
 export const deselectChat = function () {
@@ -598,6 +681,18 @@ async function startPolling() {
   _doPoll();
 }
 
+// prefer pushed updates, poll where server-sent events are not available
+function startUpdates() {
+  if (typeof EventSource === "undefined") {
+    startPolling();
+    return;
+  }
+  openStateStream().catch((error) => {
+    console.error("Error:", error);
+    startPolling();
+  });
+}
+
 // All initializations and event listeners are now consolidated here
 document.addEventListener("DOMContentLoaded", function () {
   // Assign DOM elements to variables now that the DOM is ready
@@ -619,8 +714,8 @@ document.addEventListener("DOMContentLoaded", function () {
     chatHistory.addEventListener("scroll", updateAfterScroll);
   }
 
-  // Start polling for updates
-  startPolling();
+  // Start receiving updates
+  startUpdates();
 });
 
 /*
@@ -69,6 +69,17 @@ export async function fetchApi(url, request) {
   return response;
 }
 
+/**
+ * Open a server-sent events stream to an A0 API
+ * EventSource cannot send headers, the CSRF token goes in its cookie
+ * @param {string} url - The URL of the stream
+ * @returns {Promise<EventSource>} The open event source
+ */
+export async function openEventSource(url) {
+  await getCsrfToken();
+  return new EventSource(url, { withCredentials: true });
+}
+
 // csrf token stored locally
 let csrfToken = null;
 